@@ -1,6 +1,8 @@
 from django.conf import settings
 from django.db import ProgrammingError, OperationalError, transaction
 
+from . import reference
+
 
 def ensure_default_geography():
     """
@@ -23,3 +25,4 @@ def ensure_default_geography():
     except (ProgrammingError, OperationalError):
         # Database tables not ready (e.g., before migrations)
         return
+    reference.get_reference()
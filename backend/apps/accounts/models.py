@@ -35,6 +35,12 @@ class Beat(models.Model):
         return f"{self.district.slug}-{self.code}"
 
 
+class ReferenceVersion(models.Model):
+    """Single row bumped whenever districts or beats change (see ``reference.py``)."""
+
+    version = models.PositiveBigIntegerField(default=0)
+
+
 class OfficerProfile(models.Model):
     ROLE_CHOICES = [
         ("officer", "Officer"),
@@ -0,0 +1,127 @@
+"""
+In-process cache of district/beat reference rows.
+
+The rows change only when an admin edits geography, so every worker keeps a
+copy and reloads it when the version in the ``ReferenceVersion`` row changes.
+Saving or deleting a ``District``/``Beat`` bumps it in the same transaction.
+With a cache shared by all workers the version is also kept there for
+``VERSION_CACHE_SECONDS``, so lookups usually cost no query; with a
+per-process cache each worker reads the row at most every
+``VERSION_CHECK_SECONDS``. Edits made in this process apply immediately.
+Cached instances are shared between requests and must be treated as read-only.
+"""
+from __future__ import annotations
+
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Dict, List
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .services import cache_is_shared
+
+VERSION_KEY = "accounts:reference-version"
+# Bounds how long a worker can keep a version it read just before a bump.
+VERSION_CACHE_SECONDS = 60
+# Without a shared cache: how stale another worker's edit may be here.
+VERSION_CHECK_SECONDS = 5
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    version: int | None = None
+    districts: List = field(default_factory=list)
+    districts_by_slug: Dict[str, object] = field(default_factory=dict)
+    districts_by_id: Dict[int, object] = field(default_factory=dict)
+    beats_by_id: Dict[int, object] = field(default_factory=dict)
+
+
+_reference = ReferenceData()
+_lock = Lock()
+_version_checked_at = 0.0
+
+
+def _database_version() -> int:
+    from .models import ReferenceVersion
+
+    return ReferenceVersion.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+
+def _shared_version() -> int:
+    global _version_checked_at
+    if not cache_is_shared():
+        now = time.monotonic()
+        if _reference.version is not None and now - _version_checked_at < VERSION_CHECK_SECONDS:
+            return _reference.version
+        _version_checked_at = now
+        return _database_version()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = _database_version()
+        cache.add(VERSION_KEY, version, VERSION_CACHE_SECONDS)
+    return version
+
+
+def _load(version: int) -> ReferenceData:
+    from .models import District
+
+    districts = list(District.objects.prefetch_related("beats").order_by("name"))
+    return ReferenceData(
+        version=version,
+        districts=districts,
+        districts_by_slug={district.slug: district for district in districts},
+        districts_by_id={district.pk: district for district in districts},
+        beats_by_id={beat.pk: beat for district in districts for beat in district.beats.all()},
+    )
+
+
+def get_reference() -> ReferenceData:
+    global _reference
+    version = _shared_version()
+    if _reference.version != version:
+        with _lock:
+            if _reference.version != version:
+                _reference = _load(version)
+    return _reference
+
+
+def _forget():
+    global _reference
+    cache.delete(VERSION_KEY)
+    _reference = ReferenceData()
+
+
+def invalidate():
+    """Bump the version; every process reloads on its next lookup."""
+    from .models import ReferenceVersion
+
+    if not ReferenceVersion.objects.filter(pk=1).update(version=F("version") + 1):
+        ReferenceVersion.objects.get_or_create(pk=1, defaults={"version": 1})
+    _forget()
+
+
+def invalidate_on_commit():
+    # Bump now so this process never serves the old rows, and drop the cached
+    # version again on commit: other workers may have cached the committed
+    # version while this transaction was open.
+    invalidate()
+    transaction.on_commit(_forget)
+
+
+def all_districts() -> List:
+    return get_reference().districts
+
+
+def district_by_slug(slug: str):
+    return get_reference().districts_by_slug.get(slug)
+
+
+def district_by_id(pk: int):
+    return get_reference().districts_by_id.get(pk)
+
+
+def beat_by_id(pk: int):
+    return get_reference().beats_by_id.get(pk)
@@ -1,11 +1,37 @@
 from django.contrib.auth import get_user_model
+from django.utils.encoding import smart_str
 from rest_framework import serializers
 
+from . import reference
 from .models import AccountRequest, Beat, District, OfficerProfile
 
 User = get_user_model()
 
 
+class DistrictSlugField(serializers.SlugRelatedField):
+    """District slug field resolved through the in-process reference cache."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("slug_field", "slug")
+        if not kwargs.get("read_only"):
+            kwargs.setdefault("queryset", District.objects.all())
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        # Read the FK id so serializing never loads the related row.
+        return getattr(instance, f"{self.source_attrs[-1]}_id")
+
+    def to_representation(self, value):
+        district = reference.district_by_id(value)
+        return district.slug if district else None
+
+    def to_internal_value(self, data):
+        district = reference.district_by_slug(smart_str(data))
+        if district is None:
+            self.fail("does_not_exist", slug_name=self.slug_field, value=smart_str(data))
+        return district
+
+
 class BeatSerializer(serializers.ModelSerializer):
     class Meta:
         model = Beat
@@ -52,9 +78,7 @@ class OfficerProfileUpdateSerializer(serializers.ModelSerializer):
 
 
 class AccountRequestSerializer(serializers.ModelSerializer):
-    district = serializers.SlugRelatedField(
-        slug_field="slug", queryset=District.objects.all(), allow_null=True, required=False
-    )
+    district = DistrictSlugField(allow_null=True, required=False)
 
     class Meta:
         model = AccountRequest
@@ -0,0 +1,58 @@
+from typing import Dict, List
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+from .models import OfficerProfile
+
+ACCESS_SCOPE_TIMEOUT = 300
+# Attribute the scope is memoized under on the user object.
+ACCESS_SCOPE_ATTR = "_access_scope"
+
+
+def cache_is_shared() -> bool:
+    """Whether every worker process sees the same default cache (e.g. Redis)."""
+    return not isinstance(caches["default"], (LocMemCache, DummyCache))
+
+
+def _access_scope_key(user_id: int) -> str:
+    return f"accounts:access-scope:{user_id}"
+
+
+def get_access_scope(user) -> Dict[str, List[int]]:
+    """
+    District and beat ids assigned to ``user``. They are memoized on the
+    user object, which lives for one request, whatever the cache backend.
+    Across requests they are cached per user until the profile or its
+    assignments change (see ``signals.py``); the signals only reach other
+    workers through a shared cache, so with a per-process cache each request
+    reads the scope from the database once.
+    """
+    if not getattr(user, "is_authenticated", False):
+        return {"districts": [], "beats": []}
+    scope = getattr(user, ACCESS_SCOPE_ATTR, None)
+    if scope is not None:
+        return scope
+    shared = cache_is_shared()
+    key = _access_scope_key(user.pk)
+    scope = cache.get(key) if shared else None
+    if scope is None:
+        districts = OfficerProfile.districts.through.objects.filter(
+            officerprofile__user_id=user.pk
+        ).values_list("district_id", flat=True)
+        beats = OfficerProfile.beats.through.objects.filter(
+            officerprofile__user_id=user.pk
+        ).values_list("beat_id", flat=True)
+        scope = {"districts": sorted(districts), "beats": sorted(beats)}
+        if shared:
+            cache.set(key, scope, ACCESS_SCOPE_TIMEOUT)
+    setattr(user, ACCESS_SCOPE_ATTR, scope)
+    return scope
+
+
+def invalidate_access_scope(user_id: int, user=None):
+    """Drop the cached scope of ``user_id`` (and the memo on ``user``, when loaded)."""
+    cache.delete(_access_scope_key(user_id))
+    if user is not None:
+        user.__dict__.pop(ACCESS_SCOPE_ATTR, None)
@@ -1,8 +1,10 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
 
-from .models import OfficerProfile
+from . import reference
+from .models import Beat, District, OfficerProfile
+from .services import invalidate_access_scope
 
 User = get_user_model()
 
@@ -11,3 +13,36 @@ User = get_user_model()
 def create_profile(sender, instance, created, **kwargs):
     if created:
         OfficerProfile.objects.create(user=instance)
+
+
+def _loaded_user(profile: OfficerProfile):
+    """The profile's user if it is already loaded (and may carry a memoized scope)."""
+    return profile.user if OfficerProfile.user.is_cached(profile) else None
+
+
+@receiver(post_save, sender=OfficerProfile)
+@receiver(post_delete, sender=OfficerProfile)
+def reset_access_scope(sender, instance, **kwargs):
+    invalidate_access_scope(instance.user_id, _loaded_user(instance))
+
+
+@receiver(m2m_changed, sender=OfficerProfile.districts.through)
+@receiver(m2m_changed, sender=OfficerProfile.beats.through)
+def reset_access_scope_on_assignment(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, OfficerProfile):
+        invalidate_access_scope(instance.user_id, _loaded_user(instance))
+    else:
+        # Reverse side (district.officerprofile_set.add(...)): pk_set holds profiles.
+        profiles = OfficerProfile.objects.filter(pk__in=pk_set or [])
+        for user_id in profiles.values_list("user_id", flat=True):
+            invalidate_access_scope(user_id)
+
+
+@receiver(post_save, sender=District)
+@receiver(post_delete, sender=District)
+@receiver(post_save, sender=Beat)
+@receiver(post_delete, sender=Beat)
+def reset_reference_data(sender, **kwargs):
+    reference.invalidate_on_commit()
@@ -1,3 +1,208 @@
-from django.test import TestCase
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection, connections
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apps.uploads.models import DataAsset
+from config.routers import (
+    REPLICA_DB_ALIAS,
+    PrimaryPinningMiddleware,
+    ReadReplicaRouter,
+    replica_reads,
+)
+
+from . import reference
+from .models import Beat, District, OfficerProfile, ReferenceVersion
+from .services import _access_scope_key, get_access_scope
+
+User = get_user_model()
+
+
+def count_queries(func) -> int:
+    cache.clear()
+    reference.invalidate()
+    with CaptureQueriesContext(connection) as context:
+        func()
+    return len(context.captured_queries)
+
+
+def use_shared_cache(test) -> str:
+    """
+    Switch ``test`` to a file cache, which stands in for Redis: every process
+    opening the directory sees the same entries. Returns the directory.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test.addCleanup(directory.cleanup)
+    shared = override_settings(
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": directory.name,
+            }
+        }
+    )
+    shared.enable()
+    test.addCleanup(shared.disable)
+    return directory.name
+
+
+class ProfileQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("officer", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_profile_queries_do_not_grow_with_assignments(self):
+        profile = self.user.profile
+        profile.districts.set(District.objects.all()[:1])
+        few = count_queries(lambda: self.client.get("/api/accounts/profile/"))
+
+        profile.districts.set(District.objects.all())
+        profile.beats.set(Beat.objects.all())
+        many = count_queries(lambda: self.client.get("/api/accounts/profile/"))
+
+        self.assertEqual(few, many)
+
+    def test_district_list_queries_do_not_grow_with_districts(self):
+        few = count_queries(lambda: self.client.get("/api/accounts/districts/"))
+        for idx in range(5):
+            district = District.objects.create(name=f"EXTRA{idx}")
+            Beat.objects.create(district=district, code=f"X{idx}")
+        many = count_queries(lambda: self.client.get("/api/accounts/districts/"))
+        self.assertEqual(few, many)
+
+
+class AccessScopeTests(TestCase):
+    def setUp(self):
+        self.cache_dir = use_shared_cache(self)
+        self.user = User.objects.create_user("analyst", password="secret")
+        self.east = District.objects.get(slug="east")
+        self.west = District.objects.get(slug="west")
+
+    def _fresh_user(self):
+        return User.objects.get(pk=self.user.pk)
+
+    def _assign_elsewhere(self, district):
+        """Assign ``district`` as another worker would: no signals fire in this process."""
+        profile = OfficerProfile.objects.get(user=self.user)
+        OfficerProfile.districts.through.objects.bulk_create(
+            [OfficerProfile.districts.through(officerprofile=profile, district=district)]
+        )
+
+    def test_scope_is_cached_per_user(self):
+        self.user.profile.districts.add(self.east)
+        self.assertEqual(get_access_scope(self._fresh_user())["districts"], [self.east.pk])
+        user = self._fresh_user()
+        with self.assertNumQueries(0):
+            get_access_scope(user)
+
+    def test_assignment_changes_invalidate_scope(self):
+        profile = OfficerProfile.objects.get(user=self.user)
+        profile.districts.add(self.east)
+        get_access_scope(self._fresh_user())
+        profile.districts.add(self.west)
+        self.assertEqual(
+            get_access_scope(self._fresh_user())["districts"],
+            sorted([self.east.pk, self.west.pk]),
+        )
+        self.west.officerprofile_set.remove(profile)
+        self.assertEqual(get_access_scope(self._fresh_user())["districts"], [self.east.pk])
+
+    def test_invalidation_in_another_process_is_seen(self):
+        get_access_scope(self._fresh_user())
+        self._assign_elsewhere(self.east)
+        other_process = FileBasedCache(self.cache_dir, {})
+        other_process.delete(_access_scope_key(self.user.pk))
+        self.assertEqual(get_access_scope(self._fresh_user())["districts"], [self.east.pk])
+
+    def test_scope_is_memoized_on_the_user_with_a_per_process_cache(self):
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            self.user.profile.districts.add(self.east)
+            user = self._fresh_user()
+            get_access_scope(user)
+            with self.assertNumQueries(0):
+                self.assertEqual(get_access_scope(user)["districts"], [self.east.pk])
+            user.profile.districts.add(self.west)
+            self.assertEqual(get_access_scope(user)["districts"], sorted([self.east.pk, self.west.pk]))
+
+    def test_per_process_cache_is_not_used(self):
+        with override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}):
+            get_access_scope(self._fresh_user())
+            self._assign_elsewhere(self.east)
+            self.assertEqual(get_access_scope(self._fresh_user())["districts"], [self.east.pk])
+
+
+class ReferenceCacheTests(TestCase):
+    def setUp(self):
+        use_shared_cache(self)
+
+    def test_lookups_do_not_hit_the_database_once_loaded(self):
+        reference.get_reference()
+        expected = District.objects.count()
+        with self.assertNumQueries(0):
+            self.assertEqual(reference.district_by_slug("east").name, "EAST")
+            self.assertEqual(len(reference.all_districts()), expected)
+
+    def test_saving_a_district_reloads_the_cache(self):
+        reference.get_reference()
+        District.objects.create(name="CENTRAL")
+        self.assertIsNotNone(reference.district_by_slug("central"))
+
+    def test_version_bumped_by_another_process_reloads_without_a_shared_cache(self):
+        local = override_settings(CACHES={"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}})
+        with local, mock.patch.object(reference, "VERSION_CHECK_SECONDS", 0):
+            version = reference.get_reference().version
+            # Another worker's edit: rows and version change, no signal here.
+            District.objects.bulk_create([District(name="CENTRAL", slug="central")])
+            ReferenceVersion.objects.update_or_create(pk=1, defaults={"version": version + 1})
+            self.assertIsNotNone(reference.district_by_slug("central"))
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    databases = {"default"}
+
+    def setUp(self):
+        # A second alias on the same test database, as SQLITE_REPLICA_PATH would add.
+        connections.databases[REPLICA_DB_ALIAS] = dict(connections["default"].settings_dict)
+        self.addCleanup(connections.databases.pop, REPLICA_DB_ALIAS)
+        self.addCleanup(connections.__delitem__, REPLICA_DB_ALIAS)
+        self.addCleanup(lambda: connections[REPLICA_DB_ALIAS].close())
+        self.router = ReadReplicaRouter()
+
+    def test_reads_use_the_replica_until_the_scope_writes(self):
+        self.assertEqual(self.router.db_for_read(District), "default")
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(District), REPLICA_DB_ALIAS)
+            self.assertEqual(self.router.db_for_read(DataAsset), "default")
+            with CaptureQueriesContext(connections[REPLICA_DB_ALIAS]) as replica_queries:
+                self.assertTrue(District.objects.filter(slug="east").exists())
+            self.assertEqual(len(replica_queries), 1)
+            self.router.db_for_write(District)
+            self.assertEqual(self.router.db_for_read(District), "default")
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(District), REPLICA_DB_ALIAS)
+        # Outside a scope (commands, job workers) a write leaves no lasting pin.
+        self.router.db_for_write(District)
+        with replica_reads():
+            self.assertEqual(self.router.db_for_read(District), REPLICA_DB_ALIAS)
+
+    def test_middleware_pins_unsafe_and_writing_requests_only_for_that_request(self):
+        seen = []
+
+        def view(request):
+            if request.GET.get("write"):
+                self.router.db_for_write(District)
+            seen.append(self.router.db_for_read(District))
+
+        middleware = PrimaryPinningMiddleware(view)
+        factory = RequestFactory()
+        for request in [factory.get("/"), factory.post("/"), factory.get("/?write=1"), factory.get("/")]:
+            middleware(request)
+        self.assertEqual(seen, [REPLICA_DB_ALIAS, "default", "default", REPLICA_DB_ALIAS])
+        self.assertEqual(self.router.db_for_read(District), "default")
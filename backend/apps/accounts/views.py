@@ -1,8 +1,10 @@
+from django.db.models import Prefetch
 from django.utils import timezone
 from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from . import reference
 from .models import AccountRequest, Beat, District, OfficerProfile
 from .serializers import (
     AccountRequestReviewSerializer,
@@ -14,21 +16,55 @@ from .serializers import (
 )
 
 
-class DistrictViewSet(viewsets.ReadOnlyModelViewSet):
-    queryset = District.objects.prefetch_related("beats").all()
+class ReferenceDataViewSet(viewsets.ReadOnlyModelViewSet):
+    """Serves list/detail from the in-process reference cache."""
+
+    def reference_items(self):
+        raise NotImplementedError
+
+    def list(self, request, *args, **kwargs):
+        items = self.reference_items()
+        page = self.paginate_queryset(items)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(items, many=True).data)
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = str(kwargs.get(self.lookup_url_kwarg or self.lookup_field))
+        item = next((item for item in self.reference_items() if str(item.pk) == pk), None)
+        if item is None:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(self.get_serializer(item).data)
+
+
+class DistrictViewSet(ReferenceDataViewSet):
+    queryset = District.objects.prefetch_related("beats").order_by("name")
     serializer_class = DistrictSerializer
     permission_classes = [permissions.AllowAny]
 
+    def reference_items(self):
+        return reference.all_districts()
 
-class BeatViewSet(viewsets.ReadOnlyModelViewSet):
+
+class BeatViewSet(ReferenceDataViewSet):
     queryset = Beat.objects.select_related("district").all()
     serializer_class = BeatSerializer
     permission_classes = [permissions.IsAuthenticated]
 
+    def reference_items(self):
+        return list(reference.get_reference().beats_by_id.values())
+
+
+def _profile_queryset():
+    return OfficerProfile.objects.select_related("user").prefetch_related(
+        Prefetch("districts", queryset=District.objects.prefetch_related("beats")),
+        "beats",
+    )
+
 
 class OfficerProfileView(APIView):
     def get(self, request):
-        profile = OfficerProfile.objects.select_related("user").get(user=request.user)
+        profile = _profile_queryset().get(user=request.user)
         return Response(OfficerProfileSerializer(profile).data)
 
     def put(self, request):
@@ -38,13 +74,13 @@ class OfficerProfileView(APIView):
         )
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response(OfficerProfileSerializer(profile).data)
+        return Response(OfficerProfileSerializer(_profile_queryset().get(pk=profile.pk)).data)
 
 
 class AccountRequestViewSet(
     mixins.CreateModelMixin, mixins.ListModelMixin, mixins.UpdateModelMixin, viewsets.GenericViewSet
 ) :
-    queryset = AccountRequest.objects.select_related("district").all()
+    queryset = AccountRequest.objects.all()
     serializer_class = AccountRequestSerializer
 
     def get_permissions(self):
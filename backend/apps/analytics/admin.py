@@ -1,9 +1,14 @@
 from django.contrib import admin
 
-from .models import AnalyticsSnapshot
+from .models import AnalyticsSnapshot, CurrentSnapshot
 
 
 @admin.register(AnalyticsSnapshot)
 class AnalyticsSnapshotAdmin(admin.ModelAdmin):
-    list_display = ("id", "district", "generated_at")
+    list_display = ("id", "district", "generated_at", "archived_at")
     list_filter = ("district",)
+
+
+@admin.register(CurrentSnapshot)
+class CurrentSnapshotAdmin(admin.ModelAdmin):
+    list_display = ("district", "snapshot", "updated_at")
@@ -0,0 +1,204 @@
+"""
+Approximate ("preview") analytics.
+
+Right after an upload, analytics are estimated from a stratified random
+sample instead of the full pipeline: strata are District x Beats x
+Year_Month x violent flag, each sampled at the same rate (at least two rows
+per stratum, so each has a variance estimate), so small beats, months and
+the rare violent class are all represented. Counts are stratified
+estimates (sum of ``N_h / n_h`` weights) and means are stratum-weighted;
+both come with normal-approximation
+confidence intervals from the within-stratum variances, with the finite
+population correction. Because months are strata, monthly counts are
+exact. A logistic regression on the sample stands in for the model stage.
+The exact snapshot is produced by the normal refresh afterwards.
+"""
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .crosstab import encode_column
+
+STRATA_COLUMNS = ["District", "Beats", "Year_Month", "target_binary"]
+Z_95 = 1.959963984540054
+TOP_VALUES = 10
+EDA_NUMERIC_COLUMNS = ["Hour", "Day", "Week_num", "Year", "target_binary"]
+EDA_LABEL_COLUMNS = ["Crime_Category", "Beats", "Day_char", "Description"]
+PIVOTS = {"hourly_breakdown": ("Hour", "Crime_Category"), "beat_vs_weekday": ("Beats", "Day_char")}
+
+
+class Sample(NamedTuple):
+    frame: pd.DataFrame
+    # Stratum of each sampled row.
+    strata: np.ndarray
+    # Rows per stratum in the population and in the sample.
+    population: np.ndarray
+    taken: np.ndarray
+
+
+def stratified_sample(df: pd.DataFrame, size: int, seed: int = 0) -> Sample:
+    columns = [column for column in STRATA_COLUMNS if column in df.columns]
+    if columns and len(df):
+        codes = df.groupby(columns, dropna=False, sort=False).ngroup().to_numpy(np.int64)
+    else:
+        codes = np.zeros(len(df), dtype=np.int64)
+    population = np.bincount(codes) if len(df) else np.zeros(0, dtype=np.int64)
+    fraction = min(1.0, size / len(df)) if len(df) else 1.0
+    taken = np.minimum(population, np.maximum(2, np.round(population * fraction).astype(np.int64)))
+    # Shuffle within strata, then keep the first ``taken`` rows of each.
+    order = np.lexsort((np.random.default_rng(seed).random(len(df)), codes))
+    starts = np.concatenate([[0], np.cumsum(population)[:-1]])
+    rank = np.arange(len(df)) - starts[codes[order]]
+    rows = np.sort(order[rank < taken[codes[order]]])
+    return Sample(df.iloc[rows], codes[rows], population, taken)
+
+
+def _interval(estimate: np.ndarray, variance: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    half = Z_95 * np.sqrt(np.maximum(variance, 0.0))
+    return estimate - half, estimate + half
+
+
+def estimate_counts(sample: Sample, codes: np.ndarray, size: int):
+    """Estimated population rows per code ``0..size-1`` with 95% bounds."""
+    strata_count = len(sample.population)
+    valid = codes >= 0
+    hits = np.bincount(
+        codes[valid] * strata_count + sample.strata[valid], minlength=size * strata_count
+    ).reshape(size, strata_count)
+    N = sample.population.astype(np.float64)
+    n = sample.taken.astype(np.float64)
+    share = hits / n
+    estimate = share @ N
+    # Within-stratum variance of the 0/1 indicator. A single sampled row only
+    # happens for one-row strata, which the finite population correction zeroes.
+    spread = np.where(n > 1, n / np.maximum(n - 1, 1) * share * (1 - share), 0.0)
+    variance = (spread * (N**2 * (1 - n / N) / n)).sum(axis=1)
+    low, high = _interval(estimate, variance)
+    return estimate, np.maximum(low, 0.0), high
+
+
+def estimate_mean(sample: Sample, values: np.ndarray) -> Dict[str, float] | None:
+    present = ~np.isnan(values)
+    if not present.any():
+        return None
+    strata, values = sample.strata[present], values[present]
+    size = len(sample.population)
+    count = np.bincount(strata, minlength=size).astype(np.float64)
+    total = np.bincount(strata, weights=values, minlength=size)
+    squares = np.bincount(strata, weights=values**2, minlength=size)
+    seen = count > 0
+    mean_h = np.divide(total, count, out=np.zeros(size), where=seen)
+    spread = np.divide(
+        squares - count * mean_h**2, count - 1, out=np.zeros(size), where=count > 1
+    )
+    N = sample.population.astype(np.float64)
+    weight = np.where(seen, N, 0.0) / N[seen].sum()
+    fpc = 1 - np.minimum(count / N, 1.0)
+    estimate = float((weight * mean_h).sum())
+    variance = float((weight**2 * fpc * np.divide(spread, count, out=np.zeros(size), where=seen)).sum())
+    low, high = _interval(np.array(estimate), np.array(variance))
+    return {"estimate": estimate, "low": float(low), "high": float(high)}
+
+
+def _count_records(sample: Sample, columns: List[str], top: int | None = None) -> List[Dict[str, Any]]:
+    encoded = [encode_column(sample.frame[column]) for column in columns]
+    codes = np.zeros(len(sample.frame), dtype=np.int64)
+    sizes = [len(labels) for _, labels in encoded]
+    for (column_codes, _), size in zip(encoded, sizes):
+        codes = np.where((codes < 0) | (column_codes < 0), -1, codes * size + column_codes)
+    estimate, low, high = estimate_counts(sample, codes, int(np.prod(sizes)))
+    cells = np.flatnonzero(estimate > 0)
+    if top is not None:
+        cells = cells[np.argsort(-estimate[cells], kind="stable")][:top]
+    records = []
+    for cell in cells:
+        labels = np.unravel_index(cell, sizes)
+        record = {column: _plain(encoded[axis][1][index]) for axis, (column, index) in enumerate(zip(columns, labels))}
+        record.update(
+            estimate=round(float(estimate[cell]), 1),
+            low=round(float(low[cell]), 1),
+            high=round(float(high[cell]), 1),
+        )
+        records.append(record)
+    return records
+
+
+def _plain(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _quick_model(sample: Sample) -> Dict[str, Any]:
+    """Logistic regression on the sample's feature matrix, with 95% bounds on its test metrics."""
+    frame = sample.frame
+    if "target_binary" not in frame.columns or frame["target_binary"].nunique() < 2 or len(frame) < 50:
+        return {"detail": "Not enough labelled rows in the sample for a model."}
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.metrics import accuracy_score, roc_auc_score
+
+    from .services import build_feature_matrix
+
+    features = build_feature_matrix(frame)
+    model = LogisticRegression(max_iter=1000).fit(*features.split("train"))
+    X_test, y_test = features.split("test")
+    n = len(y_test)
+    accuracy = float(accuracy_score(y_test, model.predict(X_test)))
+    accuracy_se = np.sqrt(accuracy * (1 - accuracy) / n)
+    metrics: Dict[str, Any] = {
+        "accuracy": {
+            "estimate": accuracy,
+            "low": max(0.0, float(accuracy - Z_95 * accuracy_se)),
+            "high": min(1.0, float(accuracy + Z_95 * accuracy_se)),
+        }
+    }
+    positives, negatives = int(y_test.sum()), int(n - y_test.sum())
+    if positives and negatives:
+        auc = float(roc_auc_score(y_test, model.predict_proba(X_test)[:, 1]))
+        # Hanley & McNeil (1982) standard error of the AUC.
+        q1, q2 = auc / (2 - auc), 2 * auc**2 / (1 + auc)
+        auc_se = np.sqrt(
+            (auc * (1 - auc) + (positives - 1) * (q1 - auc**2) + (negatives - 1) * (q2 - auc**2))
+            / (positives * negatives)
+        )
+        metrics["roc_auc"] = {
+            "estimate": auc,
+            "low": max(0.0, float(auc - Z_95 * auc_se)),
+            "high": min(1.0, float(auc + Z_95 * auc_se)),
+        }
+    return {"name": "Logistic Regression (sample)", "test_rows": n, "metrics": metrics}
+
+
+def compute_preview_payload(df: pd.DataFrame, sample_rows: int, seed: int = 0) -> Dict[str, Any]:
+    """Approximate EDA, count tables and model metrics for the prepared frame ``df``."""
+    started = time.perf_counter()
+    sample = stratified_sample(df, sample_rows, seed)
+    eda: Dict[str, Any] = {}
+    for column in EDA_NUMERIC_COLUMNS:
+        if column in sample.frame.columns and pd.api.types.is_numeric_dtype(sample.frame[column]):
+            mean = estimate_mean(sample, sample.frame[column].to_numpy(np.float64, na_value=np.nan))
+            if mean is not None:
+                eda[column] = {"mean": mean}
+    for column in EDA_LABEL_COLUMNS:
+        if column in sample.frame.columns:
+            eda.setdefault(column, {})["top_values"] = _count_records(sample, [column], top=TOP_VALUES)
+    return {
+        "approximate": True,
+        "confidence": 0.95,
+        "sample": {
+            "rows": len(sample.frame),
+            "population": len(df),
+            "strata": len(sample.population),
+            "strata_columns": [column for column in STRATA_COLUMNS if column in df.columns],
+        },
+        "eda": eda,
+        "monthly_counts": _count_records(sample, ["Year_Month"]) if "Year_Month" in df.columns else [],
+        **{
+            name: _count_records(sample, list(columns)) if set(columns) <= set(df.columns) else []
+            for name, columns in PIVOTS.items()
+        },
+        "model": _quick_model(sample),
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
@@ -0,0 +1,160 @@
+"""
+Cross-tabulation on category codes.
+
+Every dimension is turned into int64 codes over its sorted labels (the
+codes of a categorical column are reused, reordered; numeric columns can be
+cut into bins), and a table of up to ``MAX_DIMENSIONS`` dimensions is one
+``np.bincount`` over the combined code. Rows missing any dimension are left
+out and only labels that occur are kept, as ``pivot_table`` does; the
+snapshot's month, hour-by-category and beat-by-weekday tables are built
+this way too.
+"""
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MAX_DIMENSIONS = 3
+MAX_CELLS = 250_000
+MAX_BINS = 100
+MODULE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+
+
+class CrossTabError(ValueError):
+    """The requested cross-tab is not valid for the data."""
+
+
+def bin_edges(series: pd.Series, spec: str | int) -> np.ndarray:
+    """``spec`` is a bin count (equal width over the data) or comma-separated edges."""
+    if not pd.api.types.is_numeric_dtype(series):
+        raise CrossTabError(f"Column '{series.name}' is not numeric and cannot be binned.")
+    try:
+        if isinstance(spec, str) and "," in spec:
+            edges = np.array(sorted({float(edge) for edge in spec.split(",") if edge.strip()}))
+        else:
+            count = int(spec)
+            if not 1 <= count <= MAX_BINS:
+                raise CrossTabError(f"Use between 1 and {MAX_BINS} bins.")
+            values = series.dropna()
+            low, high = (float(values.min()), float(values.max())) if len(values) else (0.0, 1.0)
+            edges = np.linspace(low, high if high > low else low + 1, count + 1)
+    except ValueError as exc:
+        if isinstance(exc, CrossTabError):
+            raise
+        raise CrossTabError(f"Invalid bins '{spec}'. Use a count or comma-separated edges.") from None
+    if len(edges) < 2:
+        raise CrossTabError("Binning needs at least two edges.")
+    return edges
+
+
+def _bin_labels(edges: np.ndarray) -> List[str]:
+    def fmt(value: float) -> str:
+        return f"{value:g}"
+
+    return [
+        f"[{fmt(low)}, {fmt(high)}{']' if index == len(edges) - 2 else ')'}"
+        for index, (low, high) in enumerate(zip(edges[:-1], edges[1:]))
+    ]
+
+
+def encode_column(series: pd.Series, edges: np.ndarray | None = None) -> Tuple[np.ndarray, List[Any]]:
+    """``(codes, labels)``: int64 codes into sorted ``labels``, -1 where missing."""
+    if edges is not None:
+        values = series.to_numpy(dtype=np.float64, na_value=np.nan)
+        codes = np.searchsorted(edges, values, side="right") - 1
+        # The last bin is closed; everything else outside the edges is dropped.
+        codes[values == edges[-1]] = len(edges) - 2
+        codes[(codes < 0) | (codes > len(edges) - 2) | np.isnan(values)] = -1
+        return codes.astype(np.int64), _bin_labels(edges)
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        categories = series.cat.categories
+        order = np.argsort(categories.to_numpy(), kind="stable")
+        rank = np.empty(len(order) + 1, dtype=np.int64)
+        rank[order] = np.arange(len(order))
+        rank[-1] = -1  # code -1 (missing) indexes the last slot
+        return rank[series.cat.codes.to_numpy()], categories[order].tolist()
+    codes, uniques = pd.factorize(series, sort=True)
+    return codes.astype(np.int64), uniques.tolist()
+
+
+def crosstab_counts(
+    encoded: Sequence[Tuple[np.ndarray, List[Any]]], weights: np.ndarray | None = None
+) -> Tuple[np.ndarray, List[List[Any]]]:
+    """
+    Count rows per combination of the encoded dimensions (summing
+    ``weights`` instead when given). Labels with no rows are dropped.
+    """
+    sizes = [len(labels) for _, labels in encoded]
+    if int(np.prod(sizes, dtype=np.float64)) > MAX_CELLS:
+        raise CrossTabError(f"The table would have more than {MAX_CELLS:,} cells; bin or pick fewer dimensions.")
+    valid = np.logical_and.reduce([codes >= 0 for codes, _ in encoded])
+    key = np.zeros(int(valid.sum()), dtype=np.int64)
+    for (codes, _), size in zip(encoded, sizes):
+        key = key * size + codes[valid]
+    shape = tuple(sizes)
+    cells = int(np.prod(shape))
+    present = np.bincount(key, minlength=cells).reshape(shape)
+    counts = present if weights is None else np.bincount(key, weights=weights[valid], minlength=cells).reshape(shape)
+    kept_labels = []
+    for axis, (_, labels) in enumerate(encoded):
+        other_axes = tuple(index for index in range(len(shape)) if index != axis)
+        keep = present.sum(axis=other_axes) > 0
+        counts = np.compress(keep, counts, axis=axis)
+        present = np.compress(keep, present, axis=axis)
+        kept_labels.append([label for label, kept in zip(labels, keep) if kept])
+    return counts.astype(np.int64), kept_labels
+
+
+def _count_weights(df: pd.DataFrame, count_column: str | None) -> np.ndarray | None:
+    return None if count_column is None else df[count_column].notna().to_numpy(np.int64)
+
+
+def count_records(df: pd.DataFrame, column: str) -> List[Dict[str, Any]]:
+    """``groupby(column).size()`` records, sorted by ``column``."""
+    counts, (labels,) = crosstab_counts([encode_column(df[column])])
+    return pd.DataFrame({column: pd.Index(labels, dtype=df[column].dtype), "count": counts}).to_dict(
+        orient="records"
+    )
+
+
+def pivot_records(
+    df: pd.DataFrame, index: str, columns: str, count_column: str | None = None
+) -> List[Dict[str, Any]]:
+    """
+    The ``pivot_table(index, columns, values=count_column, aggfunc="count",
+    fill_value=0).reset_index()`` records.
+    """
+    counts, (rows, cols) = crosstab_counts(
+        [encode_column(df[index]), encode_column(df[columns])], _count_weights(df, count_column)
+    )
+    if not rows:
+        return []
+    frame = pd.DataFrame(counts, index=pd.Index(rows, name=index, dtype=df[index].dtype), columns=cols)
+    return frame.reset_index().to_dict(orient="records")
+
+
+def crosstab_payload(df: pd.DataFrame, dimensions: List[str], bins: Dict[str, str] | None = None) -> Dict[str, Any]:
+    """Counts over ``dimensions`` of ``df`` as nested lists plus the labels of each axis."""
+    bins = bins or {}
+    if not 1 <= len(dimensions) <= MAX_DIMENSIONS or len(set(dimensions)) != len(dimensions):
+        raise CrossTabError(f"Pick between 1 and {MAX_DIMENSIONS} distinct dimensions.")
+    encoded = [
+        encode_column(df[column], bin_edges(df[column], bins[column]) if column in bins else None)
+        for column in dimensions
+    ]
+    counts, labels = crosstab_counts(encoded)
+    return {
+        "dimensions": dimensions,
+        "bins": {column: spec for column, spec in bins.items() if column in dimensions},
+        "labels": {column: [_plain(label) for label in axis] for column, axis in zip(dimensions, labels)},
+        "counts": counts.tolist(),
+        "total": int(counts.sum()),
+    }
+
+
+def _plain(value: Any) -> Any:
+    return value.item() if isinstance(value, np.generic) else value
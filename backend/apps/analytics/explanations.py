@@ -0,0 +1,167 @@
+"""
+Model explanations by source column.
+
+One-hot encoding splits ``Beats`` or ``Year_Month`` over dozens of features,
+so impurity importances and coefficients per feature understate them. Here
+every feature of a source column is permuted together (rows shuffled as a
+block), on a bounded sample of the validation split:
+
+- the drop in the model's score is that column's permutation importance;
+- the change in each row's predicted probability, averaged over the
+  repeats, is the column's contribution to that prediction.
+
+Columns are scored in parallel with joblib. The result is written next to
+the dataset's feature matrix in the feature store.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Sequence
+
+import numpy as np
+from django.conf import settings
+
+if TYPE_CHECKING:
+    from .feature_store import FeatureMatrix
+
+MODULE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+EXAMPLE_COUNT = 10
+EXAMPLE_CONTRIBUTIONS = 5
+
+
+def parameters() -> Dict[str, int]:
+    return {
+        "sample_rows": settings.EXPLANATION_SAMPLE_ROWS,
+        "repeats": max(1, settings.EXPLANATION_REPEATS),
+    }
+
+
+def cache_version() -> str:
+    """Changes with this module or the configured sample size and repeats."""
+    params = json.dumps(parameters(), sort_keys=True).encode()
+    return f"{MODULE_VERSION}-{hashlib.sha256(params).hexdigest()[:8]}"
+
+
+def explanations_path(store_path: Path) -> Path:
+    return store_path / f"explanations-{cache_version()}.json"
+
+
+def _score(y: np.ndarray, probabilities: np.ndarray) -> float:
+    from sklearn.metrics import accuracy_score, roc_auc_score
+
+    if len(np.unique(y)) > 1:
+        return float(roc_auc_score(y, probabilities))
+    return float(accuracy_score(y, probabilities >= 0.5))
+
+
+def _permuted_probabilities(estimator, X: np.ndarray, columns: np.ndarray, repeats: int, seed: int) -> np.ndarray:
+    """Positive-class probabilities with ``columns`` shuffled as a block, one row per repeat."""
+    rng = np.random.default_rng(seed)
+    permuted = X.copy()
+    probabilities = np.empty((repeats, len(X)))
+    for repeat in range(repeats):
+        permuted[:, columns] = X[rng.permutation(len(X))][:, columns]
+        probabilities[repeat] = estimator.predict_proba(permuted)[:, 1]
+    return probabilities
+
+
+def explain_model(
+    estimator,
+    features: FeatureMatrix,
+    labels: Sequence[Any] | None = None,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Grouped permutation importances and per-prediction contribution
+    summaries for a fitted binary classifier. ``labels`` (one per row of
+    the matrix, e.g. case numbers) identify the example predictions.
+    """
+    from joblib import Parallel, delayed
+
+    params = parameters()
+    validation = np.asarray(features.splits["validation"])
+    rng = np.random.default_rng(seed)
+    if len(validation) > params["sample_rows"]:
+        validation = np.sort(rng.choice(validation, params["sample_rows"], replace=False))
+    X = features.matrix[validation].toarray()
+    y = np.asarray(features.target)[validation]
+    sources = np.asarray(features.feature_sources)
+    groups = {source: np.flatnonzero(sources == source) for source in dict.fromkeys(features.feature_sources)}
+
+    baseline = estimator.predict_proba(X)[:, 1]
+    baseline_score = _score(y, baseline)
+    permuted = Parallel(n_jobs=settings.EXPLANATION_WORKERS)(
+        delayed(_permuted_probabilities)(estimator, X, columns, params["repeats"], seed + index)
+        for index, columns in enumerate(groups.values())
+    )
+    # contributions[g, i]: how much column g moved row i's probability.
+    contributions = np.stack([baseline - probabilities.mean(axis=0) for probabilities in permuted])
+    importances = []
+    for source, probabilities in zip(groups, permuted):
+        drops = baseline_score - np.array([_score(y, repeat) for repeat in probabilities])
+        importances.append(
+            {
+                "feature": source,
+                "importance": round(float(drops.mean()), 5),
+                "std": round(float(drops.std()), 5),
+                "encoded_features": int(len(groups[source])),
+            }
+        )
+    importances.sort(key=lambda item: item["importance"], reverse=True)
+
+    strongest = np.abs(contributions).argmax(axis=0)
+    summaries = [
+        {
+            "feature": source,
+            "mean_abs": round(float(np.abs(row).mean()), 5),
+            "mean": round(float(row.mean()), 5),
+            "p90_abs": round(float(np.quantile(np.abs(row), 0.9)), 5),
+            "raises_share": round(float((row > 0).mean()), 4),
+            "top_share": round(float((strongest == index).mean()), 4),
+        }
+        for index, (source, row) in enumerate(zip(groups, contributions))
+    ]
+    summaries.sort(key=lambda item: item["mean_abs"], reverse=True)
+
+    names = list(groups)
+    examples = []
+    for position in np.argsort(-baseline, kind="stable")[:EXAMPLE_COUNT]:
+        row = contributions[:, position]
+        top = np.argsort(-np.abs(row), kind="stable")[:EXAMPLE_CONTRIBUTIONS]
+        label = labels[validation[position]] if labels is not None else int(validation[position])
+        examples.append(
+            {
+                "row": label.item() if isinstance(label, np.generic) else label,
+                "probability": round(float(baseline[position]), 4),
+                "actual": int(y[position]),
+                "contributions": [
+                    {"feature": names[index], "contribution": round(float(row[index]), 5)} for index in top
+                ],
+            }
+        )
+    return {
+        "metric": "roc_auc" if len(np.unique(y)) > 1 else "accuracy",
+        "baseline_score": round(baseline_score, 5),
+        "sample_rows": int(len(validation)),
+        "repeats": params["repeats"],
+        "permutation_importances": importances,
+        "contributions": summaries,
+        "examples": examples,
+    }
+
+
+def save_explanations(store_path: Path, explanations: List[Dict[str, Any]]) -> None:
+    path = explanations_path(store_path)
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    tmp_path.write_text(json.dumps({"models": explanations}))
+    os.replace(tmp_path, path)
+
+
+def load_explanations(store_path: Path) -> Dict[str, Any] | None:
+    path = explanations_path(store_path)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
@@ -0,0 +1,117 @@
+"""
+Feature store.
+
+The encoded model inputs of a dataset version (a sparse CSR matrix, the
+feature names and the source column of each feature, the target and the
+train/validation/test row split) are written once under
+``MEDIA_ROOT/cache/feature_store/<code version>/<dataset key>/`` as plain
+``.npy`` arrays. Loading memory-maps them, so training, scoring,
+explanations and anomaly detection share the same matrix without copying
+or re-encoding it; the fitted preprocessor is stored next to it for
+transforming new rows.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from django.conf import settings
+from scipy import sparse
+
+STORE_DIR_NAME = "feature_store"
+MATRIX_ARRAYS = ("data", "indices", "indptr")
+
+
+@dataclass
+class FeatureMatrix:
+    matrix: sparse.csr_matrix
+    feature_names: List[str]
+    # Source column of each feature (one-hot features map to their column).
+    feature_sources: List[str]
+    target: np.ndarray
+    splits: Dict[str, np.ndarray]
+    preprocessor: object = None
+    path: Path | None = field(default=None, compare=False)
+
+    def split(self, name: str):
+        rows = self.splits[name]
+        return self.matrix[rows], self.target[rows]
+
+    def dense_columns(self, names: List[str]) -> np.ndarray:
+        """Dense copy of the named features (missing names are skipped)."""
+        indexes = [self.feature_names.index(name) for name in names if name in self.feature_names]
+        return self.matrix[:, indexes].toarray()
+
+    def load_preprocessor(self):
+        if self.preprocessor is None and self.path is not None:
+            import joblib
+
+            self.preprocessor = joblib.load(self.path / "preprocessor.joblib")
+        return self.preprocessor
+
+    def transform(self, frame) -> sparse.csr_matrix:
+        """Encode new rows with the preprocessor fitted for this matrix."""
+        return sparse.csr_matrix(self.load_preprocessor().transform(frame))
+
+
+def store_path(version: str, dataset_key: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / "cache" / STORE_DIR_NAME / version / dataset_key
+
+
+def save_feature_matrix(features: FeatureMatrix, path: Path) -> FeatureMatrix:
+    """Write ``features`` to ``path`` (atomically) and return the memory-mapped copy."""
+    import joblib
+
+    tmp_path = path.with_name(f"{path.name}.tmp-{os.getpid()}")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    matrix = features.matrix
+    for name in MATRIX_ARRAYS:
+        np.save(tmp_path / f"{name}.npy", getattr(matrix, name))
+    np.save(tmp_path / "target.npy", features.target)
+    for name, rows in features.splits.items():
+        np.save(tmp_path / f"split_{name}.npy", rows)
+    joblib.dump(features.preprocessor, tmp_path / "preprocessor.joblib")
+    (tmp_path / "meta.json").write_text(
+        json.dumps(
+            {
+                "shape": list(matrix.shape),
+                "feature_names": features.feature_names,
+                "feature_sources": features.feature_sources,
+                "splits": list(features.splits),
+            }
+        )
+    )
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another worker stored the same version first; keep theirs.
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return load_feature_matrix(path) or features
+
+
+def load_feature_matrix(path: Path) -> FeatureMatrix | None:
+    meta_path = path / "meta.json"
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text())
+
+    def mapped(name: str) -> np.ndarray:
+        return np.load(path / f"{name}.npy", mmap_mode="r")
+
+    matrix = sparse.csr_matrix(
+        tuple(mapped(name) for name in MATRIX_ARRAYS), shape=tuple(meta["shape"]), copy=False
+    )
+    return FeatureMatrix(
+        matrix=matrix,
+        feature_names=meta["feature_names"],
+        feature_sources=meta["feature_sources"],
+        target=mapped("target"),
+        splits={name: mapped(f"split_{name}") for name in meta["splits"]},
+        path=path,
+    )
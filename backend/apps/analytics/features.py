@@ -0,0 +1,166 @@
+"""
+Rolling-window temporal features.
+
+For every incident, per beat and per crime category: the number of earlier
+incidents in the same group within the last 7/28/90 days, days since the
+group's previous incident, and the change in the 28-day count against the
+same 28 days a year earlier. All groups are laid out on one sorted int64 key
+(``group * stride + seconds``, with ``stride`` wider than the data span plus
+the longest look-back), so every feature is a ``searchsorted`` difference
+over that array: no per-row or per-group Python loops. Results are cached as
+parquet per dataset version and feature-code version.
+"""
+from __future__ import annotations
+
+import hashlib
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+TIME_COLUMN = "Date/Time Occurred"
+ROLLING_WINDOWS = (7, 28, 90)
+YOY_WINDOW = 28
+FEATURE_GROUPS = {"beat": "Beats", "category": "Crime_Category"}
+DAY_SECONDS = 86_400
+YEAR_SECONDS = 365 * DAY_SECONDS
+LOOKBACK_SECONDS = YEAR_SECONDS + max(ROLLING_WINDOWS + (YOY_WINDOW,)) * DAY_SECONDS
+FEATURE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+
+
+def feature_columns(prefix: str) -> List[str]:
+    return [f"{prefix}_count_{window}d" for window in ROLLING_WINDOWS] + [
+        f"{prefix}_days_since_last",
+        f"{prefix}_yoy_delta_{YOY_WINDOW}d",
+    ]
+
+
+FEATURE_COLUMNS = [column for prefix in FEATURE_GROUPS for column in feature_columns(prefix)]
+
+
+def _seconds(times: pd.Series) -> np.ndarray:
+    """Epoch seconds as float64, NaN for missing timestamps."""
+    times = pd.to_datetime(times)
+    seconds = times.to_numpy("datetime64[s]").astype(np.int64).astype(np.float64)
+    seconds[times.isna().to_numpy()] = np.nan
+    return seconds
+
+
+def group_window_features(seconds: np.ndarray, codes: np.ndarray, prefix: str) -> Dict[str, np.ndarray]:
+    """
+    Rolling features for rows at ``seconds`` in groups ``codes`` (-1 or NaN
+    time: no features). Windows cover ``[t - window, t)``, so an incident
+    never counts itself or anything at the same instant.
+    """
+    size = len(seconds)
+    out = {name: np.full(size, np.nan) for name in feature_columns(prefix)}
+    valid = (codes >= 0) & ~np.isnan(seconds)
+    if not valid.any():
+        return out
+    rows = np.flatnonzero(valid)
+    offsets = seconds[rows].astype(np.int64)
+    offsets -= offsets.min()
+    stride = int(offsets.max()) + LOOKBACK_SECONDS + 1
+    keys = codes[rows].astype(np.int64) * stride + offsets
+    # Work in key order: the look-up points are then sorted too, which keeps
+    # ``searchsorted`` cache-friendly (several times faster than random order).
+    order = np.argsort(keys, kind="stable")
+    rows, offsets, keys = rows[order], offsets[order], keys[order]
+    group_start = keys - offsets
+
+    def before(points: np.ndarray) -> np.ndarray:
+        return np.searchsorted(keys, points, side="left")
+
+    at = before(keys)
+    for window in ROLLING_WINDOWS:
+        out[f"{prefix}_count_{window}d"][rows] = at - before(keys - window * DAY_SECONDS)
+
+    previous = keys[np.maximum(at - 1, 0)]
+    has_previous = (at > 0) & (previous >= group_start)
+    out[f"{prefix}_days_since_last"][rows] = np.where(
+        has_previous, (keys - previous) / DAY_SECONDS, np.nan
+    )
+
+    window = YOY_WINDOW * DAY_SECONDS
+    recent = at - before(keys - window)
+    year_ago = before(keys - YEAR_SECONDS) - before(keys - YEAR_SECONDS - window)
+    # Undefined until the data covers the whole window a year back.
+    covered = offsets >= YEAR_SECONDS + window
+    out[f"{prefix}_yoy_delta_{YOY_WINDOW}d"][rows] = np.where(covered, recent - year_ago, np.nan)
+    return out
+
+
+def compute_rolling_features(df: pd.DataFrame) -> pd.DataFrame:
+    """Feature columns for ``df`` (same index); empty when it has no timestamps."""
+    if TIME_COLUMN not in df.columns:
+        return pd.DataFrame(index=df.index)
+    seconds = _seconds(df[TIME_COLUMN])
+    columns: Dict[str, np.ndarray] = {}
+    for prefix, column in FEATURE_GROUPS.items():
+        if column not in df.columns:
+            continue
+        codes, _ = pd.factorize(df[column])
+        columns.update(group_window_features(seconds, codes, prefix))
+    return pd.DataFrame(columns, index=df.index)
+
+
+def _feature_cache_path(dataset_key: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / "cache" / "features" / FEATURE_VERSION / f"{dataset_key}.parquet"
+
+
+def add_rolling_features(df: pd.DataFrame, dataset_key: str | None = None) -> pd.DataFrame:
+    """
+    ``df`` with the rolling feature columns appended. With a ``dataset_key``
+    the features are read from (or written to) the per-version cache.
+    """
+    path = _feature_cache_path(dataset_key) if dataset_key else None
+    features = None
+    if path is not None and path.exists():
+        features = pd.read_parquet(path)
+        if len(features) != len(df):
+            features = None
+    if features is None:
+        features = compute_rolling_features(df)
+        if path is not None and not features.empty:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(".tmp")
+            features.reset_index(drop=True).to_parquet(tmp_path, index=False)
+            tmp_path.replace(path)
+    if features.empty:
+        return df
+    features.index = df.index
+    return pd.concat([df, features], axis=1)
+
+
+def beat_activity(df: pd.DataFrame) -> List[Dict]:
+    """
+    Per beat, as of the latest incident in ``df``: incidents in the last
+    7/28/90 days, days since the beat's last incident and the 28-day change
+    against the same period a year earlier.
+    """
+    if not {TIME_COLUMN, "Beats"} <= set(df.columns) or df.empty:
+        return []
+    seconds = _seconds(df[TIME_COLUMN])
+    if np.isnan(seconds).all():
+        return []
+    codes, beats = pd.factorize(df["Beats"], sort=True)
+    # One query row per beat, a second after the newest incident, so the
+    # half-open windows include everything up to and at that instant.
+    query = np.full(len(beats), np.nanmax(seconds) + 1)
+    features = group_window_features(
+        np.concatenate([seconds, query]),
+        np.concatenate([codes, np.arange(len(beats))]),
+        "beat",
+    )
+    # Each query row sits alone at that instant in its beat's group, so it
+    # never counts itself; only the query rows are read back.
+    rows = slice(len(seconds), None)
+    table = pd.DataFrame(
+        {
+            "Beats": beats,
+            **{name.removeprefix("beat_"): values[rows] for name, values in features.items()},
+        }
+    )
+    return table.replace({np.nan: None}).to_dict(orient="records")
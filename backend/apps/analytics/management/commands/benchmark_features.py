@@ -0,0 +1,67 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from apps.analytics.features import TIME_COLUMN, compute_rolling_features
+
+
+def synthetic_incidents(rows: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2022-01-01T00:00:00")
+    seconds = rng.integers(0, 3 * 365 * 86_400, rows)
+    return pd.DataFrame(
+        {
+            TIME_COLUMN: start + seconds.astype("timedelta64[s]"),
+            "Beats": rng.choice(np.arange(110, 490, 10), rows),
+            "Crime_Category": rng.choice([f"Category {i}" for i in range(20)], rows),
+        }
+    )
+
+
+def pandas_rolling_count(df: pd.DataFrame, days: int) -> pd.Series:
+    """Reference: ``groupby().rolling()`` count over ``[t - days, t)``."""
+    ordered = df.assign(one=1.0).sort_values(["Beats", TIME_COLUMN], kind="stable")
+    counts = (
+        ordered.groupby("Beats")
+        .rolling(f"{days}D", on=TIME_COLUMN, closed="left")["one"]
+        .sum()
+        .fillna(0)
+    )
+    return pd.Series(counts.to_numpy(), index=ordered.index).reindex(df.index)
+
+
+class Command(BaseCommand):
+    help = "Time the rolling-window feature stage on synthetic incidents."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=3, help="Runs (median reported).")
+        parser.add_argument(
+            "--baseline",
+            action="store_true",
+            help="Also time pandas groupby().rolling() for the beat 28-day count and compare.",
+        )
+
+    def handle(self, *args, **options):
+        df = synthetic_incidents(options["rows"])
+        timings = []
+        for _ in range(options["repeat"]):
+            start = time.perf_counter()
+            features = compute_rolling_features(df)
+            timings.append(time.perf_counter() - start)
+        timings.sort()
+        self.stdout.write(
+            f"{len(df):,} rows, {len(features.columns)} features: "
+            f"{timings[len(timings) // 2] * 1000:.0f} ms (median of {len(timings)})"
+        )
+        if options["baseline"]:
+            start = time.perf_counter()
+            expected = pandas_rolling_count(df, 28)
+            elapsed = time.perf_counter() - start
+            mismatched = int((features["beat_count_28d"] != expected).sum())
+            self.stdout.write(
+                f"pandas groupby().rolling() beat_count_28d only: {elapsed * 1000:.0f} ms; "
+                f"rows differing: {mismatched}"
+            )
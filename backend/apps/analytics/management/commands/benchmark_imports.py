@@ -0,0 +1,67 @@
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+WORKER_BOOT = (
+    "from config.wsgi import application\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+)
+SCENARIOS = {
+    "worker boot": ["-c", WORKER_BOOT],
+    "manage.py check": ["manage.py", "check"],
+}
+WATCHED = ("sklearn", "scipy", "pandas", "pyarrow", "numpy")
+
+
+def _parse_importtime(stderr: str):
+    """Sum self time (µs) per top-level package from ``-X importtime`` output."""
+    per_package = defaultdict(int)
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        package = name.strip().split(".")[0]
+        per_package[package] += int(self_us)
+        total += int(self_us)
+    return total, per_package
+
+
+class Command(BaseCommand):
+    help = "Measure import time of a worker boot and `manage.py check` with `python -X importtime`."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario (median reported).")
+        parser.add_argument("--top", type=int, default=8, help="Packages listed per scenario.")
+
+    def handle(self, *args, **options):
+        for label, argv in SCENARIOS.items():
+            runs = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                result = subprocess.run(
+                    [sys.executable, "-X", "importtime", *argv],
+                    cwd=settings.BASE_DIR,
+                    capture_output=True,
+                    text=True,
+                )
+                wall = time.perf_counter() - start
+                total, per_package = _parse_importtime(result.stderr)
+                runs.append((wall, total, per_package))
+            runs.sort(key=lambda run: run[0])
+            wall, total, per_package = runs[len(runs) // 2]
+            loaded = [name for name in WATCHED if name in per_package]
+            self.stdout.write(
+                f"{label}: {wall * 1000:.0f} ms wall, {total / 1000:.0f} ms importing; "
+                f"heavy modules: {', '.join(loaded) or 'none'}"
+            )
+            top = sorted(per_package.items(), key=lambda item: item[1], reverse=True)[: options["top"]]
+            for package, micros in top:
+                self.stdout.write(f"  {package:<24}{micros / 1000:>8.1f} ms")
@@ -0,0 +1,58 @@
+import gzip
+import json
+import time
+
+import pyarrow as pa
+from django.core.management.base import BaseCommand
+
+from apps.analytics.renderers import dumps, from_columnar, records_to_arrow, to_columnar
+from apps.analytics.serializers import AnalyticsSnapshotSerializer
+from apps.analytics.services import EXPORTABLE_TABLES, latest_snapshot_for_district, snapshot_table_records
+
+
+def _timed(func, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2] * 1000
+
+
+class Command(BaseCommand):
+    help = "Compare payload bytes and decode time of records JSON, columnar JSON and Arrow IPC."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--district", default="east", help="District slug with a snapshot.")
+        parser.add_argument("--repeat", type=int, default=20, help="Timing repetitions (median reported).")
+
+    def handle(self, *args, **options):
+        snapshot = latest_snapshot_for_district(options["district"])
+        if snapshot is None:
+            raise SystemExit(f"No snapshot for district {options['district']}.")
+        repeat = options["repeat"]
+        payloads = {"snapshot": AnalyticsSnapshotSerializer(snapshot).data}
+        for table in EXPORTABLE_TABLES:
+            payloads[table] = snapshot_table_records(snapshot, table)
+
+        header = f"{'payload':<18}{'format':<10}{'bytes':>10}{'gzip':>10}{'decode ms':>11}"
+        self.stdout.write(header)
+        self.stdout.write("-" * len(header))
+        for name, data in payloads.items():
+            records = dumps(data)
+            columnar = dumps(to_columnar(data))
+            rows = [
+                ("records", records, lambda: json.loads(records)),
+                ("columnar", columnar, lambda: from_columnar(json.loads(columnar))),
+            ]
+            if isinstance(data, list) and data:
+                arrow = records_to_arrow(data)
+                rows.append(
+                    ("arrow", arrow, lambda: pa.ipc.open_stream(arrow).read_all().to_pydict())
+                )
+            for label, body, decode in rows:
+                self.stdout.write(
+                    f"{name:<18}{label:<10}{len(body):>10}{len(gzip.compress(body)):>10}"
+                    f"{_timed(decode, repeat):>11.3f}"
+                )
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.analytics.services import compact_snapshots
+
+
+class Command(BaseCommand):
+    help = "Archive payloads of old analytics snapshots to storage, keeping the newest per district."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--keep",
+            type=int,
+            default=settings.SNAPSHOT_RETENTION_COUNT,
+            help="Snapshots per district that keep their payloads in the database.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="List snapshots without archiving.")
+
+    def handle(self, *args, **options):
+        archived = compact_snapshots(options["keep"], dry_run=options["dry_run"])
+        verb = "Would archive" if options["dry_run"] else "Archived"
+        for snapshot in archived:
+            self.stdout.write(f"{verb} {snapshot.id} ({snapshot.generated_at:%Y-%m-%d %H:%M})")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(archived)} snapshot(s)."))
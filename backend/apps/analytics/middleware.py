@@ -0,0 +1,47 @@
+import re
+
+from django.middleware.gzip import GZipMiddleware as DjangoGZipMiddleware
+from django.utils.cache import patch_vary_headers
+
+QVALUE_PATTERN = re.compile(r"(?:^|;)\s*q\s*=\s*([0-9.]+)\s*(?:;|$)")
+
+
+def accepts_gzip(request) -> bool:
+    """
+    Whether the request's ``Accept-Encoding`` allows gzip. Unlike a plain
+    substring test, ``gzip;q=0`` is a refusal; ``*`` covers gzip when it is
+    not listed itself.
+    """
+    weights = {}
+    for part in request.headers.get("Accept-Encoding", "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        match = QVALUE_PATTERN.search(params)
+        try:
+            weights[coding] = float(match.group(1)) if match else 1.0
+        except ValueError:
+            weights[coding] = 0.0
+    if "gzip" in weights:
+        return weights["gzip"] > 0
+    return weights.get("*", 0.0) > 0
+
+
+class GZipMiddleware(DjangoGZipMiddleware):
+    """
+    Compress API responses for clients that accept gzip (q-values honoured),
+    except byte-range capable downloads (their ``Range`` offsets refer to the
+    uncompressed file) and event streams, which must reach the client as each
+    event is written.
+    """
+
+    def process_response(self, request, response):
+        if response.get("Accept-Ranges") == "bytes":
+            return response
+        if response.get("Content-Type", "").startswith("text/event-stream"):
+            return response
+        if not accepts_gzip(request):
+            patch_vary_headers(response, ("Accept-Encoding",))
+            return response
+        return super().process_response(request, response)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticssnapshot',
+            name='encoded_payload',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def point_at_latest_snapshots(apps, schema_editor):
+    AnalyticsSnapshot = apps.get_model("analytics", "AnalyticsSnapshot")
+    CurrentSnapshot = apps.get_model("analytics", "CurrentSnapshot")
+    for district_id in AnalyticsSnapshot.objects.order_by().values_list("district_id", flat=True).distinct():
+        latest = (
+            AnalyticsSnapshot.objects.filter(district_id=district_id, beat__isnull=True)
+            .order_by("-generated_at")
+            .first()
+        )
+        if latest is not None:
+            CurrentSnapshot.objects.create(district_id=district_id, beat=None, snapshot=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('analytics', '0002_snapshot_encoded_payload'),
+        ('uploads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CurrentSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='analyticssnapshot',
+            name='archive_path',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='analyticssnapshot',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='analyticssnapshot',
+            index=models.Index(fields=['district', '-generated_at'], name='snapshot_district_recent_idx'),
+        ),
+        migrations.AddField(
+            model_name='currentsnapshot',
+            name='beat',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='current_snapshots', to='accounts.beat'),
+        ),
+        migrations.AddField(
+            model_name='currentsnapshot',
+            name='district',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_snapshots', to='accounts.district'),
+        ),
+        migrations.AddField(
+            model_name='currentsnapshot',
+            name='snapshot',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='current_for', to='analytics.analyticssnapshot'),
+        ),
+        migrations.AddConstraint(
+            model_name='currentsnapshot',
+            constraint=models.UniqueConstraint(condition=models.Q(('beat__isnull', True)), fields=('district',), name='current_snapshot_district_uniq'),
+        ),
+        migrations.AddConstraint(
+            model_name='currentsnapshot',
+            constraint=models.UniqueConstraint(fields=('district', 'beat'), name='current_snapshot_beat_uniq'),
+        ),
+        migrations.RunPython(point_at_latest_snapshots, migrations.RunPython.noop),
+    ]
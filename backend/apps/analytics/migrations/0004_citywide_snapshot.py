@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:22
+
+import django.db.models.deletion
+import django.db.models.functions.comparison
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('analytics', '0003_snapshot_pointer_and_retention'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='analyticssnapshot',
+            name='district',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='accounts.district'),
+        ),
+        migrations.AlterField(
+            model_name='currentsnapshot',
+            name='district',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='current_snapshots', to='accounts.district'),
+        ),
+        migrations.AddConstraint(
+            model_name='currentsnapshot',
+            constraint=models.UniqueConstraint(django.db.models.functions.comparison.Coalesce('district', models.Value(0)), condition=models.Q(('district__isnull', True)), name='current_snapshot_citywide_uniq'),
+        ),
+    ]
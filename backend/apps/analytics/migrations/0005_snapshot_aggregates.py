@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0004_citywide_snapshot'),
+        ('uploads', '0005_citywide_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticssnapshot',
+            name='aggregates',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AlterField(
+            model_name='analyticssnapshot',
+            name='data_asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='uploads.dataasset'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0005_snapshot_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analyticssnapshot',
+            name='near_repeat_payload',
+            field=models.JSONField(default=dict),
+        ),
+    ]
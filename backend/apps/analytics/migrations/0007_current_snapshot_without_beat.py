@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-19 17:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_reference_version'),
+        ('analytics', '0006_snapshot_near_repeat'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='currentsnapshot',
+            name='current_snapshot_district_uniq',
+        ),
+        migrations.RemoveConstraint(
+            model_name='currentsnapshot',
+            name='current_snapshot_beat_uniq',
+        ),
+        migrations.RemoveField(
+            model_name='currentsnapshot',
+            name='beat',
+        ),
+        migrations.AddConstraint(
+            model_name='currentsnapshot',
+            constraint=models.UniqueConstraint(fields=('district',), name='current_snapshot_district_uniq'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.db.models.functions import Coalesce
 
 from apps.accounts.models import Beat, District
 from apps.uploads.models import DataAsset
@@ -7,11 +8,13 @@ from apps.uploads.models import DataAsset
 
 class AnalyticsSnapshot(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Null for citywide rollups, which are merged from district snapshots.
     data_asset = models.ForeignKey(
-        DataAsset, on_delete=models.CASCADE, related_name="snapshots"
+        DataAsset, on_delete=models.CASCADE, null=True, blank=True, related_name="snapshots"
     )
+    # Null for the citywide rollup.
     district = models.ForeignKey(
-        District, on_delete=models.CASCADE, related_name="snapshots"
+        District, on_delete=models.CASCADE, null=True, blank=True, related_name="snapshots"
     )
     beat = models.ForeignKey(
         Beat, on_delete=models.SET_NULL, null=True, blank=True, related_name="snapshots"
@@ -20,10 +23,55 @@ class AnalyticsSnapshot(models.Model):
     multivariate_payload = models.JSONField(default=dict)
     ml_payload = models.JSONField(default=dict)
     anomalies_payload = models.JSONField(default=dict)
+    near_repeat_payload = models.JSONField(default=dict)
+    # Mergeable column summaries (see ``sketches``) the citywide rollup is
+    # built from; not part of the API response.
+    aggregates = models.JSONField(default=dict, blank=True)
+    # Gzipped JSON of the serialized snapshot, written once at refresh time so
+    # the snapshot endpoint can return it without decoding the payload fields.
+    encoded_payload = models.BinaryField(null=True, blank=True, editable=False)
     generated_at = models.DateTimeField(auto_now_add=True)
+    # Set when compaction moved the payloads to ``archive_path`` in storage.
+    archived_at = models.DateTimeField(null=True, blank=True)
+    archive_path = models.CharField(max_length=255, blank=True)
 
     class Meta:
         ordering = ["-generated_at"]
+        indexes = [
+            models.Index(fields=["district", "-generated_at"], name="snapshot_district_recent_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.district.name} snapshot {self.generated_at:%Y-%m-%d}"
+        scope = self.district.name if self.district_id else "Citywide"
+        return f"{scope} snapshot {self.generated_at:%Y-%m-%d}"
+
+
+class CurrentSnapshot(models.Model):
+    """Pointer to the snapshot dashboards serve for a district (or the city)."""
+
+    district = models.ForeignKey(
+        District, on_delete=models.CASCADE, null=True, blank=True, related_name="current_snapshots"
+    )
+    snapshot = models.ForeignKey(
+        AnalyticsSnapshot, on_delete=models.CASCADE, related_name="current_for"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["district"],
+                name="current_snapshot_district_uniq",
+            ),
+            # NULLs never collide in the constraint above, so the single
+            # citywide pointer gets its own.
+            models.UniqueConstraint(
+                Coalesce("district", models.Value(0)),
+                condition=models.Q(district__isnull=True),
+                name="current_snapshot_citywide_uniq",
+            ),
+        ]
+
+    def __str__(self):
+        scope = self.district.name if self.district_id else "Citywide"
+        return f"Current snapshot for {scope}"
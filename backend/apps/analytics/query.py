@@ -0,0 +1,422 @@
+"""
+Ad-hoc incident queries.
+
+A query groups the incident rows of a district (or the citywide partitions)
+by up to ``MAX_DIMENSIONS`` columns, filters them and computes measures, e.g.
+
+    {"group_by": ["Beats", "Hour"],
+     "filters": [{"column": "Violent", "op": "eq", "value": true},
+                 {"column": "Quarter", "op": "eq", "value": 1}],
+     "measures": ["count", "mean(Hour)"]}
+
+It runs in-process on Arrow tables read from the columnar parquet caches
+(``Table.filter`` plus ``Table.group_by``). Queries are normalized first,
+so equivalent queries share one compiled plan (an in-process LRU) and one
+cached result keyed by (dataset version, normalized query). Every query has
+a time budget and a cap on returned rows. The budget is checked between
+steps, not during one: a step that has started (a filter or group-by over
+the whole table) runs to the end before the query is stopped.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Dict, List, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.cache import cache
+
+TIME_COLUMN = "Date/Time Occurred"
+TARGET_COLUMN = "Violent_Crime_excl09A"
+# Columns read from the cache as they are.
+SOURCE_DIMENSIONS = [
+    "District",
+    "Beats",
+    "Crime_Category",
+    "Description",
+    "Year",
+    "Month",
+    "Year_Month",
+    "Week_num",
+    "Day",
+    "Day_char",
+    "Hour",
+]
+# Derived columns: name -> (source column, Arrow expression over it).
+DERIVED_DIMENSIONS: Dict[str, Tuple[str, Callable[[Any], Any]]] = {
+    "Quarter": (TIME_COLUMN, lambda times: pc.quarter(times)),
+    "Weekday": (TIME_COLUMN, lambda times: pc.strftime(times, format="%A")),
+    # Same rule as ``prepare_dataframe``'s target_binary.
+    "Violent": (
+        TARGET_COLUMN,
+        lambda values: pc.fill_null(
+            pc.is_in(pc.utf8_lower(values.cast(pa.string())), pa.array(["violent", "true", "1"])),
+            False,
+        ),
+    ),
+}
+DIMENSIONS = SOURCE_DIMENSIONS + list(DERIVED_DIMENSIONS)
+# Filter-only columns (too many values to group by).
+FILTER_COLUMNS = DIMENSIONS + [TIME_COLUMN]
+NUMERIC_MEASURE_COLUMNS = ["Beats", "Year", "Month", "Week_num", "Day", "Hour", "Quarter", "Violent"]
+MEASURE_FUNCTIONS = {
+    "sum": NUMERIC_MEASURE_COLUMNS,
+    "mean": NUMERIC_MEASURE_COLUMNS,
+    "min": NUMERIC_MEASURE_COLUMNS,
+    "max": NUMERIC_MEASURE_COLUMNS,
+    "count_distinct": DIMENSIONS + ["Case Number"],
+}
+FILTER_OPS = {
+    "eq": lambda field, value: field == value,
+    "ne": lambda field, value: field != value,
+    "gt": lambda field, value: field > value,
+    "gte": lambda field, value: field >= value,
+    "lt": lambda field, value: field < value,
+    "lte": lambda field, value: field <= value,
+    "in": lambda field, value: field.isin(value),
+    "not_in": lambda field, value: ~field.isin(value),
+    "between": lambda field, value: (field >= value[0]) & (field <= value[1]),
+}
+LIST_OPS = {"in", "not_in", "between"}
+# Raised by Arrow for values or columns of the wrong type.
+ARROW_ERRORS = (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError)
+MAX_DIMENSIONS = 3
+MAX_MEASURES = 8
+MEASURE_PATTERN = re.compile(r"^(?P<fn>[a-z_]+)\((?P<column>[^()]+)\)$")
+TABLE_CACHE_SIZE = 4
+PLAN_CACHE_SIZE = 256
+
+_table_cache: "OrderedDict[Tuple, pa.Table]" = OrderedDict()
+_table_lock = Lock()
+
+
+class QueryError(ValueError):
+    """The query is not valid for this API."""
+
+
+class QueryTimeout(QueryError):
+    """The query ran past ``QUERY_TIME_LIMIT_SECONDS`` (noticed at the end of a step)."""
+
+
+def _parse_measure(measure: Any) -> str:
+    if measure == "count":
+        return "count"
+    match = MEASURE_PATTERN.match(str(measure).strip())
+    if not match:
+        raise QueryError(f"Unknown measure '{measure}'. Use 'count' or 'fn(column)'.")
+    fn, column = match["fn"], match["column"].strip()
+    if fn not in MEASURE_FUNCTIONS:
+        raise QueryError(f"Unknown measure function '{fn}'. Choose one of: count, {', '.join(MEASURE_FUNCTIONS)}.")
+    if column not in MEASURE_FUNCTIONS[fn]:
+        raise QueryError(f"'{fn}' is not available for column '{column}'.")
+    return f"{fn}({column})"
+
+
+def _normalize_filter(item: Any) -> Dict[str, Any]:
+    if not isinstance(item, dict):
+        raise QueryError("Each filter needs 'column', 'op' and 'value'.")
+    column, op, value = item.get("column"), item.get("op", "eq"), item.get("value")
+    if column not in FILTER_COLUMNS:
+        raise QueryError(f"Cannot filter on '{column}'. Choose one of: {', '.join(FILTER_COLUMNS)}.")
+    if op not in FILTER_OPS:
+        raise QueryError(f"Unknown filter op '{op}'. Choose one of: {', '.join(FILTER_OPS)}.")
+    if op in LIST_OPS:
+        if not isinstance(value, list) or not value or (op == "between" and len(value) != 2):
+            raise QueryError(f"Filter op '{op}' needs a list value" + (" of two bounds." if op == "between" else "."))
+        if op != "between":
+            value = sorted(set(value), key=lambda entry: (str(type(entry)), entry))
+    elif isinstance(value, (list, dict)):
+        raise QueryError(f"Filter op '{op}' needs a single value.")
+    return {"column": column, "op": op, "value": value}
+
+
+def normalize_query(spec: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate ``spec`` and return its canonical form (raises ``QueryError``)."""
+    if not isinstance(spec, dict):
+        raise QueryError("The query must be a JSON object.")
+    group_by = spec.get("group_by") or []
+    if isinstance(group_by, str):
+        group_by = [group_by]
+    group_by = list(dict.fromkeys(group_by))
+    unknown = [column for column in group_by if column not in DIMENSIONS]
+    if unknown:
+        raise QueryError(f"Cannot group by {', '.join(map(str, unknown))}. Choose from: {', '.join(DIMENSIONS)}.")
+    if len(group_by) > MAX_DIMENSIONS:
+        raise QueryError(f"Group by at most {MAX_DIMENSIONS} dimensions.")
+    measures = list(dict.fromkeys(_parse_measure(measure) for measure in spec.get("measures") or ["count"]))
+    if len(measures) > MAX_MEASURES:
+        raise QueryError(f"Request at most {MAX_MEASURES} measures.")
+    filters = sorted(
+        (_normalize_filter(item) for item in spec.get("filters") or []),
+        key=lambda item: json.dumps(item, sort_keys=True, default=str),
+    )
+    order_by = spec.get("order_by")
+    if order_by is not None and order_by not in group_by + measures:
+        raise QueryError("'order_by' must be one of the group_by dimensions or measures.")
+    max_rows = settings.QUERY_MAX_ROWS
+    try:
+        limit = int(spec.get("limit") or max_rows)
+    except (TypeError, ValueError):
+        raise QueryError("'limit' must be an integer.") from None
+    if not 1 <= limit <= max_rows:
+        raise QueryError(f"'limit' must be between 1 and {max_rows}.")
+    return {
+        "group_by": group_by,
+        "filters": filters,
+        "measures": measures,
+        "order_by": order_by,
+        "descending": bool(spec.get("descending", False)),
+        "limit": limit,
+    }
+
+
+@dataclass(frozen=True)
+class QueryPlan:
+    columns: Tuple[str, ...]
+    derived: Tuple[str, ...]
+    filter: Any
+    keys: Tuple[str, ...]
+    aggregations: Tuple[Tuple[Any, str], ...]
+    output_names: Tuple[str, ...]
+    sort_keys: Tuple[Tuple[str, str], ...]
+    limit: int
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_query(normalized: str) -> QueryPlan:
+    """Plan for a ``normalize_query`` result (JSON with sorted keys)."""
+    query = json.loads(normalized)
+    referenced = set(query["group_by"]) | {item["column"] for item in query["filters"]}
+    aggregations: List[Tuple[Any, str]] = []
+    output_names: List[str] = list(query["group_by"])
+    for measure in query["measures"]:
+        if measure == "count":
+            aggregations.append(([], "count_all"))
+        else:
+            match = MEASURE_PATTERN.match(measure)
+            referenced.add(match["column"])
+            aggregations.append((match["column"], match["fn"]))
+        output_names.append(measure)
+    derived = sorted(column for column in referenced if column in DERIVED_DIMENSIONS)
+    columns = sorted(
+        {DERIVED_DIMENSIONS[column][0] if column in DERIVED_DIMENSIONS else column for column in referenced}
+    )
+    expression = None
+    for item in query["filters"]:
+        value = item["value"]
+        if item["column"] == TIME_COLUMN:
+            value = [pa.scalar(_timestamp(entry)) for entry in value] if isinstance(value, list) else pa.scalar(_timestamp(value))
+        try:
+            term = FILTER_OPS[item["op"]](pc.field(item["column"]), value)
+        except ARROW_ERRORS as exc:
+            raise QueryError(f"Invalid value for '{item['column']}' filter: {exc}") from None
+        expression = term if expression is None else expression & term
+    order = query["order_by"]
+    direction = "descending" if query["descending"] else "ascending"
+    sort_keys = [(order, direction)] if order else []
+    sort_keys += [(column, "ascending") for column in query["group_by"] if column != order]
+    return QueryPlan(
+        columns=tuple(columns),
+        derived=tuple(derived),
+        filter=expression,
+        keys=tuple(query["group_by"]),
+        aggregations=tuple(aggregations),
+        output_names=tuple(output_names),
+        sort_keys=tuple(sort_keys),
+        limit=query["limit"],
+    )
+
+
+def _timestamp(value):
+    import pandas as pd
+
+    try:
+        return pd.Timestamp(value).to_pydatetime()
+    except (TypeError, ValueError):
+        raise QueryError(f"'{value}' is not a date/time.") from None
+
+
+def load_table(paths: List[Path], district_name: str | None = None) -> pa.Table:
+    """
+    The parquet caches as one table (only ``district_name``'s rows, when
+    given), kept in memory per file version.
+    """
+    key = (tuple((str(path), path.stat().st_mtime) for path in paths), district_name)
+    with _table_lock:
+        table = _table_cache.get(key)
+        if table is not None:
+            _table_cache.move_to_end(key)
+            return table
+    tables = [pq.read_table(path) for path in paths]
+    table = pa.concat_tables(tables, promote_options="permissive").unify_dictionaries() if len(tables) > 1 else tables[0]
+    if district_name and "District" in table.column_names:
+        # Same match as ``district_mask``: trimmed and case-insensitive.
+        names = pc.utf8_upper(pc.utf8_trim_whitespace(table["District"].cast(pa.string())))
+        table = table.filter(pc.fill_null(pc.equal(names, district_name.upper()), False))
+    with _table_lock:
+        _table_cache[key] = table
+        while len(_table_cache) > TABLE_CACHE_SIZE:
+            _table_cache.popitem(last=False)
+    return table
+
+
+def execute_plan(plan: QueryPlan, table: pa.Table, time_limit: float | None = None) -> Dict[str, Any]:
+    started = time.perf_counter()
+
+    def check(step: str):
+        if time_limit is not None and time.perf_counter() - started > time_limit:
+            raise QueryTimeout(f"Query exceeded the {time_limit:g}s limit while {step}; add filters or fewer dimensions.")
+
+    missing = [column for column in plan.columns if column not in table.column_names]
+    if missing:
+        raise QueryError(f"This dataset has no {', '.join(missing)} column.")
+    try:
+        work = table.select(list(plan.columns))
+        for name in plan.derived:
+            source, derive = DERIVED_DIMENSIONS[name]
+            work = work.append_column(name, derive(work[source]))
+        check("deriving columns")
+        if plan.filter is not None:
+            work = work.filter(plan.filter)
+            check("filtering")
+        scanned = work.num_rows
+        result = work.group_by(list(plan.keys)).aggregate(list(plan.aggregations))
+        check("aggregating")
+        # Arrow names aggregates "<column>_<fn>" (or "count_all") after the keys.
+        result = result.select(
+            list(plan.keys) + [name for name in result.column_names if name not in plan.keys]
+        ).rename_columns(list(plan.output_names))
+        # Group keys are few; decode them so they sort as plain values.
+        for index, field in enumerate(result.schema):
+            if pa.types.is_dictionary(field.type):
+                result = result.set_column(index, field.name, result[index].cast(field.type.value_type))
+        if plan.sort_keys:
+            result = result.sort_by(list(plan.sort_keys))
+    except ARROW_ERRORS as exc:
+        raise QueryError(f"Query could not run on this dataset: {exc}") from None
+    return {
+        "columns": list(plan.output_names),
+        "rows": result.slice(0, plan.limit).to_pylist(),
+        "row_count": result.num_rows,
+        "truncated": result.num_rows > plan.limit,
+        "rows_scanned": scanned,
+    }
+
+
+def query_source(district_slug: str) -> Tuple[List[Path], str, str | None] | None:
+    """
+    ``(parquet paths, dataset version, district name)`` behind the current
+    snapshot of ``district_slug``: its asset's columnar cache, or for the
+    citywide rollup the caches of every district's current asset. Missing
+    caches are written from the source files first.
+    """
+    from apps.accounts import reference
+    from apps.uploads.columnar import columnar_cache_path, has_columnar_cache, write_columnar_cache
+    from apps.uploads.models import DataAsset
+    from apps.uploads.services import load_dataframe_from_asset
+
+    from .models import AnalyticsSnapshot, CurrentSnapshot
+    from .services import CITYWIDE_SLUG, latest_snapshot_for_district
+
+    snapshot = latest_snapshot_for_district(district_slug, fields=["id", "data_asset"])
+    if snapshot is None:
+        return None
+    district_name = None
+    if snapshot.data_asset_id is not None:
+        asset_ids = [snapshot.data_asset_id]
+        if district_slug != CITYWIDE_SLUG:
+            district = reference.district_by_slug(district_slug)
+            district_name = district.name if district is not None else None
+    else:
+        asset_ids = AnalyticsSnapshot.objects.filter(
+            pk__in=CurrentSnapshot.objects.filter(district__isnull=False).values("snapshot_id"),
+            data_asset__isnull=False,
+        ).values_list("data_asset_id", flat=True)
+    assets = list(DataAsset.objects.filter(pk__in=list(asset_ids)).order_by("pk"))
+    if not assets:
+        return None
+    for asset in assets:
+        if not has_columnar_cache(asset):
+            write_columnar_cache(asset, load_dataframe_from_asset(asset))
+    version = hashlib.sha256(
+        "|".join(f"{asset.pk}:{asset.content_hash}" for asset in assets).encode()
+    ).hexdigest()
+    return [columnar_cache_path(asset) for asset in assets], f"{version}:{district_name}", district_name
+
+
+def run_query(
+    table_paths: List[Path], dataset_version: str, spec: Dict[str, Any], district_name: str | None = None
+) -> Dict[str, Any]:
+    """
+    Run ``spec`` over the parquet caches, returning a cached result when
+    this dataset version already answered the same normalized query.
+    """
+    normalized = json.dumps(normalize_query(spec), sort_keys=True, default=str)
+    digest = hashlib.sha256(f"{dataset_version}:{normalized}".encode()).hexdigest()
+    cache_key = f"analytics:query:{digest}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return {**cached, "cached": True}
+    plan = compile_query(normalized)
+    started = time.perf_counter()
+    result = execute_plan(plan, load_table(table_paths, district_name), settings.QUERY_TIME_LIMIT_SECONDS)
+    result["query"] = json.loads(normalized)
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    cache.set(cache_key, result, settings.QUERY_RESULT_CACHE_SECONDS)
+    return {**result, "cached": False}
+
+
+def run_crosstab(
+    table_paths: List[Path],
+    dataset_version: str,
+    dimensions: List[str],
+    bins: Dict[str, str] | None = None,
+    district_name: str | None = None,
+) -> Dict[str, Any]:
+    """Cross-tab of ``dimensions`` (see ``crosstab``), cached per dataset version."""
+    from .crosstab import CrossTabError, crosstab_payload
+
+    unknown = [column for column in dimensions if column not in DIMENSIONS]
+    if unknown:
+        raise QueryError(f"Cannot cross-tabulate {', '.join(unknown)}. Choose from: {', '.join(DIMENSIONS)}.")
+    bins = {column: str(spec) for column, spec in (bins or {}).items()}
+    normalized = json.dumps({"dimensions": dimensions, "bins": bins}, sort_keys=True)
+    digest = hashlib.sha256(f"{dataset_version}:{normalized}".encode()).hexdigest()
+    cache_key = f"analytics:crosstab:{digest}"
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+    table = load_table(table_paths, district_name)
+    sources = {DERIVED_DIMENSIONS[column][0] if column in DERIVED_DIMENSIONS else column for column in dimensions}
+    missing = sorted(sources - set(table.column_names))
+    if missing:
+        raise QueryError(f"This dataset has no {', '.join(missing)} column.")
+    work = table.select(sorted(sources))
+    for column in dimensions:
+        if column in DERIVED_DIMENSIONS:
+            source, derive = DERIVED_DIMENSIONS[column]
+            work = work.append_column(column, derive(work[source]))
+    # Dictionary columns arrive as pandas categoricals, so their codes are reused.
+    frame = work.select(dimensions).to_pandas()
+    try:
+        result = crosstab_payload(frame, dimensions, bins)
+    except CrossTabError as exc:
+        raise QueryError(str(exc)) from None
+    cache.set(cache_key, result, settings.QUERY_RESULT_CACHE_SECONDS)
+    return result
+
+
+def clear_query_caches():
+    compile_query.cache_clear()
+    with _table_lock:
+        _table_cache.clear()
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import gzip
+from typing import Any, Dict, List
+
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+GZIP_LEVEL = 6
+COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.arlington.columnar+json"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+COLUMNS_KEY = "$columns"
+LENGTH_KEY = "$length"
+ABSENT_KEY = "$absent"
+
+_fallback_encoder = JSONEncoder()
+
+
+def dumps(data: Any) -> bytes:
+    """Encode ``data`` with orjson; NumPy arrays/scalars are encoded natively, NaN becomes null."""
+    return orjson.dumps(data, default=_fallback_encoder.default, option=ORJSON_OPTIONS)
+
+
+def dumps_gzip(data: Any) -> bytes:
+    return gzip.compress(dumps(data), compresslevel=GZIP_LEVEL)
+
+
+def records_to_split(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Convert ``orient="records"`` rows to ``{"columns": [...], "data": [[...]]}``."""
+    columns: List[str] = []
+    for record in records:
+        for key in record:
+            if key not in columns:
+                columns.append(key)
+    return {
+        "columns": columns,
+        "data": [[record.get(column) for column in columns] for record in records],
+    }
+
+
+def split_tabular_payload(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Return ``payload`` with its list-of-dicts values converted to split orientation."""
+    return {
+        key: records_to_split(value)
+        if isinstance(value, list) and value and all(isinstance(item, dict) for item in value)
+        else value
+        for key, value in payload.items()
+    }
+
+
+def _is_record_list(value: Any) -> bool:
+    return isinstance(value, list) and bool(value) and all(isinstance(item, dict) for item in value)
+
+
+def to_columnar(value: Any) -> Any:
+    """
+    Recursively replace lists of dicts with column arrays,
+    ``{"$columns": {name: [...]}, "$length": n}``, so each key is sent once.
+    Keys missing from some records are listed by row index under
+    ``"$absent"`` (their cells are null), so the round trip is lossless.
+    """
+    if _is_record_list(value):
+        columns: Dict[str, List[Any]] = {}
+        for record in value:
+            for key in record:
+                columns.setdefault(key, [])
+        absent: Dict[str, List[int]] = {}
+        for key, cells in columns.items():
+            for idx, record in enumerate(value):
+                if key in record:
+                    cells.append(to_columnar(record[key]))
+                else:
+                    cells.append(None)
+                    absent.setdefault(key, []).append(idx)
+        block = {COLUMNS_KEY: columns, LENGTH_KEY: len(value)}
+        if absent:
+            block[ABSENT_KEY] = absent
+        return block
+    if isinstance(value, dict):
+        return {key: to_columnar(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [to_columnar(item) for item in value]
+    return value
+
+
+def from_columnar(value: Any) -> Any:
+    """Inverse of :func:`to_columnar`."""
+    if isinstance(value, dict):
+        if COLUMNS_KEY in value and LENGTH_KEY in value:
+            columns = {key: [from_columnar(cell) for cell in cells] for key, cells in value[COLUMNS_KEY].items()}
+            absent = {key: set(rows) for key, rows in value.get(ABSENT_KEY, {}).items()}
+            return [
+                {
+                    key: cells[idx]
+                    for key, cells in columns.items()
+                    if idx not in absent.get(key, ())
+                }
+                for idx in range(value[LENGTH_KEY])
+            ]
+        return {key: from_columnar(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [from_columnar(item) for item in value]
+    return value
+
+
+def records_to_arrow(records: List[Dict[str, Any]]) -> bytes:
+    """Encode a table of records as an Arrow IPC stream."""
+    # Imported here: these renderers are the project defaults and load with
+    # every endpoint, while only Arrow responses need pandas/pyarrow.
+    import pandas as pd
+    import pyarrow as pa
+
+    frame = pd.DataFrame.from_records(records)
+    for column in frame.columns:
+        if frame[column].dtype == object:
+            # Mixed-type cells (e.g. "" placeholders next to ints) become text.
+            types = {type(item) for item in frame[column].dropna()}
+            if len(types) > 1:
+                frame[column] = frame[column].map(lambda item: None if item is None else str(item))
+    table = pa.Table.from_pandas(frame, preserve_index=False).replace_schema_metadata(None)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """Drop-in ``JSONRenderer`` replacement backed by orjson."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data)
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """JSON with record lists sent as column arrays; opt in via ``Accept``."""
+
+    media_type = COLUMNAR_JSON_MEDIA_TYPE
+    format = "columnar"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(to_columnar(data))
+
+
+class ArrowIPCRenderer(BaseRenderer):
+    """Arrow IPC stream for tabular responses (a list of records)."""
+
+    media_type = ARROW_STREAM_MEDIA_TYPE
+    format = "arrow"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, list):
+            return records_to_arrow(data)
+        # Error bodies and other non-tabular payloads fall back to JSON.
+        response = (renderer_context or {}).get("response")
+        if response is not None:
+            response["Content-Type"] = "application/json"
+        return dumps(data)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets ``text/event-stream`` requests pass content negotiation. Streams are
+    returned as ``StreamingHttpResponse``; only error bodies are rendered here,
+    as a single ``error`` event.
+    """
+
+    media_type = "text/event-stream"
+    format = "event-stream"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return b"event: error\ndata: " + dumps(data) + b"\n\n"
@@ -14,6 +14,7 @@ class AnalyticsSnapshotSerializer(serializers.ModelSerializer):
             "multivariate_payload",
             "ml_payload",
             "anomalies_payload",
+            "near_repeat_payload",
             "generated_at",
         ]
         depth = 1
@@ -1,27 +1,40 @@
 from __future__ import annotations
 
+import gzip
+import hashlib
+import json
 import math
-from typing import Any, Dict, List
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Any, Callable, Dict, List
 
 import numpy as np
 import pandas as pd
 from django.conf import settings
-from sklearn.compose import ColumnTransformer
-from sklearn.ensemble import GradientBoostingClassifier, IsolationForest, RandomForestClassifier
-from sklearn.impute import SimpleImputer
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import (
-    accuracy_score,
-    f1_score,
-    precision_score,
-    recall_score,
-    roc_auc_score,
-)
-from sklearn.model_selection import train_test_split
-from sklearn.pipeline import Pipeline
-from sklearn.preprocessing import OneHotEncoder, StandardScaler
-
-from .models import AnalyticsSnapshot
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts import reference
+
+from . import crosstab, explanations, near_repeat, sketches
+from .crosstab import count_records, pivot_records
+from .features import FEATURE_COLUMNS, FEATURE_VERSION, add_rolling_features, beat_activity
+from .models import AnalyticsSnapshot, CurrentSnapshot
+from .renderers import dumps_gzip
+from .serializers import AnalyticsSnapshotSerializer
+
+# scikit-learn (and SciPy behind it) is imported inside the training and
+# anomaly functions only, so web workers and management commands that never
+# fit a model do not pay for it.
+if TYPE_CHECKING:
+    from sklearn.compose import ColumnTransformer
+
+    from .feature_store import FeatureMatrix
 
 NUMERIC_COLUMNS = ["Hour", "Day", "Week_num", "Year"]
 CATEGORICAL_COLUMNS = [
@@ -33,23 +46,60 @@ CATEGORICAL_COLUMNS = [
     "Year_Month",
 ]
 TARGET_COLUMN = "Violent_Crime_excl09A"
+# Slug the citywide rollup (snapshots without a district) is served under.
+CITYWIDE_SLUG = "citywide"
+PAYLOAD_FIELDS = [
+    "eda_payload",
+    "multivariate_payload",
+    "ml_payload",
+    "anomalies_payload",
+    "near_repeat_payload",
+]
+ARCHIVED_FIELDS = PAYLOAD_FIELDS + ["aggregates"]
+ROLLUP_ANOMALY_COUNT = 15
+SNAPSHOT_ARCHIVE_DIR = "archive/snapshots"
+# Stage results and feature matrices are memoized per (dataset hash, code
+# version); editing this module or one the stages compute with (``features``,
+# ``crosstab``, ``sketches``) changes the version and so invalidates every
+# cached stage.
+CODE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+STAGE_VERSION = hashlib.sha256(
+    "-".join([CODE_VERSION, FEATURE_VERSION, crosstab.MODULE_VERSION, sketches.MODULE_VERSION]).encode()
+).hexdigest()[:12]
+EXPORTABLE_TABLES = {
+    "monthly_counts": ("multivariate_payload", "monthly_counts"),
+    "hourly_breakdown": ("multivariate_payload", "hourly_breakdown"),
+    "beat_vs_weekday": ("multivariate_payload", "beat_vs_weekday"),
+    "beat_activity": ("multivariate_payload", "beat_activity"),
+    "correlations": ("multivariate_payload", "correlations"),
+    "anomalies": ("anomalies_payload", "anomalies"),
+}
 
 
 def _load_default_dataframe() -> pd.DataFrame:
     return pd.read_excel(settings.DATASET_PATH)
 
 
+def district_mask(districts: pd.Series, district_name: str) -> np.ndarray:
+    """Rows whose District matches ``district_name`` (case-insensitive), compared on category codes."""
+    categories = districts.astype("category")
+    wanted = [
+        code
+        for code, value in enumerate(categories.cat.categories)
+        if str(value).strip().upper() == district_name.upper()
+    ]
+    return np.isin(categories.cat.codes.to_numpy(), wanted)
+
+
 def prepare_dataframe(df: pd.DataFrame, district_name: str | None = None) -> pd.DataFrame:
-    prepared = df.copy()
+    if "District" in df.columns and district_name:
+        prepared = df[district_mask(df["District"], district_name)].copy()
+    else:
+        prepared = df.copy()
     if "Date/Time Occurred" in prepared.columns:
         prepared["Date/Time Occurred"] = pd.to_datetime(prepared["Date/Time Occurred"])
         prepared["Weekday"] = prepared["Date/Time Occurred"].dt.day_name()
         prepared["Quarter"] = prepared["Date/Time Occurred"].dt.quarter
-    if "District" in prepared.columns and district_name:
-        prepared = prepared[
-            prepared["District"].str.upper()
-            == district_name.upper()
-        ]
     prepared["target_binary"] = (
         prepared[TARGET_COLUMN]
         .fillna("NonViolent")
@@ -69,6 +119,9 @@ def describe_column(series: pd.Series) -> Dict[str, Any]:
         "unique": int(series.nunique(dropna=True)),
     }
     if pd.api.types.is_numeric_dtype(series):
+        if not result["non_null"]:
+            # e.g. a year-over-year feature on less than a year of data.
+            return result
         result["stats"] = {
             "mean": float(series.mean()),
             "std": float(series.std()),
@@ -101,39 +154,16 @@ def compute_eda_payload(df: pd.DataFrame) -> Dict[str, Any]:
 def compute_multivariate_payload(df: pd.DataFrame) -> Dict[str, Any]:
     numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns]
     corr_matrix = df[numeric_cols].corr().fillna(0) if numeric_cols else pd.DataFrame()
-    by_month = (
-        df.groupby("Year_Month")
-        .size()
-        .reset_index(name="count")
-        .sort_values("Year_Month")
-        .to_dict(orient="records")
-        if "Year_Month" in df.columns
-        else []
-    )
+    columns = set(df.columns)
+    by_month = count_records(df, "Year_Month") if "Year_Month" in columns else []
     by_hour_category = (
-        df.pivot_table(
-            index="Hour",
-            columns="Crime_Category",
-            values="Case Number",
-            aggfunc="count",
-            fill_value=0,
-        )
-        .reset_index()
-        .to_dict(orient="records")
-        if {"Hour", "Crime_Category", "Case Number"} <= set(df.columns)
+        pivot_records(df, "Hour", "Crime_Category", count_column="Case Number")
+        if {"Hour", "Crime_Category", "Case Number"} <= columns
         else []
     )
     beat_weekday = (
-        df.pivot_table(
-            index="Beats",
-            columns="Day_char",
-            values="Case Number",
-            aggfunc="count",
-            fill_value=0,
-        )
-        .reset_index()
-        .to_dict(orient="records")
-        if {"Beats", "Day_char", "Case Number"} <= set(df.columns)
+        pivot_records(df, "Beats", "Day_char", count_column="Case Number")
+        if {"Beats", "Day_char", "Case Number"} <= columns
         else []
     )
     return {
@@ -143,12 +173,107 @@ def compute_multivariate_payload(df: pd.DataFrame) -> Dict[str, Any]:
         "monthly_counts": by_month,
         "hourly_breakdown": by_hour_category,
         "beat_vs_weekday": beat_weekday,
+        "beat_activity": beat_activity(df),
+    }
+
+
+def compute_aggregates(df: pd.DataFrame) -> Dict[str, Any]:
+    """Mergeable summaries of ``df`` for the citywide rollup."""
+    numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns]
+    return {
+        "columns": {column: sketches.column_sketch(df[column]) for column in df.columns},
+        "moments": sketches.moment_sketch(df, numeric_cols) if numeric_cols else None,
+    }
+
+
+def _merge_count_records(tables: List[List[Dict[str, Any]]], key: str) -> List[Dict[str, Any]]:
+    """Sum count tables (one record per ``key``) such as the monthly series and pivots."""
+    frames = [pd.DataFrame.from_records(table) for table in tables if table]
+    if not frames:
+        return []
+    merged = pd.concat(frames, ignore_index=True).fillna(0).groupby(key, sort=True).sum()
+    merged = merged[sorted(merged.columns, key=str)].astype(int)
+    return merged.reset_index().to_dict(orient="records")
+
+
+def merge_district_payloads(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Citywide payloads from district results alone. ``parts`` hold each
+    district's ``name``, ``aggregates``, ``multivariate_payload``,
+    ``anomalies_payload`` and optionally ``near_repeat_payload``; the cost
+    depends on the number of districts and categories, never on the row count.
+    """
+    column_sketches: Dict[str, List[Dict[str, Any]]] = {}
+    for part in parts:
+        for column, sketch in part["aggregates"]["columns"].items():
+            column_sketches.setdefault(column, []).append(sketch)
+    merged_columns = {
+        column: sketches.merge_column_sketches(items) for column, items in column_sketches.items()
+    }
+    multivariate = [part["multivariate_payload"] for part in parts]
+    anomalies = [
+        {**record, "District": part["name"]}
+        for part in parts
+        for record in part["anomalies_payload"].get("anomalies", [])
+    ]
+    anomalies.sort(key=lambda record: record.get("anomaly_score", 0))
+    near_repeats = [
+        (part["name"], part["near_repeat_payload"])
+        for part in parts
+        if "overall" in (part.get("near_repeat_payload") or {})
+    ]
+    return {
+        "eda_payload": {
+            column: sketches.describe_sketch(sketch) for column, sketch in merged_columns.items()
+        },
+        "multivariate_payload": {
+            "correlations": sketches.correlation_records(
+                sketches.merge_moments(part["aggregates"].get("moments") for part in parts)
+            ),
+            "monthly_counts": _merge_count_records(
+                [payload.get("monthly_counts", []) for payload in multivariate], "Year_Month"
+            ),
+            "hourly_breakdown": _merge_count_records(
+                [payload.get("hourly_breakdown", []) for payload in multivariate], "Hour"
+            ),
+            "beat_vs_weekday": _merge_count_records(
+                [payload.get("beat_vs_weekday", []) for payload in multivariate], "Beats"
+            ),
+            # Beats belong to one district, so their rows are simply combined.
+            "beat_activity": sorted(
+                (row for payload in multivariate for row in payload.get("beat_activity", [])),
+                key=lambda row: str(row["Beats"]),
+            ),
+        },
+        "ml_payload": {
+            "detail": "Models are trained per district; open a district for model results.",
+            "models": [],
+        },
+        "anomalies_payload": {"anomalies": anomalies[:ROLLUP_ANOMALY_COUNT]},
+        "near_repeat_payload": {
+            "detail": "Near repeats are tested per district; pairs across district lines are not counted.",
+            "parameters": near_repeats[0][1]["parameters"] if near_repeats else near_repeat.parameters(),
+            "districts": [
+                {"District": name, **{key: value for key, value in payload["overall"].items() if key != "bands"}}
+                for name, payload in near_repeats
+            ],
+            "beats": sorted(
+                (row for _, payload in near_repeats for row in payload.get("beats", [])),
+                key=lambda row: str(row["Beats"]),
+            ),
+        },
+        "aggregates": {"columns": merged_columns},
     }
 
 
 def _build_preprocessor(df: pd.DataFrame):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.impute import SimpleImputer
+    from sklearn.pipeline import Pipeline
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
     categorical = [col for col in CATEGORICAL_COLUMNS + ["Weekday"] if col in df.columns]
-    numeric = [col for col in NUMERIC_COLUMNS if col in df.columns]
+    numeric = [col for col in NUMERIC_COLUMNS + FEATURE_COLUMNS if col in df.columns]
     return ColumnTransformer(
         transformers=[
             (
@@ -156,7 +281,7 @@ def _build_preprocessor(df: pd.DataFrame):
                 Pipeline(
                     steps=[
                         ("imputer", SimpleImputer(strategy="most_frequent")),
-                        ("encoder", OneHotEncoder(handle_unknown="ignore", sparse_output=False)),
+                        ("encoder", OneHotEncoder(handle_unknown="ignore")),
                     ]
                 ),
                 categorical,
@@ -171,7 +296,9 @@ def _build_preprocessor(df: pd.DataFrame):
                 ),
                 numeric,
             ),
-        ]
+        ],
+        # Always CSR, whatever the density: the feature store persists it as such.
+        sparse_threshold=1.0,
     )
 
 
@@ -186,58 +313,127 @@ def _get_feature_names(preprocessor: ColumnTransformer) -> List[str]:
     return feature_names
 
 
+def _get_feature_sources(preprocessor: ColumnTransformer) -> List[str]:
+    """Source column of each entry of ``_get_feature_names``."""
+    sources: List[str] = []
+    if "cat" in preprocessor.named_transformers_:
+        encoder = preprocessor.named_transformers_["cat"].named_steps["encoder"]
+        for column, categories in zip(preprocessor.transformers_[0][2], encoder.categories_):
+            sources.extend([column] * len(categories))
+    if "num" in preprocessor.named_transformers_:
+        sources.extend(preprocessor.transformers_[1][2])
+    return sources
+
+
+def _model_feature_columns(df: pd.DataFrame) -> List[str]:
+    return [
+        col
+        for col in set(NUMERIC_COLUMNS + FEATURE_COLUMNS + CATEGORICAL_COLUMNS + ["Weekday"])
+        & set(df.columns)
+        if df[col].notna().any()
+    ]
+
+
+def build_feature_matrix(df: pd.DataFrame) -> FeatureMatrix:
+    """
+    Encode every row of ``df`` once: the preprocessor is fitted on the
+    training split and the train/validation/test row positions are kept
+    with the matrix, so every consumer sees the same split.
+    """
+    from scipy import sparse
+    from sklearn.model_selection import train_test_split
+
+    from .feature_store import FeatureMatrix
+
+    y = df["target_binary"].to_numpy()
+    X = df[_model_feature_columns(df)]
+    rows = np.arange(len(df))
+    train, test = train_test_split(
+        rows, test_size=0.2, random_state=42, stratify=y if len(np.unique(y)) > 1 else None
+    )
+    train, validation = train_test_split(
+        train,
+        test_size=0.2,
+        random_state=42,
+        stratify=y[train] if len(np.unique(y[train])) > 1 else None,
+    )
+    preprocessor = _build_preprocessor(X)
+    preprocessor.fit(X.iloc[train])
+    return FeatureMatrix(
+        matrix=sparse.csr_matrix(preprocessor.transform(X)),
+        feature_names=_get_feature_names(preprocessor),
+        feature_sources=_get_feature_sources(preprocessor),
+        target=y,
+        splits={"train": train, "validation": validation, "test": test},
+        preprocessor=preprocessor,
+    )
+
+
+def feature_matrix_for(df: pd.DataFrame, dataset_key: str | None = None) -> FeatureMatrix:
+    """
+    The encoded features of ``df``. With a ``dataset_key`` they are built
+    once per dataset (and code) version and memory-mapped from the store.
+    """
+    if not dataset_key:
+        return build_feature_matrix(df)
+    from . import feature_store
+
+    path = feature_store.store_path(STAGE_VERSION, dataset_key)
+    features = feature_store.load_feature_matrix(path)
+    if features is None:
+        return feature_store.save_feature_matrix(build_feature_matrix(df), path)
+    if features.matrix.shape[0] != len(df):
+        return build_feature_matrix(df)
+    return features
+
+
 def _fit_model(
     name: str,
     estimator,
     tuned: bool,
-    X_train,
-    X_val,
-    X_test,
-    y_train,
-    y_val,
-    y_test,
-    preprocessor,
+    features: FeatureMatrix,
 ) -> Dict[str, Any]:
-    pipeline = Pipeline(steps=[("preprocessor", preprocessor), ("model", estimator)])
-    pipeline.fit(X_train, y_train)
+    from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score, roc_auc_score
+
+    estimator.fit(*features.split("train"))
     results = {
         "name": name,
         "tuned": tuned,
         "parameters": estimator.get_params(),
     }
 
-    def evaluate(split_name, X, y):
-        preds = pipeline.predict(X)
+    def evaluate(split_name):
+        X, y = features.split(split_name)
+        preds = estimator.predict(X)
         metrics = {
             "accuracy": float(accuracy_score(y, preds)),
             "precision": float(precision_score(y, preds, zero_division=0)),
             "recall": float(recall_score(y, preds, zero_division=0)),
             "f1": float(f1_score(y, preds, zero_division=0)),
         }
-        if hasattr(pipeline, "predict_proba"):
+        if hasattr(estimator, "predict_proba"):
             try:
-                probas = pipeline.predict_proba(X)[:, 1]
+                probas = estimator.predict_proba(X)[:, 1]
                 metrics["roc_auc"] = float(roc_auc_score(y, probas))
             except ValueError:
                 metrics["roc_auc"] = math.nan
         return metrics
 
     results["metrics"] = {
-        "validation": evaluate("validation", X_val, y_val),
-        "test": evaluate("test", X_test, y_test),
+        "validation": evaluate("validation"),
+        "test": evaluate("test"),
     }
 
     feature_importances: List[Dict[str, Any]] = []
-    feature_names = _get_feature_names(pipeline.named_steps["preprocessor"])
-    model = pipeline.named_steps["model"]
-    if hasattr(model, "feature_importances_"):
-        importances = model.feature_importances_
+    feature_names = features.feature_names
+    if hasattr(estimator, "feature_importances_"):
+        importances = estimator.feature_importances_
         feature_importances = [
             {"feature": feature_names[idx], "importance": float(score)}
             for idx, score in enumerate(importances)
         ]
-    elif hasattr(model, "coef_"):
-        coefs = model.coef_[0]
+    elif hasattr(estimator, "coef_"):
+        coefs = estimator.coef_[0]
         feature_importances = [
             {"feature": feature_names[idx], "importance": float(coefs[idx])}
             for idx in range(len(feature_names))
@@ -249,27 +445,14 @@ def _fit_model(
     return results
 
 
-def train_models(df: pd.DataFrame) -> Dict[str, Any]:
+def train_models(df: pd.DataFrame, features: FeatureMatrix | None = None) -> Dict[str, Any]:
     if TARGET_COLUMN not in df.columns:
         return {"detail": "target column missing"}
-    filtered = df.copy()
-    y = filtered["target_binary"]
-    feature_cols = list(
-        set(NUMERIC_COLUMNS + CATEGORICAL_COLUMNS + ["Weekday"])
-        & set(filtered.columns)
-    )
-    X = filtered[feature_cols]
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42, stratify=y if y.nunique() > 1 else None
-    )
-    X_train, X_val, y_train, y_val = train_test_split(
-        X_train,
-        y_train,
-        test_size=0.2,
-        random_state=42,
-        stratify=y_train if y_train.nunique() > 1 else None,
-    )
-    preprocessor = _build_preprocessor(filtered)
+    from sklearn.ensemble import GradientBoostingClassifier, RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+
+    if features is None:
+        features = build_feature_matrix(df)
 
     models = [
         ("Logistic Regression (baseline)", LogisticRegression(max_iter=1000), False),
@@ -290,42 +473,43 @@ def train_models(df: pd.DataFrame) -> Dict[str, Any]:
         ),
     ]
 
-    model_results = [
-        _fit_model(
-            name,
-            estimator,
-            tuned,
-            X_train,
-            X_val,
-            X_test,
-            y_train,
-            y_val,
-            y_test,
-            preprocessor,
-        )
-        for name, estimator, tuned in models
-    ]
-
-    return {
+    model_results = [_fit_model(name, estimator, tuned, features) for name, estimator, tuned in models]
+    labels = df["Case Number"].to_numpy() if "Case Number" in df.columns else None
+    explained = []
+    for result, (_, estimator, _) in zip(model_results, models):
+        explanation = explanations.explain_model(estimator, features, labels)
+        result["permutation_importances"] = explanation["permutation_importances"]
+        explained.append({"name": result["name"], **explanation})
+    result = {
         "target": TARGET_COLUMN,
-        "feature_columns": feature_cols,
-        "split_counts": {
-            "train": len(X_train),
-            "validation": len(X_val),
-            "test": len(X_test),
-        },
+        "feature_columns": list(dict.fromkeys(features.feature_sources)),
+        "split_counts": {name: len(rows) for name, rows in features.splits.items()},
         "models": model_results,
     }
+    if features.path is not None:
+        explanations.save_explanations(features.path, explained)
+        # Store version and dataset key the explanations were saved under.
+        result["explanations_store"] = [features.path.parent.name, features.path.name]
+    return result
+
 
+ANOMALY_FEATURES = ["Hour", "Week_num", "beat_count_28d", "category_count_28d"]
 
-def detect_anomalies(df: pd.DataFrame) -> Dict[str, Any]:
-    numeric_cols = [col for col in ["Hour", "Week_num", "target_binary"] if col in df.columns]
-    if len(numeric_cols) < 2:
+
+def detect_anomalies(df: pd.DataFrame, features: FeatureMatrix | None = None) -> Dict[str, Any]:
+    if features is not None:
+        # Scaled, median-imputed columns of the shared matrix plus the target.
+        values = np.column_stack([features.dense_columns(ANOMALY_FEATURES), features.target])
+    else:
+        numeric_cols = [col for col in ANOMALY_FEATURES + ["target_binary"] if col in df.columns]
+        values = df[numeric_cols].fillna(0).to_numpy()
+    if values.shape[1] < 2:
         return {"anomalies": []}
-    features = df[numeric_cols].fillna(0)
+    from sklearn.ensemble import IsolationForest
+
     detector = IsolationForest(random_state=42, contamination=0.02)
-    detector.fit(features)
-    scores = detector.decision_function(features)
+    detector.fit(values)
+    scores = detector.decision_function(values)
     df = df.copy()
     df["anomaly_score"] = scores
     if "Date/Time Occurred" in df.columns:
@@ -342,24 +526,354 @@ def detect_anomalies(df: pd.DataFrame) -> Dict[str, Any]:
     return {"anomalies": anomalies}
 
 
-def build_snapshot_for_asset(asset, df: pd.DataFrame | None = None) -> AnalyticsSnapshot:
-    if df is None:
-        df = _load_default_dataframe()
-    prepared = prepare_dataframe(df, district_name=asset.district.name)
-    snapshot = AnalyticsSnapshot.objects.create(
-        data_asset=asset,
-        district=asset.district,
-        eda_payload=compute_eda_payload(prepared),
-        multivariate_payload=compute_multivariate_payload(prepared),
-        ml_payload=train_models(prepared),
-        anomalies_payload=detect_anomalies(prepared),
+def _stage_cache_path(dataset_key: str, stage: str) -> Path:
+    return Path(settings.MEDIA_ROOT) / "cache" / "stages" / STAGE_VERSION / dataset_key / f"{stage}.json.gz"
+
+
+def _memoized_stage(dataset_key: str | None, stage: str, compute: Callable[[], Any]) -> Any:
+    if not dataset_key:
+        return compute()
+    path = _stage_cache_path(dataset_key, stage)
+    if path.exists():
+        return json.loads(gzip.decompress(path.read_bytes()))
+    result = compute()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    tmp_path.write_bytes(dumps_gzip(result))
+    tmp_path.replace(path)
+    return result
+
+
+def compute_snapshot_payloads(
+    asset,
+    df: pd.DataFrame | None = None,
+    dataset_hash: str | None = None,
+    on_stage: Callable[[str, int, int], None] | None = None,
+    prepared_df: pd.DataFrame | None = None,
+) -> Dict[str, Any]:
+    """
+    Run the EDA/ML pipeline for ``asset``; touches no database rows. With a
+    ``dataset_hash`` each stage is memoized, and ``df`` is only loaded and
+    prepared when some stage is not cached yet. ``prepared_df`` skips that
+    step for callers that already prepared the rows (citywide ingest). An
+    asset without a district is computed over all rows. The model and
+    anomaly stages share one encoded feature matrix (``feature_matrix_for``).
+    ``on_stage(field, done, total)`` is called after each stage finishes.
+    """
+    district = reference.district_by_id(asset.district_id) or asset.district
+    scope = district.slug if district is not None else CITYWIDE_SLUG
+    dataset_key = f"{dataset_hash}-{scope}" if dataset_hash else None
+    prepared_cache: Dict[str, Any] = {}
+
+    def prepared() -> pd.DataFrame:
+        if "df" not in prepared_cache:
+            frame = prepared_df
+            if frame is None:
+                source = df if df is not None else _load_default_dataframe()
+                frame = prepare_dataframe(
+                    source, district_name=district.name if district is not None else None
+                )
+            prepared_cache["df"] = add_rolling_features(frame, dataset_key)
+        return prepared_cache["df"]
+
+    def features() -> FeatureMatrix:
+        if "features" not in prepared_cache:
+            prepared_cache["features"] = feature_matrix_for(prepared(), dataset_key)
+        return prepared_cache["features"]
+
+    stages = {
+        "eda_payload": lambda: compute_eda_payload(prepared()),
+        "multivariate_payload": lambda: compute_multivariate_payload(prepared()),
+        "aggregates": lambda: compute_aggregates(prepared()),
+        "ml_payload": lambda: train_models(prepared(), features()),
+        "anomalies_payload": lambda: detect_anomalies(prepared(), features()),
+        "near_repeat_payload": lambda: near_repeat.compute_near_repeat_payload(prepared()),
+    }
+    # Stages configured outside this module also key their cache on that config.
+    stage_names = {
+        "ml_payload": f"ml_payload-{explanations.cache_version()}",
+        "near_repeat_payload": f"near_repeat_payload-{near_repeat.cache_version()}",
+    }
+    payloads = {}
+    for done, (field, stage) in enumerate(stages.items(), start=1):
+        payloads[field] = _memoized_stage(dataset_key, stage_names.get(field, field), stage)
+        if on_stage is not None:
+            on_stage(field, done, len(stages))
+    return payloads
+
+
+def save_snapshot(asset, payloads: Dict[str, Any]) -> AnalyticsSnapshot:
+    with transaction.atomic():
+        snapshot = AnalyticsSnapshot.objects.create(
+            data_asset=asset,
+            district=asset.district,
+            **payloads,
+        )
+        store_encoded_payload(snapshot)
+        point_current_snapshot(snapshot)
+    return snapshot
+
+
+_rollup_state = threading.local()
+
+
+@contextmanager
+def deferred_citywide_rollup():
+    """
+    Refresh the citywide rollup once when the block ends (after commit)
+    instead of after every district snapshot saved inside it.
+    """
+    depth = getattr(_rollup_state, "depth", 0)
+    _rollup_state.depth = depth + 1
+    try:
+        yield
+    finally:
+        _rollup_state.depth = depth
+        if depth == 0 and getattr(_rollup_state, "pending", False):
+            _rollup_state.pending = False
+            transaction.on_commit(refresh_citywide_snapshot, robust=True)
+
+
+def point_current_snapshot(snapshot: AnalyticsSnapshot):
+    # Pointers are kept per district and for the city; beat views read the
+    # district snapshot.
+    if snapshot.beat_id is not None:
+        return
+    CurrentSnapshot.objects.update_or_create(
+        district_id=snapshot.district_id,
+        defaults={"snapshot": snapshot},
+    )
+    if snapshot.district_id is not None:
+        if getattr(_rollup_state, "depth", 0):
+            _rollup_state.pending = True
+        else:
+            # After commit, so the rollup reads every district's committed pointer.
+            transaction.on_commit(refresh_citywide_snapshot, robust=True)
+
+
+def refresh_citywide_snapshot() -> AnalyticsSnapshot | None:
+    """
+    Rebuild the citywide rollup by merging the current district snapshots.
+    A no-op when the rollup already covers exactly those snapshots; districts
+    whose snapshot predates ``aggregates`` are left out and listed.
+    Refreshes are serialized on the citywide pointer row, and the sources are
+    read under that lock, so concurrent callers wait and then find the
+    rollup already current instead of racing to write it.
+    """
+    with transaction.atomic():
+        pointer = (
+            CurrentSnapshot.objects.select_for_update()
+            .filter(district__isnull=True)
+            .first()
+        )
+        current = None
+        if pointer is not None:
+            current = AnalyticsSnapshot.objects.only("id", "aggregates").filter(pk=pointer.snapshot_id).first()
+        return _refresh_citywide_snapshot(current)
+
+
+def _refresh_citywide_snapshot(current: AnalyticsSnapshot | None) -> AnalyticsSnapshot | None:
+    sources = list(
+        AnalyticsSnapshot.objects.filter(
+            pk__in=CurrentSnapshot.objects.filter(district__isnull=False).values("snapshot_id")
+        ).only(
+            "id",
+            "district_id",
+            "aggregates",
+            "multivariate_payload",
+            "anomalies_payload",
+            "near_repeat_payload",
+        )
+    )
+    mergeable = sorted(
+        (source for source in sources if source.aggregates.get("columns")),
+        key=lambda source: source.district_id,
+    )
+    if not mergeable:
+        return None
+    merged_from = [str(source.pk) for source in mergeable]
+    if current is not None and current.aggregates.get("merged_from") == merged_from:
+        return current
+
+    def name(district_id):
+        district = reference.district_by_id(district_id)
+        return district.name if district else str(district_id)
+
+    payloads = merge_district_payloads(
+        [
+            {
+                "name": name(source.district_id),
+                "aggregates": source.aggregates,
+                "multivariate_payload": source.multivariate_payload,
+                "anomalies_payload": source.anomalies_payload,
+                "near_repeat_payload": source.near_repeat_payload,
+            }
+            for source in mergeable
+        ]
     )
+    payloads["aggregates"].update(
+        merged_from=merged_from,
+        missing_districts=sorted(
+            name(source.district_id) for source in sources if source not in mergeable
+        ),
+    )
+    snapshot = AnalyticsSnapshot.objects.create(data_asset=None, district=None, **payloads)
+    store_encoded_payload(snapshot)
+    point_current_snapshot(snapshot)
     return snapshot
 
 
-def latest_snapshot_for_district(district_slug: str) -> AnalyticsSnapshot | None:
-    return (
-        AnalyticsSnapshot.objects.filter(district__slug=district_slug)
-        .order_by("-generated_at")
+def build_snapshot_for_asset(
+    asset, df: pd.DataFrame | None = None, dataset_hash: str | None = None
+) -> AnalyticsSnapshot:
+    return save_snapshot(asset, compute_snapshot_payloads(asset, df, dataset_hash=dataset_hash))
+
+
+def encode_snapshot(snapshot: AnalyticsSnapshot) -> bytes:
+    return dumps_gzip(AnalyticsSnapshotSerializer(snapshot).data)
+
+
+def store_encoded_payload(snapshot: AnalyticsSnapshot) -> bytes:
+    snapshot.encoded_payload = encode_snapshot(snapshot)
+    snapshot.save(update_fields=["encoded_payload"])
+    return snapshot.encoded_payload
+
+
+# Encoded payloads never change once written, so each process keeps the most
+# recent ones by snapshot id; the warm-up hook fills it before gunicorn forks.
+ENCODED_PAYLOAD_CACHE_SIZE = 32
+_encoded_payloads: "OrderedDict[Any, bytes]" = OrderedDict()
+_encoded_payloads_lock = Lock()
+
+
+def _current_pointer(district_slug: str):
+    """``CurrentSnapshot`` rows for a district slug or ``CITYWIDE_SLUG``; None for unknown slugs."""
+    if district_slug == CITYWIDE_SLUG:
+        return CurrentSnapshot.objects.filter(district__isnull=True)
+    district = reference.district_by_slug(district_slug)
+    if district is None:
+        return None
+    return CurrentSnapshot.objects.filter(district_id=district.pk)
+
+
+def current_encoded_payload(district_slug: str) -> bytes | None:
+    """Gzipped JSON of the district's current snapshot; a memo hit costs one pointer lookup."""
+    pointer = _current_pointer(district_slug)
+    if pointer is None:
+        return None
+    snapshot_id = pointer.values_list("snapshot_id", flat=True).first()
+    if snapshot_id is None:
+        return None
+    with _encoded_payloads_lock:
+        encoded = _encoded_payloads.get(snapshot_id)
+        if encoded is not None:
+            _encoded_payloads.move_to_end(snapshot_id)
+            return encoded
+    encoded = (
+        AnalyticsSnapshot.objects.filter(pk=snapshot_id)
+        .values_list("encoded_payload", flat=True)
         .first()
     )
+    if encoded is None:
+        encoded = store_encoded_payload(latest_snapshot_for_district(district_slug))
+    encoded = bytes(encoded)
+    with _encoded_payloads_lock:
+        _encoded_payloads[snapshot_id] = encoded
+        while len(_encoded_payloads) > ENCODED_PAYLOAD_CACHE_SIZE:
+            _encoded_payloads.popitem(last=False)
+    return encoded
+
+
+def latest_snapshot_for_district(
+    district_slug: str, fields: List[str] | None = None
+) -> AnalyticsSnapshot | None:
+    """
+    Latest snapshot for a district (or ``CITYWIDE_SLUG``). Pass ``fields`` to
+    load only those columns and skip decoding the large JSON payloads that are
+    not needed.
+    """
+    pointer = _current_pointer(district_slug)
+    if pointer is None:
+        return None
+    queryset = AnalyticsSnapshot.objects.filter(pk__in=pointer.values("snapshot_id"))
+    if fields:
+        return queryset.only(*fields).first()
+    snapshot = queryset.select_related("beat").defer("aggregates").first()
+    district = reference.district_by_slug(district_slug)
+    if snapshot is not None and district is not None:
+        snapshot.district = district
+    return snapshot
+
+
+def model_explanations(district_slug: str) -> Dict[str, Any] | None:
+    """
+    Explanations saved in the feature store when the current snapshot's
+    models were trained; None for the citywide rollup or when the store no
+    longer has them (a cleared cache, or different explanation settings).
+    """
+    snapshot = latest_snapshot_for_district(district_slug, fields=["id", "data_asset", "ml_payload"])
+    if snapshot is None or snapshot.data_asset_id is None:
+        return None
+    from . import feature_store
+
+    store = (snapshot.ml_payload or {}).get("explanations_store")
+    if store:
+        path = feature_store.store_path(*store)
+    elif snapshot.data_asset.content_hash:
+        # Snapshots trained before the store key was recorded.
+        path = feature_store.store_path(STAGE_VERSION, f"{snapshot.data_asset.content_hash}-{district_slug}")
+    else:
+        return None
+    return explanations.load_explanations(path)
+
+
+def snapshot_table_records(snapshot: AnalyticsSnapshot, table: str) -> List[Dict[str, Any]]:
+    if table not in EXPORTABLE_TABLES:
+        raise ValueError(f"Unknown table '{table}'. Choose one of: {', '.join(EXPORTABLE_TABLES)}.")
+    payload_field, key = EXPORTABLE_TABLES[table]
+    return getattr(snapshot, payload_field).get(key, [])
+
+
+def archive_snapshot(snapshot: AnalyticsSnapshot) -> str:
+    """Move the snapshot payloads to storage and blank them in the database."""
+    scope = snapshot.district_id or CITYWIDE_SLUG
+    path = f"{SNAPSHOT_ARCHIVE_DIR}/{scope}/{snapshot.id}.json.gz"
+    body = dumps_gzip({field: getattr(snapshot, field) for field in ARCHIVED_FIELDS})
+    if default_storage.exists(path):
+        default_storage.delete(path)
+    saved_path = default_storage.save(path, ContentFile(body))
+    for field in ARCHIVED_FIELDS:
+        setattr(snapshot, field, {})
+    snapshot.encoded_payload = None
+    snapshot.archived_at = timezone.now()
+    snapshot.archive_path = saved_path
+    snapshot.save(update_fields=ARCHIVED_FIELDS + ["encoded_payload", "archived_at", "archive_path"])
+    return saved_path
+
+
+def load_archived_payloads(snapshot: AnalyticsSnapshot) -> Dict[str, Any]:
+    with default_storage.open(snapshot.archive_path, "rb") as fp:
+        return json.loads(gzip.decompress(fp.read()))
+
+
+def compact_snapshots(keep: int, dry_run: bool = False) -> List[AnalyticsSnapshot]:
+    """
+    Archive payloads of all but the ``keep`` newest snapshots per district.
+    Snapshots that a ``CurrentSnapshot`` points at are never archived.
+    """
+    current_ids = set(CurrentSnapshot.objects.values_list("snapshot_id", flat=True))
+    archived: List[AnalyticsSnapshot] = []
+    for district_id in AnalyticsSnapshot.objects.order_by().values_list("district_id", flat=True).distinct():
+        stale_ids = [
+            pk
+            for pk in AnalyticsSnapshot.objects.filter(district_id=district_id)
+            .order_by("-generated_at")
+            .values_list("id", flat=True)[keep:]
+            if pk not in current_ids
+        ]
+        candidates = AnalyticsSnapshot.objects.filter(id__in=stale_ids, archived_at__isnull=True)
+        for snapshot in candidates.iterator(chunk_size=10):
+            if not dry_run:
+                archive_snapshot(snapshot)
+            archived.append(snapshot)
+    return archived
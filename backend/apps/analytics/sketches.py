@@ -0,0 +1,265 @@
+"""
+Mergeable column summaries.
+
+Each district snapshot stores, next to its payloads, a small summary of every
+column (row/null counts, running moments, a bounded value histogram, top
+labels and a HyperLogLog register set for distinct counts) plus pairwise
+co-moments of the numeric columns. Summaries of any number of districts merge
+without the rows, and ``describe_sketch``/``correlation_records`` turn a
+merged summary into the same shape ``describe_column`` and the correlation
+table produce. Values are exact while a column has at most
+``SKETCH_MAX_VALUES`` distinct values (or labels) per district; beyond that
+quantiles come from equal-weight centroids and distinct counts from the HLL
+estimate.
+"""
+from __future__ import annotations
+
+import hashlib
+import base64
+from pathlib import Path
+from typing import Any, Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+SKETCH_MAX_VALUES = 256
+HLL_PRECISION = 10
+HLL_REGISTERS = 1 << HLL_PRECISION
+HISTOGRAM_BINS = 15
+QUANTILES = {"q25": 0.25, "median": 0.5, "q75": 0.75}
+MODULE_VERSION = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+
+
+def _hll_registers(series: pd.Series) -> np.ndarray:
+    registers = np.zeros(HLL_REGISTERS, dtype=np.uint8)
+    if series.empty:
+        return registers
+    hashes = pd.util.hash_pandas_object(series, index=False).to_numpy(np.uint64)
+    index = (hashes >> np.uint64(64 - HLL_PRECISION)).astype(np.int64)
+    rest = hashes & np.uint64((1 << (64 - HLL_PRECISION)) - 1)
+    # Position of the lowest set bit (an exact power of two, so log2 is exact).
+    lowest = rest & (~rest + np.uint64(1))
+    rank = np.full(len(rest), 64 - HLL_PRECISION + 1, dtype=np.uint8)
+    nonzero = rest != 0
+    rank[nonzero] = np.log2(lowest[nonzero].astype(np.float64)).astype(np.uint8) + 1
+    np.maximum.at(registers, index, rank)
+    return registers
+
+
+def _hll_decode(encoded: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(encoded), dtype=np.uint8)
+
+
+def _hll_estimate(registers: np.ndarray) -> int:
+    m = float(HLL_REGISTERS)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    estimate = alpha * m * m / np.sum(np.power(2.0, -registers.astype(np.float64)))
+    zeros = int(np.count_nonzero(registers == 0))
+    if estimate <= 2.5 * m and zeros:
+        estimate = m * np.log(m / zeros)
+    return int(round(estimate))
+
+
+def _compress(values: np.ndarray, weights: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Collapse sorted weighted values into at most ``SKETCH_MAX_VALUES`` equal-weight centroids."""
+    before = np.cumsum(weights) - weights
+    bucket = np.minimum((before / weights.sum() * SKETCH_MAX_VALUES).astype(np.int64), SKETCH_MAX_VALUES - 1)
+    totals = np.bincount(bucket, weights=weights)
+    means = np.bincount(bucket, weights=values * weights)
+    keep = totals > 0
+    return means[keep] / totals[keep], totals[keep]
+
+
+def column_sketch(series: pd.Series) -> Dict[str, Any]:
+    non_null = series.dropna()
+    sketch: Dict[str, Any] = {
+        "dtype": str(series.dtype),
+        "rows": int(len(series)),
+        "non_null": int(len(non_null)),
+    }
+    # Values are hashed as floats or strings so districts whose column came
+    # out as int in one file and float (or object) in another still merge.
+    if pd.api.types.is_numeric_dtype(series):
+        values = non_null.to_numpy(dtype=np.float64)
+        hashed = pd.Series(values)
+        counts = hashed.value_counts(sort=False).sort_index()
+        exact = len(counts) <= SKETCH_MAX_VALUES
+        centroids, weights = counts.index.to_numpy(np.float64), counts.to_numpy(np.float64)
+        if not exact:
+            centroids, weights = _compress(centroids, weights)
+        sketch["numeric"] = {
+            "mean": float(values.mean()) if len(values) else 0.0,
+            "m2": float(((values - values.mean()) ** 2).sum()) if len(values) else 0.0,
+            "min": float(values.min()) if len(values) else None,
+            "max": float(values.max()) if len(values) else None,
+            "values": centroids.tolist(),
+            "weights": weights.tolist(),
+            "exact": exact,
+        }
+    else:
+        hashed = non_null.astype(str)
+        counts = hashed.value_counts()
+        sketch["labels"] = {
+            "top": [[label, int(count)] for label, count in counts.head(SKETCH_MAX_VALUES).items()],
+            "rest": int(counts.iloc[SKETCH_MAX_VALUES:].sum()),
+            # How value_counts labels the missing entry ("nan", "None", "NaT").
+            "null": str(series[series.isna()].iloc[0]) if len(non_null) < len(series) else None,
+        }
+    sketch["hll"] = base64.b64encode(_hll_registers(hashed).tobytes()).decode()
+    return sketch
+
+
+def merge_column_sketches(sketches: List[Dict[str, Any]]) -> Dict[str, Any]:
+    dtypes = {sketch["dtype"] for sketch in sketches}
+    registers = np.maximum.reduce([_hll_decode(sketch["hll"]) for sketch in sketches])
+    merged: Dict[str, Any] = {
+        "dtype": dtypes.pop() if len(dtypes) == 1 else "object",
+        "rows": sum(sketch["rows"] for sketch in sketches),
+        "non_null": sum(sketch["non_null"] for sketch in sketches),
+        "hll": base64.b64encode(registers.tobytes()).decode(),
+    }
+    numeric = [sketch["numeric"] for sketch in sketches if "numeric" in sketch]
+    if numeric and len(numeric) == len(sketches):
+        count = mean = m2 = 0.0
+        for part, sketch in zip(numeric, sketches):
+            n = sketch["non_null"]
+            if not n:
+                continue
+            # Chan et al. parallel update of the mean and sum of squared deviations.
+            delta = part["mean"] - mean
+            total = count + n
+            mean += delta * n / total
+            m2 += part["m2"] + delta * delta * count * n / total
+            count = total
+        values = np.concatenate([np.asarray(part["values"], dtype=np.float64) for part in numeric])
+        weights = np.concatenate([np.asarray(part["weights"], dtype=np.float64) for part in numeric])
+        values, inverse = np.unique(values, return_inverse=True)
+        weights = np.bincount(inverse, weights=weights, minlength=len(values))
+        exact = all(part["exact"] for part in numeric) and len(values) <= SKETCH_MAX_VALUES
+        if len(values) > SKETCH_MAX_VALUES:
+            values, weights = _compress(values, weights)
+        lows = [part["min"] for part in numeric if part["min"] is not None]
+        highs = [part["max"] for part in numeric if part["max"] is not None]
+        merged["numeric"] = {
+            "mean": mean,
+            "m2": m2,
+            "min": min(lows) if lows else None,
+            "max": max(highs) if highs else None,
+            "values": values.tolist(),
+            "weights": weights.tolist(),
+            "exact": exact,
+        }
+    else:
+        counts: Dict[str, int] = {}
+        rest = 0
+        null_label = None
+        for sketch in sketches:
+            labels = sketch.get("labels") or {"top": [], "rest": 0}
+            for label, count in labels["top"]:
+                counts[label] = counts.get(label, 0) + count
+            rest += labels["rest"]
+            null_label = null_label or labels.get("null")
+        ranked = sorted(counts.items(), key=lambda item: item[1], reverse=True)
+        merged["labels"] = {
+            "top": [list(item) for item in ranked[:SKETCH_MAX_VALUES]],
+            "rest": rest + sum(count for _, count in ranked[SKETCH_MAX_VALUES:]),
+            "null": null_label,
+        }
+    return merged
+
+
+def _weighted_quantile(values: np.ndarray, weights: np.ndarray, q: float) -> float:
+    """Linear-interpolated quantile over value counts (pandas' default method)."""
+    cumulative = np.cumsum(weights)
+    position = q * (cumulative[-1] - 1)
+    low = int(np.floor(position))
+    lower = values[min(np.searchsorted(cumulative, low, side="right"), len(values) - 1)]
+    upper = values[min(np.searchsorted(cumulative, low + 1, side="right"), len(values) - 1)]
+    return float(lower + (upper - lower) * (position - low))
+
+
+def describe_sketch(sketch: Dict[str, Any]) -> Dict[str, Any]:
+    """Same shape as ``describe_column`` for a (merged) column summary."""
+    rows, non_null = sketch["rows"], sketch["non_null"]
+    result: Dict[str, Any] = {
+        "dtype": sketch["dtype"],
+        "non_null": non_null,
+        "null_pct": (rows - non_null) / rows * 100 if rows else 0.0,
+    }
+    if "numeric" in sketch:
+        numeric = sketch["numeric"]
+        values = np.asarray(numeric["values"], dtype=np.float64)
+        weights = np.asarray(numeric["weights"], dtype=np.float64)
+        exact = numeric["exact"]
+        result["unique"] = len(values) if exact else _hll_estimate(_hll_decode(sketch["hll"]))
+        if not non_null:
+            return result
+        result["stats"] = {
+            "mean": numeric["mean"],
+            "std": float(np.sqrt(numeric["m2"] / (non_null - 1))) if non_null > 1 else float("nan"),
+            "min": numeric["min"],
+            "max": numeric["max"],
+            **{name: _weighted_quantile(values, weights, q) for name, q in QUANTILES.items()},
+        }
+        counts, bins = np.histogram(
+            values, bins=HISTOGRAM_BINS, range=(numeric["min"], numeric["max"]), weights=weights
+        )
+        result["histogram"] = {"bins": bins.round(2).tolist(), "counts": counts.round().astype(int).tolist()}
+    else:
+        labels = sketch["labels"]
+        exact = labels["rest"] == 0
+        result["unique"] = len(labels["top"]) if exact else _hll_estimate(_hll_decode(sketch["hll"]))
+        top = list(labels["top"])
+        if rows > non_null:
+            top.append([labels.get("null") or "nan", rows - non_null])
+        top.sort(key=lambda item: item[1], reverse=True)
+        result["top_values"] = [{"label": label, "count": count} for label, count in top[:15]]
+    return result
+
+
+def moment_sketch(df: pd.DataFrame, columns: List[str]) -> Dict[str, Any]:
+    """Pairwise-complete sums behind Pearson correlations of ``columns``."""
+    values = df[columns].to_numpy(dtype=np.float64)
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    mask = present.astype(np.float64)
+    return {
+        "columns": columns,
+        "n": (mask.T @ mask).tolist(),
+        "sum": (filled.T @ mask).tolist(),
+        "sum_sq": ((filled**2).T @ mask).tolist(),
+        "sum_xy": (filled.T @ filled).tolist(),
+    }
+
+
+def merge_moments(moments: Iterable[Dict[str, Any]]) -> Dict[str, Any] | None:
+    moments = [moment for moment in moments if moment and moment["columns"]]
+    if not moments:
+        return None
+    columns = list(dict.fromkeys(column for moment in moments for column in moment["columns"]))
+    size = len(columns)
+    merged = {key: np.zeros((size, size)) for key in ("n", "sum", "sum_sq", "sum_xy")}
+    for moment in moments:
+        index = np.array([columns.index(column) for column in moment["columns"]])
+        for key in merged:
+            merged[key][np.ix_(index, index)] += np.asarray(moment[key])
+    return {"columns": columns, **{key: value.tolist() for key, value in merged.items()}}
+
+
+def correlation_records(moments: Dict[str, Any] | None) -> List[Dict[str, Any]]:
+    """Correlation table in the ``df.corr().reset_index()`` record layout."""
+    if not moments:
+        return []
+    n = np.asarray(moments["n"])
+    sum_x = np.asarray(moments["sum"])  # sum_x[i, j]: sum of column i where j is present
+    sum_sq = np.asarray(moments["sum_sq"])
+    sum_xy = np.asarray(moments["sum_xy"])
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = n * sum_xy - sum_x * sum_x.T
+        spread = (n * sum_sq - sum_x**2) * (n * sum_sq.T - sum_x.T**2)
+        corr = covariance / np.sqrt(spread)
+    corr[~np.isfinite(corr)] = 0.0
+    # Rounding can leave a column's self-correlation a hair off 1.
+    np.fill_diagonal(corr, np.where(np.diag(corr) != 0, 1.0, 0.0))
+    frame = pd.DataFrame(np.clip(corr, -1.0, 1.0), index=moments["columns"], columns=moments["columns"])
+    return frame.reset_index().to_dict(orient="records")
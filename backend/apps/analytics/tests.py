@@ -1,3 +1,573 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.accounts import reference
+from apps.accounts.models import District
+from apps.geo import services as geo_services
+from apps.uploads.models import DataAsset
+from config.warmup import STEPS, warm_up
+
+from .approximate import estimate_counts, stratified_sample
+from .crosstab import crosstab_payload, encode_column, pivot_records
+from .explanations import explain_model
+from .features import compute_rolling_features
+from .middleware import GZipMiddleware, accepts_gzip
+from .near_repeat import compute_near_repeat_payload
+from .query import QueryError, compile_query, execute_plan, normalize_query
+from .models import AnalyticsSnapshot, CurrentSnapshot
+from .renderers import (
+    ARROW_STREAM_MEDIA_TYPE,
+    COLUMNAR_JSON_MEDIA_TYPE,
+    FastJSONRenderer,
+    from_columnar,
+    to_columnar,
+)
+from .services import (
+    archive_snapshot,
+    build_feature_matrix,
+    compact_snapshots,
+    compute_aggregates,
+    compute_eda_payload,
+    compute_multivariate_payload,
+    deferred_citywide_rollup,
+    feature_matrix_for,
+    latest_snapshot_for_district,
+    load_archived_payloads,
+    merge_district_payloads,
+    refresh_citywide_snapshot,
+    save_snapshot,
+)
+
+# Runs in a fresh interpreter so modules imported by other tests in this
+# process cannot hide an eager import.
+IMPORT_GUARD_SCRIPT = """
+import sys
+
+import django
+
+django.setup()
+
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.db import connection
+from django.test.utils import setup_test_environment
+from rest_framework.test import APIClient
+
+setup_test_environment()
+connection.creation.create_test_db(verbosity=0)
+
+from apps.accounts.models import District
+from apps.analytics.models import AnalyticsSnapshot
+from apps.analytics.services import point_current_snapshot
+from apps.uploads.models import DataAsset
+
+east = District.objects.get(slug="east")
+point_current_snapshot(
+    AnalyticsSnapshot.objects.create(
+        data_asset=DataAsset.objects.create(district=east, status="processed"),
+        district=east,
+        multivariate_payload={"monthly_counts": [{"Year_Month": "2024-01", "count": 3}]},
+        ml_payload={"models": []},
+    )
+)
+client = APIClient()
+client.force_authenticate(get_user_model().objects.create_user("guard"))
+for url in sys.argv[1:]:
+    response = client.get(url)
+    assert response.status_code < 500, (url, response.status_code)
+print("heavy:" + ",".join(name for name in ("sklearn", "scipy") if name in sys.modules))
+"""
+
+NON_ML_ENDPOINTS = [
+    "/api/accounts/districts/",
+    "/api/accounts/profile/",
+    "/api/uploads/",
+    "/api/uploads/refresh/",
+    "/api/analytics/districts/east/snapshot/",
+    "/api/analytics/districts/east/models/",
+    "/api/analytics/districts/east/tables/monthly_counts/",
+]
+
+
+class ImportGuardTests(SimpleTestCase):
+    def test_non_ml_endpoints_do_not_import_sklearn(self):
+        result = subprocess.run(
+            [sys.executable, "-c", IMPORT_GUARD_SCRIPT, *NON_ML_ENDPOINTS],
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "config.settings"},
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip().splitlines()[-1], "heavy:")
+
+
+class CitywideRollupTests(SimpleTestCase):
+    @staticmethod
+    def _frame(seed: int, rows: int) -> pd.DataFrame:
+        rng = np.random.default_rng(seed)
+        return pd.DataFrame(
+            {
+                "Case Number": [f"{seed}-{i}" for i in range(rows)],
+                "Hour": rng.integers(0, 24, rows),
+                "Day": rng.integers(1, 29, rows).astype(float),
+                "Year": rng.choice([2024, 2025], rows),
+                "Year_Month": rng.choice(["2024-11", "2024-12", "2025-01"], rows),
+                "Beats": rng.choice([110, 120, 410], rows),
+                "Day_char": rng.choice(["Mon", "Tue", None], rows),
+                "Crime_Category": rng.choice(["Theft", "Assault"], rows),
+            }
+        )
+
+    def test_merged_district_payloads_match_the_full_frame(self):
+        frames = [self._frame(seed, rows) for seed, rows in [(1, 300), (2, 500)]]
+        merged = merge_district_payloads(
+            [
+                {
+                    "name": f"D{index}",
+                    "aggregates": compute_aggregates(frame),
+                    "multivariate_payload": compute_multivariate_payload(frame),
+                    "anomalies_payload": {},
+                }
+                for index, frame in enumerate(frames)
+            ]
+        )
+        full = pd.concat(frames, ignore_index=True)
+        expected_eda = compute_eda_payload(full)
+        expected = compute_multivariate_payload(full)
+        for key in ["monthly_counts", "hourly_breakdown", "beat_vs_weekday"]:
+            self.assertEqual(merged["multivariate_payload"][key], expected[key])
+        for column in ["Hour", "Day", "Year"]:
+            got, want = merged["eda_payload"][column], expected_eda[column]
+            self.assertEqual(got["unique"], want["unique"])
+            self.assertEqual(got["histogram"], want["histogram"])
+            for name, value in want["stats"].items():
+                self.assertAlmostEqual(got["stats"][name], value)
+        self.assertEqual(
+            merged["eda_payload"]["Day_char"]["top_values"],
+            expected_eda["Day_char"]["top_values"],
+        )
+        got = pd.DataFrame(merged["multivariate_payload"]["correlations"]).set_index("index")
+        want = pd.DataFrame(expected["correlations"]).set_index("index")
+        self.assertTrue(np.allclose(got.loc[want.index, want.columns], want))
+
+
+class CitywideRollupRefreshTests(TestCase):
+    def _save(self, slug: str, seed: int):
+        district = District.objects.get(slug=slug)
+        frame = CitywideRollupTests._frame(seed, 50)
+        asset = DataAsset.objects.create(district=district, status="processed")
+        payloads = {
+            "aggregates": compute_aggregates(frame),
+            "multivariate_payload": compute_multivariate_payload(frame),
+            "anomalies_payload": {},
+        }
+        return save_snapshot(asset, payloads)
+
+    def test_batch_of_district_snapshots_refreshes_the_rollup_once(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with deferred_citywide_rollup():
+                self._save("east", 1)
+                self._save("west", 2)
+        self.assertEqual(len(callbacks), 1)
+        rollups = AnalyticsSnapshot.objects.filter(district=None)
+        self.assertEqual(rollups.count(), 1)
+        # Later callers find the rollup already current.
+        self.assertEqual(refresh_citywide_snapshot(), rollups.get())
+        self.assertEqual(rollups.count(), 1)
+
+
+class SnapshotRetentionTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.east = District.objects.get(slug="east")
+
+    def _save(self, version: int) -> AnalyticsSnapshot:
+        asset = DataAsset.objects.create(district=self.east, status="processed")
+        snapshot = save_snapshot(asset, {"eda_payload": {"version": version}, "ml_payload": {"models": [version]}})
+        # Distinct, increasing timestamps regardless of clock resolution.
+        generated_at = pd.Timestamp("2024-01-01", tz="UTC") + pd.Timedelta(days=version)
+        AnalyticsSnapshot.objects.filter(pk=snapshot.pk).update(generated_at=generated_at)
+        return snapshot
+
+    def test_latest_follows_the_pointer_and_compaction_keeps_it(self):
+        snapshots = []
+        for version in range(3):
+            snapshots.append(self._save(version))
+            self.assertEqual(latest_snapshot_for_district("east").pk, snapshots[-1].pk)
+        self.assertEqual(CurrentSnapshot.objects.get(district=self.east).snapshot_id, snapshots[-1].pk)
+
+        self.assertEqual([s.pk for s in compact_snapshots(keep=1, dry_run=True)], [snapshots[1].pk, snapshots[0].pk])
+        self.assertFalse(AnalyticsSnapshot.objects.filter(archived_at__isnull=False).exists())
+        # The pointer is kept even when it is not among the newest ``keep``.
+        CurrentSnapshot.objects.filter(district=self.east).update(snapshot=snapshots[0])
+        archived = compact_snapshots(keep=0)
+        self.assertEqual([s.pk for s in archived], [snapshots[2].pk, snapshots[1].pk])
+        self.assertEqual(compact_snapshots(keep=0), [])
+        self.assertEqual(AnalyticsSnapshot.objects.get(pk=snapshots[0].pk).eda_payload, {"version": 0})
+
+    def test_archive_moves_payloads_to_storage(self):
+        snapshot = AnalyticsSnapshot.objects.get(pk=self._save(1).pk)
+        archive_snapshot(snapshot)
+        stored = AnalyticsSnapshot.objects.get(pk=snapshot.pk)
+        self.assertEqual((stored.eda_payload, stored.ml_payload, stored.encoded_payload), ({}, {}, None))
+        self.assertIsNotNone(stored.archived_at)
+        payloads = load_archived_payloads(stored)
+        self.assertEqual(payloads["eda_payload"], {"version": 1})
+        self.assertEqual(payloads["ml_payload"], {"models": [1]})
+
+
+class ResponseEncodingTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("encoding"))
+
+    def test_accepts_gzip_honours_q_values(self):
+        factory = RequestFactory()
+        cases = {
+            "gzip": True,
+            "gzip, deflate, br": True,
+            "br, gzip;q=0.5": True,
+            "GZIP; q=1.0": True,
+            "*": True,
+            "gzip;q=0": False,
+            "gzip; q=0.000, identity": False,
+            "*;q=0": False,
+            "gzip;q=0, *": False,
+            "identity": False,
+            "": False,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header=header):
+                request = factory.get("/", HTTP_ACCEPT_ENCODING=header)
+                self.assertIs(accepts_gzip(request), expected)
+
+    def test_fast_json_renderer_encodes_numpy_and_nan(self):
+        renderer = FastJSONRenderer()
+        data = {"counts": np.arange(3), "mean": np.float64("nan"), 1: "one"}
+        self.assertEqual(json.loads(renderer.render(data)), {"counts": [0, 1, 2], "mean": None, "1": "one"})
+        self.assertEqual(renderer.render(None), b"")
+
+    def test_middleware_skips_compression_when_gzip_is_refused(self):
+        factory = RequestFactory()
+        body = b'{"rows": [' + b", ".join([b"1"] * 200) + b"]}"
+        middleware = GZipMiddleware(lambda request: HttpResponse(body, content_type="application/json"))
+
+        compressed = middleware(factory.get("/", HTTP_ACCEPT_ENCODING="gzip"))
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(compressed.content), body)
+
+        plain = middleware(factory.get("/", HTTP_ACCEPT_ENCODING="gzip;q=0, identity"))
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertEqual(plain.content, body)
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+    def test_snapshot_endpoint_negotiates_the_pre_encoded_payload(self):
+        asset = DataAsset.objects.create(district=District.objects.get(slug="east"), status="processed")
+        save_snapshot(asset, {"eda_payload": {"rows": 3}})
+        url = "/api/analytics/districts/east/snapshot/"
+
+        compressed = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(compressed.status_code, 200)
+        self.assertEqual(compressed["Content-Encoding"], "gzip")
+        payload = json.loads(gzip.decompress(compressed.content))
+        self.assertEqual(payload["eda_payload"], {"rows": 3})
+
+        plain = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip;q=0")
+        self.assertEqual(plain.status_code, 200)
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertEqual(json.loads(plain.content), payload)
+
+
+class PayloadFormatTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("formats"))
+        self.rows = [
+            {"month": "2024-01", "count": 4, "note": None},
+            {"month": "2024-02", "count": 7},
+            {"month": "2024-03", "extra": [{"beat": "410"}, {"beat": "411", "flag": True}]},
+        ]
+
+    def test_columnar_round_trip_keeps_absent_keys_absent(self):
+        payload = {"table": self.rows, "empty": [], "scalar": 3}
+        encoded = to_columnar(payload)
+        block = encoded["table"]
+        self.assertEqual(block["$length"], 3)
+        self.assertEqual(block["$columns"]["count"], [4, 7, None])
+        self.assertEqual(block["$absent"], {"count": [2], "note": [1, 2], "extra": [0, 1]})
+        self.assertEqual(from_columnar(json.loads(json.dumps(encoded))), payload)
+        # Uniform records carry no absent map.
+        self.assertNotIn("$absent", to_columnar([{"a": 1}, {"a": None}]))
+
+    def test_snapshot_table_negotiates_columnar_json_and_arrow(self):
+        asset = DataAsset.objects.create(district=District.objects.get(slug="east"), status="processed")
+        monthly = [{"month": "2024-01", "count": 4}, {"month": "2024-02", "count": 7}]
+        save_snapshot(asset, {"multivariate_payload": {"monthly_counts": monthly}})
+        url = "/api/analytics/districts/east/tables/monthly_counts/"
+
+        plain = self.client.get(url)
+        self.assertEqual(plain.status_code, 200)
+        self.assertEqual(json.loads(plain.content), monthly)
+
+        columnar = self.client.get(url, HTTP_ACCEPT=COLUMNAR_JSON_MEDIA_TYPE)
+        self.assertEqual(columnar.status_code, 200)
+        self.assertTrue(columnar["Content-Type"].startswith(COLUMNAR_JSON_MEDIA_TYPE))
+        body = json.loads(columnar.content)
+        self.assertEqual(body["$columns"], {"month": ["2024-01", "2024-02"], "count": [4, 7]})
+        self.assertEqual(from_columnar(body), monthly)
+
+        arrow = self.client.get(url, HTTP_ACCEPT=ARROW_STREAM_MEDIA_TYPE)
+        self.assertEqual(arrow.status_code, 200)
+        self.assertEqual(arrow["Content-Type"], ARROW_STREAM_MEDIA_TYPE)
+        table = pa.ipc.open_stream(arrow.content).read_all()
+        self.assertEqual(table.to_pylist(), monthly)
+
+        missing = self.client.get("/api/analytics/districts/east/tables/unknown/", HTTP_ACCEPT=ARROW_STREAM_MEDIA_TYPE)
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(json.loads(missing.content), {"detail": "Unknown table 'unknown'."})
+
+
+class WarmUpTests(SimpleTestCase):
+    def test_warm_up_skips_steps_that_need_the_database(self):
+        # SimpleTestCase refuses queries, like a database that is not up yet.
+        reference._forget()
+        self.addCleanup(reference._forget)
+        offline = mock.patch("apps.geo.services.requests.get", side_effect=requests.ConnectionError("offline"))
+        with offline, mock.patch.dict(geo_services._parsed, clear=True), self.assertLogs("config.warmup", "ERROR"):
+            timings = warm_up(freeze=False)
+        self.assertEqual(list(timings), [name for name, _ in STEPS])
+        self.assertIsNotNone(timings["urlconf"])
+        self.assertIsNone(timings["reference data"])
+        self.assertIsNone(timings["current snapshots"])
+
+
+class RollingFeatureTests(SimpleTestCase):
+    def test_counts_and_gaps_match_a_row_by_row_scan(self):
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame(
+            {
+                "Date/Time Occurred": pd.Timestamp("2023-01-01")
+                + pd.to_timedelta(rng.integers(0, 500, 400), unit="D"),
+                "Beats": rng.choice([410, 420, 430], 400),
+                "Crime_Category": rng.choice(["Theft", "Assault"], 400),
+            }
+        )
+        features = compute_rolling_features(df)
+        for index in rng.choice(len(df), 40, replace=False):
+            row = df.iloc[index]
+            earlier = df[
+                (df["Beats"] == row["Beats"])
+                & (df["Date/Time Occurred"] < row["Date/Time Occurred"])
+            ]
+            gaps = (row["Date/Time Occurred"] - earlier["Date/Time Occurred"]).dt.days
+            self.assertEqual(features["beat_count_28d"].iloc[index], (gaps <= 28).sum())
+            self.assertEqual(features["beat_count_90d"].iloc[index], (gaps <= 90).sum())
+            expected_gap = gaps.min() if len(gaps) else np.nan
+            np.testing.assert_equal(features["beat_days_since_last"].iloc[index], expected_gap)
+
+
+class FeatureStoreTests(SimpleTestCase):
+    def test_matrix_is_stored_once_and_memory_mapped(self):
+        rng = np.random.default_rng(5)
+        rows = 300
+        df = pd.DataFrame(
+            {
+                "Hour": rng.integers(0, 24, rows),
+                "Beats": rng.choice([410, 420, 430], rows),
+                "Crime_Category": rng.choice(["Theft", "Assault", None], rows),
+                "target_binary": rng.integers(0, 2, rows),
+            }
+        )
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            built = feature_matrix_for(df, "hash-east")
+            loaded = feature_matrix_for(df, "hash-east")
+            root = loaded.matrix.data
+            while root.base is not None and not isinstance(root, np.memmap):
+                root = root.base
+            self.assertIsInstance(root, np.memmap)
+            self.assertEqual((built.matrix != loaded.matrix).nnz, 0)
+            self.assertEqual(loaded.feature_names, built.feature_names)
+            self.assertEqual(len(loaded.feature_sources), loaded.matrix.shape[1])
+            self.assertEqual(sum(len(split) for split in loaded.splits.values()), rows)
+            self.assertEqual(loaded.transform(df.head(5)).shape, (5, loaded.matrix.shape[1]))
+
+
+class ExplanationTests(SimpleTestCase):
+    def test_one_hot_columns_are_scored_as_their_source(self):
+        from sklearn.linear_model import LogisticRegression
+
+        rng = np.random.default_rng(9)
+        rows = 600
+        df = pd.DataFrame(
+            {
+                "Hour": rng.integers(0, 24, rows),
+                "Beats": rng.choice([410, 420, 430, 440], rows),
+                "Crime_Category": rng.choice(["Theft", "Assault", "Fraud"], rows),
+            }
+        )
+        df["target_binary"] = (df["Crime_Category"] == "Assault").astype(int)
+        features = build_feature_matrix(df)
+        model = LogisticRegression(max_iter=1000).fit(*features.split("train"))
+        explanation = explain_model(model, features, labels=df.index.to_numpy() + 1000)
+
+        importances = explanation["permutation_importances"]
+        self.assertEqual(importances[0]["feature"], "Crime_Category")
+        self.assertEqual(importances[0]["encoded_features"], 3)
+        self.assertEqual({item["feature"] for item in importances}, set(features.feature_sources))
+        self.assertEqual(explanation["contributions"][0]["feature"], "Crime_Category")
+        self.assertEqual(explanation["sample_rows"], len(features.splits["validation"]))
+        example = explanation["examples"][0]
+        self.assertGreaterEqual(example["row"], 1000)
+        self.assertEqual(example["contributions"][0]["feature"], "Crime_Category")
+
+
+class IncidentQueryTests(SimpleTestCase):
+    def _run(self, table, spec):
+        return execute_plan(compile_query(json.dumps(normalize_query(spec), sort_keys=True)), table)
+
+    def test_grouped_counts_match_pandas(self):
+        rng = np.random.default_rng(9)
+        rows = 500
+        df = pd.DataFrame(
+            {
+                "Beats": rng.choice([410, 420, 430], rows),
+                "Hour": rng.integers(0, 24, rows),
+                "Date/Time Occurred": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365, rows), unit="D"),
+                "Violent_Crime_excl09A": rng.choice(["Violent", None], rows),
+            }
+        )
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        spec = {
+            "group_by": ["Beats", "Hour"],
+            "filters": [
+                {"column": "Quarter", "op": "eq", "value": 2},
+                {"column": "Violent", "op": "eq", "value": True},
+            ],
+            "measures": ["count"],
+        }
+        result = self._run(table, spec)
+        subset = df[(df["Date/Time Occurred"].dt.quarter == 2) & df["Violent_Crime_excl09A"].notna()]
+        expected = subset.groupby(["Beats", "Hour"]).size().reset_index(name="count")
+        self.assertEqual(result["rows"], expected.to_dict(orient="records"))
+        reordered = {**spec, "filters": spec["filters"][::-1]}
+        self.assertEqual(normalize_query(reordered), normalize_query(spec))
+        with self.assertRaises(QueryError):
+            normalize_query({"group_by": ["Case Number"]})
+        with self.assertRaises(QueryError):
+            self._run(table, {"filters": [{"column": "Beats", "op": "in", "value": [1, 2, "3"]}]})
+
+
+class CrossTabTests(SimpleTestCase):
+    def test_pivots_match_pandas_and_categoricals_reuse_codes(self):
+        rng = np.random.default_rng(11)
+        rows = 400
+        df = pd.DataFrame(
+            {
+                "Case Number": np.where(rng.random(rows) < 0.05, None, "c"),
+                "Beats": rng.choice([430, 410, 420], rows).astype(float),
+                "Day_char": rng.choice(["Tue", "Mon", None], rows),
+            }
+        )
+        df.loc[df.index[:5], "Beats"] = np.nan
+        expected = (
+            df.pivot_table(index="Beats", columns="Day_char", values="Case Number", aggfunc="count", fill_value=0)
+            .reset_index()
+            .to_dict(orient="records")
+        )
+        self.assertEqual(pivot_records(df, "Beats", "Day_char", count_column="Case Number"), expected)
+        plain = crosstab_payload(df, ["Day_char", "Beats"], {"Beats": "2"})
+        categorical = crosstab_payload(df.astype({"Day_char": "category"}), ["Day_char", "Beats"], {"Beats": "2"})
+        self.assertEqual(plain, categorical)
+        self.assertEqual(plain["labels"]["Day_char"], ["Mon", "Tue"])
+        self.assertEqual(plain["total"], int((df["Beats"].notna() & df["Day_char"].notna()).sum()))
+
+
+class ApproximateTests(SimpleTestCase):
+    def test_stratified_counts_are_exact_per_stratum_and_bracket_the_truth(self):
+        rng = np.random.default_rng(5)
+        rows = 20_000
+        df = pd.DataFrame(
+            {
+                "Beats": rng.choice([410, 420, 430], rows),
+                "Year_Month": rng.choice(["2024-01", "2024-02"], rows),
+                "target_binary": (rng.random(rows) < 0.1).astype(int),
+                "Hour": rng.integers(0, 24, rows),
+            }
+        )
+        sample = stratified_sample(df, 2_000, seed=1)
+        self.assertLess(len(sample.frame), 2_100)
+
+        codes, labels = encode_column(sample.frame["Year_Month"])
+        estimate, low, high = estimate_counts(sample, codes, len(labels))
+        np.testing.assert_allclose(estimate, df["Year_Month"].value_counts().sort_index().to_numpy())
+        np.testing.assert_allclose(low, high)
+
+        codes, labels = encode_column(sample.frame["Hour"])
+        estimate, low, high = estimate_counts(sample, codes, len(labels))
+        truth = df["Hour"].value_counts().sort_index().to_numpy()
+        self.assertAlmostEqual(estimate.sum(), rows)
+        self.assertGreaterEqual(((low <= truth) & (truth <= high)).mean(), 0.8)
+
+
+class NearRepeatTests(SimpleTestCase):
+    def test_pair_counts_match_brute_force_and_repeats_are_detected(self):
+        rng = np.random.default_rng(3)
+        rows, repeats = 600, 80
+        latitude = 32.70 + rng.random(rows) * 0.05
+        longitude = -97.15 + rng.random(rows) * 0.05
+        days = rng.random(rows) * 365
+        source = rng.integers(0, rows, repeats)
+        latitude = np.concatenate([latitude, latitude[source] + rng.normal(0, 0.0003, repeats)])
+        longitude = np.concatenate([longitude, longitude[source] + rng.normal(0, 0.0003, repeats)])
+        days = np.concatenate([days, days[source] + rng.random(repeats) * 3])
+        df = pd.DataFrame(
+            {
+                "Latitude": latitude,
+                "Longitude": longitude,
+                "Date/Time Occurred": pd.Timestamp("2024-01-01") + pd.to_timedelta(days, unit="D"),
+                "Beats": np.where(latitude > 32.725, 410, 420),
+            }
+        )
+        payload = compute_near_repeat_payload(df)
+        overall = payload["overall"]
+
+        # Brute force over all pairs, on the same local projection.
+        y = np.radians(latitude) * 6_371_008.8
+        x = np.radians(longitude) * 6_371_008.8 * np.cos(np.radians(latitude).mean())
+        upper = np.triu_indices(len(df), 1)
+        near = np.hypot(x[:, None] - x, y[:, None] - y)[upper] <= settings.NEAR_REPEAT_DISTANCE_METERS
+        soon = np.abs(days[:, None] - days)[upper] <= settings.NEAR_REPEAT_DAYS
+        self.assertEqual(overall["spatial_pairs"], int(near.sum()))
+        self.assertEqual(overall["temporal_pairs"], int(soon.sum()))
+        self.assertEqual(overall["close_pairs"], int((near & soon).sum()))
+        self.assertEqual(sum(band["observed"] for band in overall["bands"]), overall["close_pairs"])
+        self.assertGreater(overall["knox_ratio"], 1.5)
+        self.assertLessEqual(overall["p_value"], 0.05)
+        self.assertEqual([beat["Beats"] for beat in payload["beats"]], [410, 420])
+
+        self.assertIn("detail", compute_near_repeat_payload(df.drop(columns=["Longitude"])))
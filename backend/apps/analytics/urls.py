@@ -1,9 +1,29 @@
 from django.urls import path
 
-from .views import ColumnAnalyticsView, DistrictSnapshotView, ModelAnalyticsView
+from .views import (
+    ColumnAnalyticsView,
+    CrossTabView,
+    DistrictSnapshotView,
+    IncidentQueryView,
+    ModelAnalyticsView,
+    ModelExplanationsView,
+    NearRepeatView,
+    SnapshotTableExportView,
+    SnapshotTableView,
+)
 
 urlpatterns = [
     path("districts/<slug:district_slug>/snapshot/", DistrictSnapshotView.as_view(), name="district-snapshot"),
     path("districts/<slug:district_slug>/columns/<str:column_name>/", ColumnAnalyticsView.as_view(), name="column-analytics"),
     path("districts/<slug:district_slug>/models/", ModelAnalyticsView.as_view(), name="model-analytics"),
+    path(
+        "districts/<slug:district_slug>/models/explanations/",
+        ModelExplanationsView.as_view(),
+        name="model-explanations",
+    ),
+    path("districts/<slug:district_slug>/near-repeat/", NearRepeatView.as_view(), name="near-repeat"),
+    path("districts/<slug:district_slug>/tables/<str:table>/", SnapshotTableView.as_view(), name="snapshot-table"),
+    path("districts/<slug:district_slug>/query/", IncidentQueryView.as_view(), name="incident-query"),
+    path("districts/<slug:district_slug>/crosstab/", CrossTabView.as_view(), name="crosstab"),
+    path("districts/<slug:district_slug>/export/<str:table>/", SnapshotTableExportView.as_view(), name="snapshot-table-export"),
 ]
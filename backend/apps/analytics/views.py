@@ -1,27 +1,85 @@
+import gzip
+
+import pandas as pd
+from django.http import HttpResponse
 from rest_framework import permissions, status
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from apps.uploads.exports import (
+    encode_batches,
+    export_cache_path,
+    export_response,
+    iter_frame_batches,
+    normalize_output,
+)
+
+from .middleware import accepts_gzip
+from .renderers import (
+    ArrowIPCRenderer,
+    ColumnarJSONRenderer,
+    FastJSONRenderer,
+    split_tabular_payload,
+)
+from .query import QueryError, QueryTimeout, query_source, run_crosstab, run_query
 from .serializers import AnalyticsSnapshotSerializer
-from .services import latest_snapshot_for_district
+from .services import (
+    EXPORTABLE_TABLES,
+    current_encoded_payload,
+    latest_snapshot_for_district,
+    model_explanations,
+    snapshot_table_records,
+)
+
+TABULAR_PAYLOAD_FIELDS = ["multivariate_payload", "anomalies_payload"]
+# Clients opt into compact column arrays with
+# ``Accept: application/vnd.arlington.columnar+json``.
+ANALYTICS_RENDERERS = [FastJSONRenderer, ColumnarJSONRenderer, BrowsableAPIRenderer]
+
+
+def _encoded_json_response(request, encoded: bytes) -> HttpResponse:
+    """Serve pre-encoded gzipped JSON, decompressing only for clients without gzip."""
+    if accepts_gzip(request):
+        response = HttpResponse(encoded, content_type="application/json")
+        response["Content-Encoding"] = "gzip"
+    else:
+        response = HttpResponse(gzip.decompress(encoded), content_type="application/json")
+    response["Vary"] = "Accept-Encoding"
+    return response
 
 
 class DistrictSnapshotView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = ANALYTICS_RENDERERS
 
     def get(self, request, district_slug: str):
-        snapshot = latest_snapshot_for_district(district_slug)
-        if not snapshot:
+        if request.accepted_renderer.format != "json":
+            snapshot = latest_snapshot_for_district(district_slug)
+            if not snapshot:
+                return Response({"detail": "No analytics available yet."}, status=status.HTTP_404_NOT_FOUND)
+            return Response(AnalyticsSnapshotSerializer(snapshot).data)
+        if request.query_params.get("orient") == "split":
+            snapshot = latest_snapshot_for_district(district_slug)
+            if not snapshot:
+                return Response({"detail": "No analytics available yet."}, status=status.HTTP_404_NOT_FOUND)
+            data = dict(AnalyticsSnapshotSerializer(snapshot).data)
+            for field in TABULAR_PAYLOAD_FIELDS:
+                data[field] = split_tabular_payload(data[field])
+            return Response(data)
+
+        encoded = current_encoded_payload(district_slug)
+        if encoded is None:
             return Response({"detail": "No analytics available yet."}, status=status.HTTP_404_NOT_FOUND)
-        serializer = AnalyticsSnapshotSerializer(snapshot)
-        return Response(serializer.data)
+        return _encoded_json_response(request, encoded)
 
 
 class ColumnAnalyticsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = ANALYTICS_RENDERERS
 
     def get(self, request, district_slug: str, column_name: str):
-        snapshot = latest_snapshot_for_district(district_slug)
+        snapshot = latest_snapshot_for_district(district_slug, fields=["id", "eda_payload"])
         if not snapshot:
             return Response({"detail": "No analytics available."}, status=status.HTTP_404_NOT_FOUND)
         column_key = column_name.replace("-", " ")
@@ -33,9 +91,116 @@ class ColumnAnalyticsView(APIView):
 
 class ModelAnalyticsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = ANALYTICS_RENDERERS
 
     def get(self, request, district_slug: str):
-        snapshot = latest_snapshot_for_district(district_slug)
+        snapshot = latest_snapshot_for_district(district_slug, fields=["id", "ml_payload"])
         if not snapshot:
             return Response({"detail": "No analytics available."}, status=status.HTTP_404_NOT_FOUND)
         return Response(snapshot.ml_payload)
+
+
+class ModelExplanationsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = ANALYTICS_RENDERERS
+
+    def get(self, request, district_slug: str):
+        payload = model_explanations(district_slug)
+        if payload is None:
+            return Response(
+                {"detail": "No model explanations available; refresh the district to train its models."},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        name = request.query_params.get("model")
+        if name:
+            payload = {"models": [model for model in payload["models"] if model["name"] == name]}
+            if not payload["models"]:
+                return Response({"detail": f"Unknown model '{name}'."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(payload)
+
+
+class NearRepeatView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = ANALYTICS_RENDERERS
+
+    def get(self, request, district_slug: str):
+        snapshot = latest_snapshot_for_district(district_slug, fields=["id", "near_repeat_payload"])
+        if not snapshot or not snapshot.near_repeat_payload:
+            return Response({"detail": "No near-repeat analysis available."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(snapshot.near_repeat_payload)
+
+
+class SnapshotTableView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [FastJSONRenderer, ColumnarJSONRenderer, ArrowIPCRenderer, BrowsableAPIRenderer]
+
+    def get(self, request, district_slug: str, table: str):
+        if table not in EXPORTABLE_TABLES:
+            return Response({"detail": f"Unknown table '{table}'."}, status=status.HTTP_404_NOT_FOUND)
+        payload_field, _ = EXPORTABLE_TABLES[table]
+        snapshot = latest_snapshot_for_district(district_slug, fields=["id", payload_field])
+        if not snapshot:
+            return Response({"detail": "No analytics available."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(snapshot_table_records(snapshot, table))
+
+
+class IncidentQueryView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = ANALYTICS_RENDERERS
+
+    def post(self, request, district_slug: str):
+        source = query_source(district_slug)
+        if source is None:
+            return Response({"detail": "No analytics available."}, status=status.HTTP_404_NOT_FOUND)
+        paths, version, district_name = source
+        try:
+            result = run_query(paths, version, request.data, district_name=district_name)
+        except QueryTimeout as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        except QueryError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+
+class CrossTabView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = ANALYTICS_RENDERERS
+
+    def get(self, request, district_slug: str):
+        dimensions = [name.strip() for name in request.query_params.get("dimensions", "").split(",") if name.strip()]
+        # ``bins=Hour:6`` (equal width) or ``bins=Hour:0|6|12|18|24`` (edges); repeatable.
+        bins = {}
+        for item in request.query_params.getlist("bins"):
+            column, _, spec = item.partition(":")
+            bins[column.strip()] = spec.replace("|", ",")
+        source = query_source(district_slug)
+        if source is None:
+            return Response({"detail": "No analytics available."}, status=status.HTTP_404_NOT_FOUND)
+        paths, version, district_name = source
+        try:
+            result = run_crosstab(paths, version, dimensions, bins, district_name=district_name)
+        except QueryError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result)
+
+
+class SnapshotTableExportView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, district_slug: str, table: str):
+        snapshot = latest_snapshot_for_district(district_slug)
+        if not snapshot:
+            return Response({"detail": "No analytics available."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            output = normalize_output(request.query_params.get("output"))
+            records = snapshot_table_records(snapshot, table)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return export_response(
+            request,
+            lambda: encode_batches(iter_frame_batches(pd.DataFrame.from_records(records)), output),
+            # Snapshots are immutable, so the id is the version of the rows.
+            export_cache_path("snapshot", str(snapshot.id), table, output=output),
+            filename=f"{district_slug}-{table}",
+            output=output,
+        )
@@ -3,7 +3,7 @@ from __future__ import annotations
 import json
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Any
+from typing import Any, Dict, Tuple
 
 import requests
 from django.conf import settings
@@ -11,19 +11,29 @@ from django.conf import settings
 DISTRICT_URL = "https://services.arcgis.com/jXi5GuMZwfCYtZP9/arcgis/rest/services/Arlington_Police_Districts/FeatureServer/0/query?outFields=*&where=1%3D1&f=geojson"
 BEAT_URL = "https://gis2.arlingtontx.gov/agsext2/rest/services/OpenData/OD_PoliticalBoundary/MapServer/1/query?outFields=*&where=1%3D1&f=geojson"
 CACHE_DIR = Path(settings.MEDIA_ROOT) / "geo"
-CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+
+# Parsed GeoJSON per cache file, keyed by the file's mtime, so requests reuse
+# one parsed copy per process (shared across forked workers when preloaded).
+_parsed: Dict[str, Tuple[float, Any]] = {}
 
 
 def _load_or_fetch(cache_name: str, url: str, hours: int = 12) -> Any:
     cache_path = CACHE_DIR / f"{cache_name}.json"
     if cache_path.exists():
-        modified = datetime.fromtimestamp(cache_path.stat().st_mtime)
-        if modified > datetime.now() - timedelta(hours=hours):
-            return json.loads(cache_path.read_text())
+        mtime = cache_path.stat().st_mtime
+        if datetime.fromtimestamp(mtime) > datetime.now() - timedelta(hours=hours):
+            cached = _parsed.get(cache_name)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, json.loads(cache_path.read_text()))
+                _parsed[cache_name] = cached
+            return cached[1]
     response = requests.get(url, timeout=30)
     response.raise_for_status()
     data = response.json()
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
     cache_path.write_text(json.dumps(data))
+    _parsed[cache_name] = (cache_path.stat().st_mtime, data)
     return data
 
 
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import DataAsset, RefreshJob
+from .models import DataAsset, RefreshJob, UploadSession
 
 
 @admin.register(DataAsset)
@@ -13,3 +13,9 @@ class DataAssetAdmin(admin.ModelAdmin):
 @admin.register(RefreshJob)
 class RefreshJobAdmin(admin.ModelAdmin):
     list_display = ("id", "status", "started_at", "finished_at")
+
+
+@admin.register(UploadSession)
+class UploadSessionAdmin(admin.ModelAdmin):
+    list_display = ("id", "district", "filename", "status", "created_at")
+    list_filter = ("status", "district")
@@ -0,0 +1,227 @@
+"""
+Citywide ingest.
+
+A citywide export carries every district's incidents in one file. Uploads
+are stored by ``store_citywide_upload`` and ingested by a refresh job
+without a district: ``ingest_citywide_asset`` parses the file once,
+prepares it once, and partitions the rows by district and beat with a
+single stable sort over their factorized codes.
+Each district gets a ``DataAsset`` partition (parquet, one row group per
+beat) whose snapshot is computed from its slice of the already prepared
+frame; once they are saved the citywide rollup is refreshed once, merged
+from the district results. Nothing is re-read or re-filtered per district.
+With ``CITYWIDE_INGEST_WORKERS`` above one the district payloads are
+computed in a process pool that reads the prepared frame from one shared,
+memory-mapped copy (``shared_frame``) instead of a pickled slice per task.
+The pool's processes come from a forkserver, never forked from the caller,
+so threads, locks and database connections of a threaded web worker are not
+copied into them.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+import django
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from apps.accounts import reference
+
+from .columnar import write_columnar_cache
+from .models import DataAsset
+from .shared_frame import SharedFrame, attach_rows, publish_frame
+from .services import hash_content, infer_schema, link_duplicate_asset, load_dataframe_from_asset
+
+
+class Partition(NamedTuple):
+    # Row positions in the source frame, grouped by beat.
+    rows: np.ndarray
+    # Lengths of the consecutive beat runs in ``rows``.
+    beat_sizes: np.ndarray
+
+
+def partition_rows(df: pd.DataFrame) -> Tuple[Dict[int, Partition], Dict[str, int]]:
+    """
+    Group row positions by district (matched on name, case-insensitively)
+    and by beat within each district. Returns ``(partitions by district id,
+    row counts per unmatched District value)``.
+    """
+    if "District" not in df.columns:
+        raise ValueError("A citywide export needs a District column.")
+    districts = reference.all_districts()
+    bucket_by_name = {district.name.upper(): index for index, district in enumerate(districts)}
+    unmatched_bucket = len(districts)
+
+    value_codes, values = pd.factorize(df["District"])
+    # One extra slot so missing values (code -1) land in the unmatched bucket.
+    bucket_of_value = np.array(
+        [bucket_by_name.get(str(value).strip().upper(), unmatched_bucket) for value in values]
+        + [unmatched_bucket],
+        dtype=np.int64,
+    )
+    buckets = bucket_of_value[value_codes]
+    if "Beats" in df.columns:
+        beat_codes, beat_values = pd.factorize(df["Beats"])
+    else:
+        beat_codes, beat_values = np.zeros(len(df), dtype=np.int64), [None]
+    slots = len(beat_values) + 1
+    keys = buckets * slots + (beat_codes.astype(np.int64) + 1)
+
+    order = np.argsort(keys, kind="stable")
+    sizes = np.bincount(keys, minlength=(unmatched_bucket + 1) * slots).reshape(-1, slots)
+    offsets = np.concatenate([[0], np.cumsum(sizes.sum(axis=1))])
+    partitions = {
+        district.pk: Partition(
+            rows=order[offsets[index] : offsets[index + 1]],
+            beat_sizes=sizes[index][sizes[index] > 0],
+        )
+        for index, district in enumerate(districts)
+        if offsets[index + 1] > offsets[index]
+    }
+    unmatched_rows = order[offsets[unmatched_bucket] :]
+    unmatched = (
+        df["District"].iloc[unmatched_rows].fillna("(blank)").astype(str).value_counts().to_dict()
+    )
+    return partitions, unmatched
+
+
+def partition_file(frame: pd.DataFrame, beat_sizes: np.ndarray, name: str) -> ContentFile:
+    """Parquet of ``frame`` with one row group per beat run."""
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, table.schema) as writer:
+        offset = 0
+        for size in beat_sizes:
+            writer.write_table(table.slice(offset, int(size)))
+            offset += int(size)
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def _mark_processed(asset: DataAsset, df: pd.DataFrame):
+    asset.row_count = len(df)
+    asset.schema_payload = infer_schema(df)
+    asset.processed_at = timezone.now()
+    asset.status = "processed"
+    asset.save(update_fields=["row_count", "schema_payload", "processed_at", "status"])
+
+
+def _create_partition(parent: DataAsset, district, df: pd.DataFrame, partition: Partition):
+    rows = df.iloc[partition.rows].reset_index(drop=True)
+    asset = DataAsset.objects.create(
+        district_id=district.pk,
+        parent=parent,
+        uploader=parent.uploader,
+        notes=parent.notes,
+        status="processing",
+        source_file=partition_file(rows, partition.beat_sizes, f"{district.slug}.parquet"),
+        content_hash=hashlib.sha256(f"{parent.content_hash}:{district.slug}".encode()).hexdigest(),
+    )
+    write_columnar_cache(asset, rows)
+    return asset, rows
+
+
+def _partition_payloads(asset: DataAsset, prepared: pd.DataFrame) -> Dict:
+    from apps.analytics.services import compute_snapshot_payloads
+
+    return compute_snapshot_payloads(asset, dataset_hash=asset.content_hash, prepared_df=prepared)
+
+
+def _shared_partition_payloads(shared: SharedFrame, asset: DataAsset, rows: np.ndarray) -> Dict:
+    """Worker task: attach to the published frame and compute one district."""
+    return _partition_payloads(asset, attach_rows(shared, rows))
+
+
+def worker_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Process pool for partition work, started from a forkserver so it is never
+    forked from a threaded web or job worker.
+    """
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("forkserver"),
+        # Workers start clean: load settings and apps before the first task.
+        initializer=django.setup,
+    )
+
+
+def _compute_payloads(prepared: pd.DataFrame, pending: List[Tuple[DataAsset, Partition]]) -> List[Dict]:
+    workers = min(settings.CITYWIDE_INGEST_WORKERS, len(pending))
+    if workers <= 1:
+        return [_partition_payloads(asset, prepared.iloc[partition.rows]) for asset, partition in pending]
+    with publish_frame(prepared) as shared, worker_pool(workers) as pool:
+        futures = [
+            pool.submit(_shared_partition_payloads, shared, asset, partition.rows)
+            for asset, partition in pending
+        ]
+        return [future.result() for future in futures]
+
+
+def store_citywide_upload(source_file, uploader=None, notes: str = "") -> DataAsset:
+    """Store ``source_file`` as a citywide ``DataAsset`` (no district) awaiting ingest."""
+    parent = DataAsset(
+        district=None,
+        uploader=uploader,
+        notes=notes,
+        input_format="file",
+        status="uploaded",
+        content_hash=hash_content(source_file),
+    )
+    parent.source_file.save(Path(source_file.name).name, source_file, save=False)
+    parent.save()
+    return parent
+
+
+def ingest_citywide_asset(parent: DataAsset) -> Dict:
+    """
+    Build every district's partition and snapshot of the citywide ``parent``
+    from a single parse. Returns ``{"asset", "partitions", "unmatched"}``.
+    On failure the parent and its unfinished partitions are marked failed.
+    """
+    from apps.analytics.services import deferred_citywide_rollup, prepare_dataframe, save_snapshot
+
+    parent.status = "processing"
+    parent.save(update_fields=["status"])
+    try:
+        df = load_dataframe_from_asset(parent)
+        partitions, unmatched = partition_rows(df)
+        if not partitions:
+            raise ValueError("No rows match a known district.")
+        prepared = prepare_dataframe(df)
+        assets: List[DataAsset] = []
+        pending: List[Tuple[DataAsset, Partition]] = []
+        frames: Dict[int, pd.DataFrame] = {}
+        # One citywide rollup for the whole export, not one per district.
+        with deferred_citywide_rollup():
+            for district_id, partition in partitions.items():
+                asset, rows = _create_partition(parent, reference.district_by_id(district_id), df, partition)
+                assets.append(asset)
+                if not link_duplicate_asset(asset):
+                    pending.append((asset, partition))
+                    frames[asset.pk] = rows
+            for (asset, _), payloads in zip(pending, _compute_payloads(prepared, pending)):
+                with transaction.atomic():
+                    _mark_processed(asset, frames[asset.pk])
+                    save_snapshot(asset, payloads)
+        _mark_processed(parent, df)
+    except Exception:
+        parent.status = "failed"
+        parent.save(update_fields=["status"])
+        parent.partitions.exclude(status="processed").update(status="failed")
+        raise
+    return {"asset": parent, "partitions": assets, "unmatched": unmatched}
+
+
+def ingest_citywide(source_file, uploader=None, notes: str = "") -> Dict:
+    """Store and ingest a citywide export in one call (management commands)."""
+    return ingest_citywide_asset(store_citywide_upload(source_file, uploader=uploader, notes=notes))
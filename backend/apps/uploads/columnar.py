@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+from threading import Lock
+from typing import Callable, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+
+CACHE_DIR_NAME = "columnar"
+ROW_ID_COLUMN = "_row"
+FRAME_CACHE_SIZE = 4
+FILTER_CACHE_SIZE = 16
+
+_frame_cache: "OrderedDict[Tuple[str, float], pd.DataFrame]" = OrderedDict()
+_order_cache: Dict[Tuple[str, float, str, bool], Tuple[np.ndarray, np.ndarray]] = {}
+_filter_cache: "OrderedDict[Tuple, np.ndarray]" = OrderedDict()
+_cache_lock = Lock()
+
+
+def columnar_cache_path(asset) -> Path:
+    """Parquet file holding the parsed rows of ``asset``."""
+    return Path(settings.MEDIA_ROOT) / "uploads" / CACHE_DIR_NAME / f"{asset.id}.parquet"
+
+
+def _to_columnar(df: pd.DataFrame) -> pd.DataFrame:
+    frame = df.reset_index(drop=True).copy()
+    for column in frame.columns:
+        series = frame[column]
+        if series.dtype == object:
+            # Dictionary-encode text columns: parquet keeps them compact and
+            # filters/sorts run over integer codes instead of strings.
+            frame[column] = series.astype(str).where(series.notna()).astype("category")
+    frame[ROW_ID_COLUMN] = np.arange(len(frame), dtype=np.int64)
+    return frame
+
+
+def write_columnar_cache(asset, df: pd.DataFrame) -> Path:
+    path = columnar_cache_path(asset)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".parquet.tmp")
+    _to_columnar(df).to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+    return path
+
+
+def has_columnar_cache(asset) -> bool:
+    return columnar_cache_path(asset).exists()
+
+
+def load_columnar_frame(asset) -> pd.DataFrame:
+    """
+    Return the cached frame for ``asset``, reading the parquet file at most once
+    per process while its mtime is unchanged. Callers must not mutate it.
+    """
+    path = columnar_cache_path(asset)
+    key = (str(path), path.stat().st_mtime)
+    with _cache_lock:
+        frame = _frame_cache.get(key)
+        if frame is not None:
+            _frame_cache.move_to_end(key)
+            return frame
+    frame = pd.read_parquet(path)
+    with _cache_lock:
+        _frame_cache[key] = frame
+        while len(_frame_cache) > FRAME_CACHE_SIZE:
+            evicted, _ = _frame_cache.popitem(last=False)
+            for order_key in [k for k in _order_cache if k[:2] == evicted]:
+                del _order_cache[order_key]
+            for filter_key in [k for k in _filter_cache if k[:2] == evicted]:
+                del _filter_cache[filter_key]
+    return frame
+
+
+def sort_order(asset, frame: pd.DataFrame, column: str, descending: bool = False):
+    """
+    Return ``(order, rank)`` for sorting ``frame`` by ``column`` with the row id
+    as tie-breaker (nulls last). ``rank[row_id]`` is the row's position in
+    ``order``, which makes keyset cursors an O(1) lookup. Computed once per
+    (file version, column, direction).
+    """
+    path = columnar_cache_path(asset)
+    cache_key = (str(path), path.stat().st_mtime, column, descending)
+    with _cache_lock:
+        cached = _order_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    codes, uniques = pd.factorize(frame[column], sort=True)
+    codes = codes.astype(np.int64)
+    nulls = codes < 0
+    if descending:
+        codes = (len(uniques) - 1) - codes
+    codes[nulls] = len(uniques)
+    rows = frame[ROW_ID_COLUMN].to_numpy()
+    order = np.lexsort((rows, codes))
+    rank = np.empty_like(order)
+    rank[rows[order]] = np.arange(len(order))
+    result = (order, rank)
+    with _cache_lock:
+        _order_cache[cache_key] = result
+    return result
+
+
+def filtered_positions(
+    asset, filters: Tuple[tuple, ...], sort: str | None, descending: bool, compute: Callable[[], np.ndarray]
+) -> np.ndarray:
+    """
+    Ascending positions, in the sort order, of the rows passing ``filters``;
+    ``compute`` builds them on a miss. Kept per (file version, filters,
+    sort) for the most recent ``FILTER_CACHE_SIZE`` combinations, so later
+    pages of a filtered browse are a binary search instead of a full scan.
+    """
+    path = columnar_cache_path(asset)
+    cache_key = (str(path), path.stat().st_mtime, filters, sort, descending)
+    with _cache_lock:
+        cached = _filter_cache.get(cache_key)
+        if cached is not None:
+            _filter_cache.move_to_end(cache_key)
+            return cached
+    positions = compute()
+    with _cache_lock:
+        _filter_cache[cache_key] = positions
+        while len(_filter_cache) > FILTER_CACHE_SIZE:
+            _filter_cache.popitem(last=False)
+    return positions
+
+
+def clear_columnar_caches():
+    with _cache_lock:
+        _frame_cache.clear()
+        _order_cache.clear()
+        _filter_cache.clear()
@@ -0,0 +1,181 @@
+"""
+Refresh progress events.
+
+Refresh jobs publish progress to a broker and ``RefreshEventsView`` relays it
+to subscribed users as Server-Sent Events while a job is active. Streams need
+``REFRESH_EVENTS_REDIS_URL`` (or the Redis cache) so events fan out across
+workers over Redis pub/sub. Without it the in-process broker still receives
+events (e.g. for tests), but the view refuses streams, since jobs run in other
+processes, and clients poll the job status instead.
+"""
+from __future__ import annotations
+
+import itertools
+import logging
+import queue
+from threading import Lock
+from typing import Any, Callable, Dict, Iterator
+
+import orjson
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "uploads:refresh-events"
+SUBSCRIBER_QUEUE_SIZE = 1000
+TERMINAL_EVENTS = ("job_completed", "job_failed")
+
+
+class LocalSubscription:
+    def __init__(self, broker: "LocalBroker"):
+        self._broker = broker
+        self._queue: queue.Queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def get(self, timeout: float) -> Dict[str, Any] | None:
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._broker._unsubscribe(self)
+
+
+class LocalBroker:
+    """In-process stand-in for Redis pub/sub."""
+
+    def __init__(self):
+        self._subscribers: set[LocalSubscription] = set()
+        self._lock = Lock()
+
+    def publish(self, event: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription._queue.put_nowait(event)
+            except queue.Full:
+                # A stalled client loses events rather than blocking the job.
+                pass
+
+    def subscribe(self) -> LocalSubscription:
+        subscription = LocalSubscription(self)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription: LocalSubscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+
+class RedisSubscription:
+    def __init__(self, pubsub):
+        self._pubsub = pubsub
+
+    def get(self, timeout: float) -> Dict[str, Any] | None:
+        message = self._pubsub.get_message(ignore_subscribe_messages=True, timeout=timeout)
+        if not message:
+            return None
+        return orjson.loads(message["data"])
+
+    def close(self):
+        self._pubsub.close()
+
+
+class RedisBroker:
+    def __init__(self, url: str):
+        import redis
+
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, event: Dict[str, Any]):
+        self._client.publish(CHANNEL, orjson.dumps(event))
+
+    def subscribe(self) -> RedisSubscription:
+        pubsub = self._client.pubsub()
+        pubsub.subscribe(CHANNEL)
+        return RedisSubscription(pubsub)
+
+
+_broker = None
+_broker_lock = Lock()
+_sequence = itertools.count(1)
+
+
+def shared_broker_configured() -> bool:
+    return bool(settings.REFRESH_EVENTS_REDIS_URL)
+
+
+def get_broker():
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                url = settings.REFRESH_EVENTS_REDIS_URL
+                _broker = RedisBroker(url) if url else LocalBroker()
+    return _broker
+
+
+def publish_refresh_event(event_type: str, job, asset=None, **fields):
+    """Publish a refresh event; failures are logged and never fail the job."""
+    event = {
+        "type": event_type,
+        "job": job.pk,
+        "seq": next(_sequence),
+        "at": timezone.now().isoformat(),
+        "district_id": job.district_id,
+        **fields,
+    }
+    if asset is not None:
+        event.update(asset=str(asset.pk), district_id=asset.district_id)
+    try:
+        get_broker().publish(event)
+    except Exception:  # noqa: BLE001
+        logger.exception("Could not publish refresh event %s", event_type)
+
+
+def format_sse(event: Dict[str, Any]) -> bytes:
+    return (
+        f"id: {event['job']}-{event['seq']}\nevent: {event['type']}\n".encode()
+        + b"data: "
+        + orjson.dumps(event)
+        + b"\n\n"
+    )
+
+
+def iter_refresh_events(
+    district_ids,
+    initial: Dict[str, Any] | None = None,
+    still_active: Callable[[], bool] | None = None,
+) -> Iterator[bytes]:
+    """
+    SSE byte stream of refresh events for the given districts (all when
+    empty). Sends keep-alive comments while idle. Ends once ``still_active``
+    reports no running jobs (checked after each finished job and on every
+    keep-alive), or after ``REFRESH_EVENTS_MAX_SECONDS``, so a stream holds a
+    worker thread only while there is progress to report.
+    """
+    allowed = set(district_ids)
+    heartbeat = settings.REFRESH_EVENTS_HEARTBEAT_SECONDS
+    deadline = timezone.now().timestamp() + settings.REFRESH_EVENTS_MAX_SECONDS
+    subscription = get_broker().subscribe()
+    try:
+        yield f"retry: {heartbeat * 1000}\n\n".encode()
+        if initial is not None:
+            yield format_sse(initial)
+        while timezone.now().timestamp() < deadline:
+            event = subscription.get(timeout=heartbeat)
+            if event is None:
+                if still_active is not None and not still_active():
+                    return
+                yield b": keep-alive\n\n"
+                continue
+            if allowed and event.get("district_id") not in (None, *allowed):
+                continue
+            yield format_sse(event)
+            if event["type"] in TERMINAL_EVENTS and still_active is not None and not still_active():
+                return
+    finally:
+        subscription.close()
@@ -0,0 +1,241 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import BinaryIO, Callable, Iterable, Iterator
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "parquet": "application/vnd.apache.parquet",
+}
+EXPORT_BATCH_ROWS = 50_000
+FILE_CHUNK_BYTES = 256 * 1024
+RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class _DrainingSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks: list[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def iter_csv(batches: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    header = True
+    for batch in batches:
+        yield batch.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+
+
+def arrow_schema(frame: pd.DataFrame) -> pa.Schema:
+    """
+    Parquet schema from the frame's dtypes. Arrow infers ``null`` for a text
+    column holding only nulls (and float values for an empty categorical),
+    which later batches with values could not be cast to; those are text.
+    """
+    schema = pa.Schema.from_pandas(frame, preserve_index=False)
+    for index, field in enumerate(schema):
+        dtype = frame[field.name].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = dtype.categories
+            text = categories.dtype == object or not len(categories)
+            value_type = pa.string() if text else field.type.value_type
+            # A fixed index width, so batches with more categories still cast.
+            schema = schema.set(index, field.with_type(pa.dictionary(pa.int32(), value_type)))
+        elif pa.types.is_null(field.type):
+            schema = schema.set(index, field.with_type(pa.string()))
+    return schema
+
+
+def iter_parquet(batches: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    sink = _DrainingSink()
+    writer = None
+    for batch in batches:
+        table = pa.Table.from_pandas(batch, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(sink, arrow_schema(batch))
+        writer.write_table(table.cast(writer.schema))
+        yield sink.drain()
+    if writer is not None:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_frame_batches(frame: pd.DataFrame, batch_rows: int = EXPORT_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    for start in range(0, max(len(frame), 1), batch_rows):
+        yield frame.iloc[start : start + batch_rows]
+
+
+def export_cache_dir() -> Path:
+    return Path(settings.MEDIA_ROOT) / "exports"
+
+
+def export_cache_path(*key_parts, output: str) -> Path:
+    """
+    Cache file for an export. ``key_parts`` must include the version of the
+    source data (columnar cache mtime, snapshot id) so a refresh never
+    serves old bytes under an old ETag.
+    """
+    digest = hashlib.sha1(json.dumps(key_parts, sort_keys=True, default=str).encode()).hexdigest()
+    return export_cache_dir() / f"{digest}.{output}"
+
+
+def prune_export_cache(max_age: float | None = None) -> int:
+    """Delete cached exports (and abandoned partial files) older than ``max_age`` seconds."""
+    max_age = settings.EXPORT_CACHE_MAX_AGE_SECONDS if max_age is None else max_age
+    cutoff = time.time() - max_age
+    removed = 0
+    directory = export_cache_dir()
+    if not directory.exists():
+        return 0
+    for path in directory.iterdir():
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            # Pruned concurrently by another worker.
+            continue
+    return removed
+
+
+def _tee_to_file(chunks: Iterator[bytes], path: Path) -> Iterator[bytes]:
+    """Yield ``chunks`` while persisting them; the file only appears when complete."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".part")
+    tmp_path = Path(tmp_name)
+    completed = False
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            for chunk in chunks:
+                if chunk:
+                    fp.write(chunk)
+                    yield chunk
+        tmp_path.replace(path)
+        completed = True
+    finally:
+        if not completed:
+            tmp_path.unlink(missing_ok=True)
+    prune_export_cache()
+
+
+def _iter_file(fp: BinaryIO, start: int, end: int) -> Iterator[bytes]:
+    with fp:
+        fp.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fp.read(min(FILE_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def _parse_range(header: str, size: int):
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start > end or start >= size:
+        raise ValueError("Unsatisfiable range.")
+    return start, end
+
+
+def export_response(
+    request,
+    chunks_factory: Callable[[], Iterator[bytes]],
+    cache_path: Path,
+    filename: str,
+    output: str,
+):
+    """
+    Stream an export. Until ``cache_path`` exists every request streams the
+    full export (200, ignoring ``Range``) while teeing it to the file; once
+    it exists, ``Range`` requests are served from it so interrupted
+    downloads resume with byte-identical content.
+    """
+    content_type = EXPORT_FORMATS[output]
+    range_header = request.headers.get("Range")
+    try:
+        # Opened once: pruning may unlink the file, but not an open handle.
+        fp = cache_path.open("rb")
+    except FileNotFoundError:
+        fp = None
+    if fp is not None:
+        size = os.fstat(fp.fileno()).st_size
+        start, end, status = 0, size - 1, 200
+        if range_header:
+            try:
+                byte_range = _parse_range(range_header, size)
+            except ValueError:
+                fp.close()
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+            if byte_range:
+                (start, end), status = byte_range, 206
+        response = StreamingHttpResponse(_iter_file(fp, start, end), content_type=content_type, status=status)
+        response["Content-Length"] = str(end - start + 1)
+        if status == 206:
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        response = StreamingHttpResponse(
+            _tee_to_file(chunks_factory(), cache_path), content_type=content_type
+        )
+    response["Accept-Ranges"] = "bytes"
+    response["ETag"] = f'"{cache_path.stem}"'
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{output}"'
+    return response
+
+
+def encode_batches(batches: Iterable[pd.DataFrame], output: str) -> Iterator[bytes]:
+    return iter_parquet(batches) if output == "parquet" else iter_csv(batches)
+
+
+def normalize_output(value: str | None) -> str:
+    output = (value or "csv").lower()
+    if output not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{output}'. Use csv or parquet.")
+    return output
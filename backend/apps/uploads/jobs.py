@@ -0,0 +1,169 @@
+"""
+Refresh job queue.
+
+A refresh is queued as one ``RefreshJob`` per district; a job without a
+district ingests uploaded citywide exports. The partial unique
+constraint on ``RefreshJob`` lets only one queued/running job exist per
+district, so concurrent requests from any number of workers cannot start a
+second one. Workers claim queued jobs with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` plus a conditional status update, and a running job refreshes
+``heartbeat_at`` from a background thread. Jobs whose heartbeat goes stale
+(the worker crashed or was killed) are failed and their assets re-queued.
+"""
+from __future__ import annotations
+
+import os
+import socket
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Iterable, List, Sequence, Tuple
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import DataAsset, RefreshJob
+from .services import process_refresh_job
+
+ACTIVE_STATUSES = ("queued", "running")
+PENDING_ASSET_STATUSES = ("uploaded", "queued")
+
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def recover_stale_jobs() -> List[RefreshJob]:
+    """
+    Fail running jobs without a recent heartbeat and re-queue their assets.
+    In inline mode there are no workers, so a job still queued after the
+    stale interval was never claimed by its request; it is failed too.
+    """
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=settings.REFRESH_JOB_STALE_SECONDS)
+    stale_filter = Q(status="running") & (
+        Q(heartbeat_at__lt=cutoff)
+        | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+        | Q(heartbeat_at__isnull=True, started_at__isnull=True)
+    )
+    if settings.REFRESH_JOBS_INLINE:
+        stale_filter |= Q(status="queued", created_at__lt=cutoff)
+    with transaction.atomic():
+        stale = list(RefreshJob.objects.select_for_update(skip_locked=True).filter(stale_filter))
+        if not stale:
+            return []
+        for job in stale:
+            job.note = (
+                "Worker stopped sending heartbeats; job recovered."
+                if job.status == "running"
+                else "No worker claimed the queued job; job recovered."
+            )
+            job.status = "failed"
+            job.finished_at = now
+            job.save(update_fields=["status", "note", "finished_at"])
+        # Citywide jobs point ``last_asset`` at the export they are ingesting:
+        # re-queue it and fail the partitions it left half-built.
+        exports = [job.last_asset_id for job in stale if job.district_id is None and job.last_asset_id]
+        DataAsset.objects.filter(parent_id__in=exports, status="processing").update(status="failed")
+        DataAsset.objects.filter(
+            Q(district_id__in=[job.district_id for job in stale if job.district_id]) | Q(pk__in=exports),
+            status="processing",
+        ).update(status="queued")
+    return stale
+
+
+def districts_with_pending_assets() -> List[int]:
+    return sorted(
+        DataAsset.objects.filter(status__in=PENDING_ASSET_STATUSES, district__isnull=False)
+        .order_by()
+        .values_list("district_id", flat=True)
+        .distinct()
+    )
+
+
+def enqueue_refresh_jobs(
+    district_ids: Iterable[int], triggered_by=None
+) -> Tuple[List[RefreshJob], List[RefreshJob]]:
+    """
+    Queue one job per district. Returns ``(created, already_active)``; a
+    district that already has a queued or running job is left alone.
+    """
+    recover_stale_jobs()
+    created, active = [], []
+    for district_id in district_ids:
+        try:
+            with transaction.atomic():
+                created.append(
+                    RefreshJob.objects.create(
+                        district_id=district_id, status="queued", triggered_by=triggered_by
+                    )
+                )
+        except IntegrityError:
+            existing = RefreshJob.objects.filter(
+                district_id=district_id, status__in=ACTIVE_STATUSES
+            ).first()
+            if existing is not None:
+                active.append(existing)
+    return created, active
+
+
+def enqueue_citywide_ingest(triggered_by=None) -> RefreshJob:
+    """Queue a job without a district, which ingests the pending citywide exports."""
+    recover_stale_jobs()
+    return RefreshJob.objects.create(district=None, status="queued", triggered_by=triggered_by)
+
+
+def claim_refresh_job(job_ids: Sequence | None = None) -> RefreshJob | None:
+    """Atomically move the oldest queued job (optionally among ``job_ids``) to running."""
+    while True:
+        with transaction.atomic():
+            queued = RefreshJob.objects.select_for_update(skip_locked=True).filter(status="queued")
+            if job_ids is not None:
+                queued = queued.filter(pk__in=job_ids)
+            job = queued.order_by("created_at").first()
+            if job is None:
+                return None
+            now = timezone.now()
+            # The conditional update also serialises claims on backends
+            # without row locks (SQLite ignores FOR UPDATE).
+            claimed = RefreshJob.objects.filter(pk=job.pk, status="queued").update(
+                status="running", started_at=now, heartbeat_at=now, worker=worker_id()
+            )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+@contextmanager
+def heartbeat(job: RefreshJob):
+    """Refresh ``job.heartbeat_at`` from a background thread while the block runs."""
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.REFRESH_JOB_HEARTBEAT_SECONDS):
+                RefreshJob.objects.filter(pk=job.pk, status="running").update(
+                    heartbeat_at=timezone.now()
+                )
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"refresh-heartbeat-{job.pk}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def run_refresh_jobs(job_ids: Sequence | None = None) -> List[RefreshJob]:
+    """Claim and process queued jobs until none are left; returns the processed jobs."""
+    processed = []
+    while (job := claim_refresh_job(job_ids)) is not None:
+        with heartbeat(job):
+            process_refresh_job(job)
+        processed.append(job)
+    return processed
@@ -0,0 +1,69 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from apps.analytics.management.commands.benchmark_features import synthetic_incidents
+from apps.uploads.shared_frame import attach_rows, attach_table, publish_frame
+
+
+def _noop():
+    return None
+
+
+def _pickled_rows(frame):
+    return len(frame)
+
+
+def _shared_rows(shared, rows=None):
+    if rows is None:
+        return attach_table(shared).num_rows
+    return len(attach_rows(shared, rows))
+
+
+class Command(BaseCommand):
+    help = "Per-task overhead of handing a frame to worker processes: pickling vs a shared memory-mapped file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--tasks", type=int, default=8)
+        parser.add_argument("--workers", type=int, default=2)
+
+    def _per_task(self, pool, fn, args_per_task) -> float:
+        start = time.perf_counter()
+        for future in [pool.submit(fn, *args) for args in args_per_task]:
+            future.result()
+        return (time.perf_counter() - start) / len(args_per_task) * 1000
+
+    def handle(self, *args, **options):
+        df = synthetic_incidents(options["rows"])
+        tasks = options["tasks"]
+        chunks = np.array_split(np.arange(len(df)), tasks)
+        with ProcessPoolExecutor(
+            max_workers=options["workers"], mp_context=multiprocessing.get_context("fork")
+        ) as pool:
+            for future in [pool.submit(_noop) for _ in range(options["workers"])]:
+                future.result()
+            results = {
+                "pickle whole frame": self._per_task(pool, _pickled_rows, [(df,)] * tasks),
+                "pickle row slice": self._per_task(
+                    pool, _pickled_rows, [(df.iloc[chunk],) for chunk in chunks]
+                ),
+            }
+            start = time.perf_counter()
+            with publish_frame(df) as shared:
+                publish_ms = (time.perf_counter() - start) * 1000
+                results["shared attach (Arrow, zero-copy)"] = self._per_task(
+                    pool, _shared_rows, [(shared,)] * tasks
+                )
+                results["shared row slice to pandas"] = self._per_task(
+                    pool, _shared_rows, [(shared, chunk) for chunk in chunks]
+                )
+        self.stdout.write(
+            f"{len(df):,} rows, {tasks} tasks, {options['workers']} workers; "
+            f"publish once: {publish_ms:.0f} ms"
+        )
+        for name, per_task in results.items():
+            self.stdout.write(f"{name}: {per_task:.1f} ms/task")
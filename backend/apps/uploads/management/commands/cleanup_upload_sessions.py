@@ -0,0 +1,25 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.uploads.services import abort_stale_upload_sessions
+
+
+class Command(BaseCommand):
+    help = "Abort chunked upload sessions left open too long and delete their stored parts."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--max-age-hours",
+            type=float,
+            default=settings.UPLOAD_SESSION_MAX_AGE_HOURS,
+            help="Open sessions created longer ago than this are aborted.",
+        )
+
+    def handle(self, *args, **options):
+        aborted = abort_stale_upload_sessions(timedelta(hours=options["max_age_hours"]))
+        for session in aborted:
+            opened = f"{session.created_at:%Y-%m-%d %H:%M}"
+            self.stdout.write(f"Aborted {session.id} ({session.filename}, opened {opened})")
+        self.stdout.write(self.style.SUCCESS(f"Aborted {len(aborted)} session(s)."))
@@ -0,0 +1,72 @@
+import logging
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from apps.accounts import reference
+from apps.uploads.jobs import ACTIVE_STATUSES
+from apps.uploads.models import RefreshJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Fire concurrent refresh POSTs for each district and check that exactly "
+        "one job is queued per district. Jobs are left queued (no inline "
+        "processing); clean them up with process_refresh_jobs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=20, help="POSTs per district.")
+        parser.add_argument("--threads", type=int, default=16)
+        parser.add_argument("--districts", nargs="*", help="District slugs (default: all).")
+        parser.add_argument("--username", help="User to authenticate as (default: first superuser).")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options["username"]:
+            user = User.objects.get(username=options["username"])
+        else:
+            user = User.objects.filter(is_superuser=True).first()
+        if user is None:
+            raise CommandError("No user to authenticate as; pass --username.")
+        slugs = options["districts"] or [district.slug for district in reference.all_districts()]
+        if RefreshJob.objects.filter(status__in=ACTIVE_STATUSES).exists():
+            raise CommandError("Refresh jobs are already queued or running; wait for them first.")
+
+        def post(slug):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                return client.post("/api/uploads/refresh/", {"district": slug}, format="json").status_code
+            finally:
+                connection.close()
+
+        # Expected 409s would otherwise be logged as warnings, one per request.
+        logging.getLogger("django.request").setLevel(logging.ERROR)
+        work = [slug for slug in slugs for _ in range(options["requests"])]
+        started = time.perf_counter()
+        with override_settings(REFRESH_JOBS_INLINE=False):
+            with ThreadPoolExecutor(max_workers=options["threads"]) as pool:
+                statuses = Counter(pool.map(post, work))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{len(work)} requests in {elapsed:.2f}s: "
+            + ", ".join(f"{code}x{count}" for code, count in sorted(statuses.items()))
+        )
+
+        active = Counter(
+            RefreshJob.objects.filter(status__in=ACTIVE_STATUSES).values_list(
+                "district__slug", flat=True
+            )
+        )
+        for slug in slugs:
+            self.stdout.write(f"  {slug}: {active.get(slug, 0)} active job(s)")
+        if any(active.get(slug, 0) != 1 for slug in slugs) or statuses.get(202, 0) != len(slugs):
+            raise CommandError("Expected exactly one accepted job per district.")
+        self.stdout.write(self.style.SUCCESS("Exactly one job per district."))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.uploads.jobs import recover_stale_jobs, run_refresh_jobs
+
+
+class Command(BaseCommand):
+    help = "Process queued refresh jobs; with --loop, keep polling as a dedicated worker."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling for new jobs.")
+        parser.add_argument(
+            "--interval", type=float, default=5.0, help="Seconds between polls with --loop."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            for job in recover_stale_jobs():
+                self.stdout.write(self.style.WARNING(f"Recovered stale job {job.id}"))
+            for job in run_refresh_jobs():
+                self.stdout.write(f"Job {job.id} ({job.district_id}): {job.status} {job.note}".rstrip())
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -6,7 +6,9 @@ from django.core.files import File
 from django.core.management.base import BaseCommand
 
 from apps.accounts.models import District
+from apps.uploads.citywide import ingest_citywide
 from apps.uploads.models import DataAsset
+from apps.uploads.services import hash_asset_content
 from apps.analytics.services import build_snapshot_for_asset
 
 
@@ -19,23 +21,43 @@ class Command(BaseCommand):
             default="EAST",
             help="District slug to tie the dataset to.",
         )
+        parser.add_argument(
+            "--citywide",
+            action="store_true",
+            help="Treat the file as a citywide export and fan it out to every district.",
+        )
 
     def handle(self, *args, **options):
+        dataset_path = Path(settings.DATASET_PATH)
+        if not dataset_path.exists():
+            raise SystemExit(f"Dataset path {dataset_path} missing.")
+
+        if options["citywide"]:
+            with dataset_path.open("rb") as fp:
+                result = ingest_citywide(File(fp, name=dataset_path.name))
+            self.stdout.write(f"Created citywide upload {result['asset'].id}")
+            for asset in result["partitions"]:
+                self.stdout.write(f"  {asset.district.slug}: {asset.row_count} rows ({asset.id})")
+            for value, count in result["unmatched"].items():
+                self.stdout.write(self.style.WARNING(f"  no district named {value!r}: {count} rows skipped"))
+            self.stdout.write(self.style.SUCCESS("Analytics snapshots generated."))
+            return
+
         district_slug = options["district"].lower()
         try:
             district = District.objects.get(slug=district_slug)
         except District.DoesNotExist:
             raise SystemExit(f"District {district_slug} not found. Run migrations first.")
 
-        dataset_path = Path(settings.DATASET_PATH)
-        if not dataset_path.exists():
-            raise SystemExit(f"Dataset path {dataset_path} missing.")
-
         df = pd.read_excel(dataset_path)
         asset = DataAsset.objects.create(district=district, status="uploaded")
         with dataset_path.open("rb") as fp:
-            asset.source_file.save(dataset_path.name, File(fp), save=True)
+            asset.source_file.save(dataset_path.name, File(fp), save=False)
+        # Keyed by content like uploads, so stages, the feature matrix and
+        # model explanations are stored and found again.
+        asset.content_hash = hash_asset_content(asset)
+        asset.save()
         self.stdout.write(f"Created upload {asset.id}")
 
-        build_snapshot_for_asset(asset, df)
+        build_snapshot_for_asset(asset, df, dataset_hash=asset.content_hash)
         self.stdout.write(self.style.SUCCESS("Analytics snapshot generated."))
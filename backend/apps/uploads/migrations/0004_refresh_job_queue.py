@@ -0,0 +1,50 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('uploads', '0003_upload_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='refreshjob',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='refreshjob',
+            name='district',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='refresh_jobs', to='accounts.district'),
+        ),
+        migrations.AddField(
+            model_name='refreshjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='refreshjob',
+            name='worker',
+            field=models.CharField(blank=True, max_length=128),
+        ),
+        migrations.AlterField(
+            model_name='refreshjob',
+            name='status',
+            field=models.CharField(choices=[('idle', 'Idle'), ('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed'), ('completed', 'Completed')], default='idle', max_length=16),
+        ),
+        migrations.AddIndex(
+            model_name='refreshjob',
+            index=models.Index(fields=['status', 'created_at'], name='refresh_job_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='refreshjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['queued', 'running'])), fields=('district',), name='refresh_job_one_active_per_district'),
+        ),
+    ]
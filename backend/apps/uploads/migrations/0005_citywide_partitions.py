@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('uploads', '0004_refresh_job_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataasset',
+            name='parent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='partitions', to='uploads.dataasset'),
+        ),
+        migrations.AlterField(
+            model_name='dataasset',
+            name='district',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='data_assets', to='accounts.district'),
+        ),
+    ]
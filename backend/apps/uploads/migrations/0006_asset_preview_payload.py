@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-19 16:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0005_citywide_partitions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dataasset',
+            name='preview_payload',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -15,8 +15,13 @@ class DataAsset(models.Model):
     ]
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Null for a citywide export; its per-district partitions point back at it
+    # through ``parent``.
     district = models.ForeignKey(
-        District, on_delete=models.CASCADE, related_name="data_assets"
+        District, on_delete=models.CASCADE, null=True, blank=True, related_name="data_assets"
+    )
+    parent = models.ForeignKey(
+        "self", null=True, blank=True, on_delete=models.CASCADE, related_name="partitions"
     )
     uploader = models.ForeignKey(
         settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
@@ -30,6 +35,12 @@ class DataAsset(models.Model):
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="uploaded")
     row_count = models.IntegerField(default=0)
     schema_payload = models.JSONField(blank=True, null=True)
+    # Sample-based estimates served until the exact snapshot is refreshed.
+    preview_payload = models.JSONField(blank=True, null=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    duplicate_of = models.ForeignKey(
+        "self", null=True, blank=True, on_delete=models.SET_NULL, related_name="duplicates"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     processed_at = models.DateTimeField(null=True, blank=True)
 
@@ -37,12 +48,14 @@ class DataAsset(models.Model):
         ordering = ["-created_at"]
 
     def __str__(self):
-        return f"{self.district.name} upload {self.created_at:%Y-%m-%d}"
+        scope = self.district.name if self.district_id else "Citywide"
+        return f"{scope} upload {self.created_at:%Y-%m-%d}"
 
 
 class RefreshJob(models.Model):
     STATUS_CHOICES = [
         ("idle", "Idle"),
+        ("queued", "Queued"),
         ("running", "Running"),
         ("failed", "Failed"),
         ("completed", "Completed"),
@@ -50,6 +63,9 @@ class RefreshJob(models.Model):
 
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="idle")
+    district = models.ForeignKey(
+        District, null=True, blank=True, on_delete=models.CASCADE, related_name="refresh_jobs"
+    )
     triggered_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.SET_NULL,
@@ -63,6 +79,69 @@ class RefreshJob(models.Model):
     last_asset = models.ForeignKey(
         DataAsset, null=True, blank=True, on_delete=models.SET_NULL, related_name="+"
     )
+    created_at = models.DateTimeField(auto_now_add=True, null=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    worker = models.CharField(max_length=128, blank=True)
+
+    class Meta:
+        constraints = [
+            # At most one queued or running job per district, across all workers.
+            models.UniqueConstraint(
+                fields=["district"],
+                condition=models.Q(status__in=["queued", "running"]),
+                name="refresh_job_one_active_per_district",
+            )
+        ]
+        indexes = [models.Index(fields=["status", "created_at"], name="refresh_job_queue_idx")]
 
     def __str__(self):
         return f"Refresh job {self.status}"
+
+
+class UploadSession(models.Model):
+    """A resumable, chunked upload that becomes a ``DataAsset`` on completion."""
+
+    STATUS_CHOICES = [
+        ("open", "Open"),
+        ("completed", "Completed"),
+        ("aborted", "Aborted"),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    district = models.ForeignKey(
+        District, on_delete=models.CASCADE, related_name="upload_sessions"
+    )
+    uploader = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    filename = models.CharField(max_length=255)
+    total_size = models.BigIntegerField(null=True, blank=True)
+    notes = models.TextField(blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default="open")
+    schema_preview = models.JSONField(blank=True, null=True)
+    data_asset = models.OneToOneField(
+        DataAsset, null=True, blank=True, on_delete=models.SET_NULL, related_name="upload_session"
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"Upload session {self.filename} ({self.status})"
+
+
+class UploadPart(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name="parts")
+    index = models.PositiveIntegerField()
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ["index"]
+        unique_together = ("session", "index")
+
+    def __str__(self):
+        return f"Part {self.index} of {self.session_id}"
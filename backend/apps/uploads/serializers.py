@@ -1,12 +1,13 @@
 from rest_framework import serializers
 
-from apps.accounts.models import District
+from apps.accounts.serializers import DistrictSlugField
 
-from .models import DataAsset, RefreshJob
+from .models import DataAsset, RefreshJob, UploadPart, UploadSession
+from .services import parse_clipboard
 
 
 class DataAssetSerializer(serializers.ModelSerializer):
-    district = serializers.SlugRelatedField(slug_field="slug", queryset=District.objects.all())
+    district = DistrictSlugField()
 
     class Meta:
         model = DataAsset
@@ -20,11 +21,18 @@ class DataAssetSerializer(serializers.ModelSerializer):
             "created_at",
             "processed_at",
             "schema_payload",
+            "content_hash",
+            "duplicate_of",
+            "parent",
         ]
+        read_only_fields = ["content_hash", "duplicate_of", "parent"]
 
 
 class DataAssetCreateSerializer(serializers.ModelSerializer):
-    district = serializers.SlugRelatedField(slug_field="slug", queryset=District.objects.all())
+    district = DistrictSlugField()
+    clipboard_text = serializers.CharField(
+        write_only=True, required=False, trim_whitespace=False
+    )
 
     class Meta:
         model = DataAsset
@@ -33,26 +41,69 @@ class DataAssetCreateSerializer(serializers.ModelSerializer):
             "district",
             "source_file",
             "data_payload",
+            "clipboard_text",
             "notes",
             "input_format",
         ]
+        extra_kwargs = {"data_payload": {"write_only": True}}
 
     def validate(self, attrs):
-        if not attrs.get("source_file") and not attrs.get("data_payload"):
+        if not any(attrs.get(key) for key in ("source_file", "data_payload", "clipboard_text")):
             raise serializers.ValidationError(
                 "Provide either a file or a clipboard payload."
             )
+        self.clipboard_frame = None
+        if not attrs.get("source_file"):
+            try:
+                self.clipboard_frame = parse_clipboard(
+                    attrs.get("clipboard_text"), attrs.get("data_payload")
+                )
+            except ValueError as exc:
+                raise serializers.ValidationError(str(exc)) from exc
         return attrs
 
 
 class RefreshJobSerializer(serializers.ModelSerializer):
+    district = DistrictSlugField(allow_null=True, read_only=True)
+
     class Meta:
         model = RefreshJob
         fields = [
             "id",
             "status",
+            "district",
+            "created_at",
             "started_at",
             "finished_at",
+            "heartbeat_at",
             "note",
             "last_asset",
         ]
+
+
+class UploadPartSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadPart
+        fields = ["index", "size", "sha256", "received_at"]
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    district = DistrictSlugField()
+    parts = UploadPartSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = UploadSession
+        fields = [
+            "id",
+            "district",
+            "filename",
+            "total_size",
+            "notes",
+            "status",
+            "schema_preview",
+            "parts",
+            "data_asset",
+            "created_at",
+            "completed_at",
+        ]
+        read_only_fields = ["status", "schema_preview", "data_asset", "created_at", "completed_at"]
@@ -1,18 +1,54 @@
-from typing import List
+import base64
+import hashlib
+import io
+import json
+import tempfile
+from datetime import timedelta
+from typing import Any, Dict, Iterator, List, Sequence
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
 from django.conf import settings
+from django.core.files.base import ContentFile, File
 from django.core.files.storage import default_storage
+from django.db import transaction
 from django.utils import timezone
 
-from .models import DataAsset, RefreshJob
+from .columnar import (
+    ROW_ID_COLUMN,
+    columnar_cache_path,
+    filtered_positions,
+    has_columnar_cache,
+    load_columnar_frame,
+    sort_order,
+    write_columnar_cache,
+)
+from .events import publish_refresh_event
+from .models import DataAsset, RefreshJob, UploadPart, UploadSession
+
+BROWSE_DEFAULT_LIMIT = 50
+BROWSE_MAX_LIMIT = 500
+FILTER_OPERATORS = {"eq", "ne", "in", "gt", "gte", "lt", "lte", "contains"}
+UPLOAD_PART_DIR = "uploads/parts"
+STREAM_CHUNK_BYTES = 1024 * 1024
+# Parts and assembled files stay in memory up to this size, then spill to disk.
+SPOOL_MAX_BYTES = 8 * 1024 * 1024
+# Tab-delimited pastes (Excel copies) above this size are parsed with
+# pyarrow's multithreaded CSV reader instead of pandas.
+CLIPBOARD_ARROW_THRESHOLD = 256 * 1024
 
 
 def load_dataframe_from_asset(asset: DataAsset) -> pd.DataFrame:
     if asset.source_file:
+        name = asset.source_file.name.lower()
         with default_storage.open(asset.source_file.name, "rb") as fp:
-            if asset.source_file.name.lower().endswith(".csv"):
+            if name.endswith(".csv"):
                 df = pd.read_csv(fp)
+            elif name.endswith(".parquet"):
+                df = pd.read_parquet(fp)
             else:
                 df = pd.read_excel(fp)
     elif asset.data_payload:
@@ -22,6 +58,121 @@ def load_dataframe_from_asset(asset: DataAsset) -> pd.DataFrame:
     return df
 
 
+def parse_clipboard(text: str | None = None, records: List[dict] | None = None) -> pd.DataFrame:
+    """
+    Parse pasted table data into a frame. Raw text is sniffed for tabs
+    (Excel copies) or commas; legacy clients may still send row dicts.
+    """
+    if records is not None:
+        return pd.DataFrame.from_records(records)
+    text = (text or "").strip("\r\n")
+    if not text.strip():
+        raise ValueError("Clipboard payload is empty.")
+    header = text.split("\n", 1)[0]
+    delimiter = "\t" if "\t" in header else ","
+    if delimiter == "\t" and len(text) > CLIPBOARD_ARROW_THRESHOLD:
+        try:
+            table = pa_csv.read_csv(
+                io.BytesIO(text.encode()),
+                parse_options=pa_csv.ParseOptions(delimiter="\t"),
+            )
+        except pa.ArrowInvalid as exc:
+            raise ValueError(f"Could not parse clipboard data: {exc}") from exc
+        return table.to_pandas()
+    try:
+        return pd.read_csv(io.StringIO(text), sep=delimiter)
+    except (ValueError, pd.errors.ParserError) as exc:
+        raise ValueError(f"Could not parse clipboard data: {exc}") from exc
+
+
+def _text_mixed_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Store object columns that mix types (``[410, "UNK"]``) as text, as the columnar cache does."""
+    frame = df.copy()
+    for column in frame.columns[frame.dtypes == object]:
+        try:
+            pa.array(frame[column], from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            frame[column] = frame[column].astype(str).where(frame[column].notna())
+    return frame
+
+
+def clipboard_source_file(df: pd.DataFrame) -> ContentFile:
+    """Parsed pastes are stored as parquet rather than as JSON rows on the asset."""
+    buffer = io.BytesIO()
+    try:
+        df.to_parquet(buffer, index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        buffer = io.BytesIO()
+        _text_mixed_columns(df).to_parquet(buffer, index=False)
+    return ContentFile(buffer.getvalue(), name="clipboard.parquet")
+
+
+def hash_content(source_file=None, data_payload=None, clipboard_text=None) -> str:
+    """SHA-256 of an upload, read chunk by chunk so large files are never buffered whole."""
+    digest = hashlib.sha256()
+    if source_file:
+        for chunk in source_file.chunks():
+            digest.update(chunk)
+    elif clipboard_text:
+        digest.update(clipboard_text.strip("\r\n").encode())
+    elif data_payload is not None:
+        digest.update(json.dumps(data_payload, sort_keys=True, default=str).encode())
+    else:
+        return ""
+    return digest.hexdigest()
+
+
+def hash_asset_content(asset: DataAsset) -> str:
+    if asset.source_file:
+        with default_storage.open(asset.source_file.name, "rb") as fp:
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+                digest.update(chunk)
+            return digest.hexdigest()
+    return hash_content(data_payload=asset.data_payload)
+
+
+def link_duplicate_asset(asset: DataAsset) -> bool:
+    """
+    If an identical upload for the same district was already processed, mark
+    ``asset`` processed as its duplicate and serve the existing snapshot.
+    Archived snapshots have had their payloads moved out, so an original
+    whose snapshots are all archived does not count.
+    """
+    from apps.analytics.models import AnalyticsSnapshot
+    from apps.analytics.services import point_current_snapshot
+
+    if not asset.content_hash:
+        return False
+    snapshot = (
+        AnalyticsSnapshot.objects.filter(
+            data_asset__district_id=asset.district_id,
+            data_asset__content_hash=asset.content_hash,
+            data_asset__status="processed",
+            data_asset__duplicate_of__isnull=True,
+            archived_at__isnull=True,
+        )
+        .exclude(data_asset_id=asset.pk)
+        .select_related("data_asset")
+        .order_by("-generated_at")
+        .first()
+    )
+    if snapshot is None:
+        return False
+    original = snapshot.data_asset
+    with transaction.atomic():
+        asset.duplicate_of = original
+        asset.row_count = original.row_count
+        asset.schema_payload = original.schema_payload
+        asset.processed_at = timezone.now()
+        asset.status = "processed"
+        asset.save(
+            update_fields=["duplicate_of", "row_count", "schema_payload", "processed_at", "status"]
+        )
+        point_current_snapshot(snapshot)
+    return True
+
+
 def infer_schema(df: pd.DataFrame) -> List[dict]:
     schema = []
     for column in df.columns:
@@ -39,47 +190,496 @@ def infer_schema(df: pd.DataFrame) -> List[dict]:
 
 
 def get_dataframe_preview(asset: DataAsset, limit: int = 50):
-    df = load_dataframe_from_asset(asset)
-    return df.head(limit).to_dict(orient="records")
+    return browse_asset_rows(asset, limit=limit)["rows"]
 
 
-def process_refresh_job(job: RefreshJob):
-    from apps.analytics.services import build_snapshot_for_asset
+def ensure_columnar_cache(asset: DataAsset) -> pd.DataFrame:
+    if not has_columnar_cache(asset):
+        write_columnar_cache(asset, load_dataframe_from_asset(asset))
+    return load_columnar_frame(asset)
+
+
+def compute_asset_preview(asset: DataAsset) -> Dict[str, Any]:
+    """Approximate analytics for ``asset`` from a stratified sample, stored on the asset."""
+    from apps.analytics.approximate import compute_preview_payload
+    from apps.analytics.services import prepare_dataframe
+
+    df = ensure_columnar_cache(asset).drop(columns=[ROW_ID_COLUMN])
+    # The cache dictionary-encodes text columns; the pipeline expects plain ones.
+    df = df.astype({column: object for column in df.select_dtypes("category").columns})
+    prepared = prepare_dataframe(df, district_name=asset.district.name if asset.district_id else None)
+    asset.preview_payload = compute_preview_payload(prepared, settings.PREVIEW_SAMPLE_ROWS)
+    asset.save(update_fields=["preview_payload"])
+    return asset.preview_payload
+
+
+def encode_cursor(row_id: int, sort: str | None, descending: bool) -> str:
+    raw = json.dumps({"r": int(row_id), "s": sort, "d": descending}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return {"r": int(payload["r"]), "s": payload.get("s"), "d": bool(payload.get("d"))}
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValueError("Invalid cursor.") from exc
+
+
+def parse_filters(raw_filters: Sequence[str]) -> List[tuple]:
+    """Parse ``column:operator:value`` strings (``in`` values are ``|``-separated)."""
+    filters = []
+    for raw in raw_filters:
+        parts = raw.split(":", 2)
+        if len(parts) != 3 or parts[1] not in FILTER_OPERATORS:
+            raise ValueError(f"Invalid filter '{raw}'. Use column:operator:value.")
+        filters.append(tuple(parts))
+    return filters
+
+
+def _coerce_value(series: pd.Series, value: str):
+    if pd.api.types.is_bool_dtype(series):
+        return value.lower() in {"true", "1", "yes"}
+    if pd.api.types.is_integer_dtype(series):
+        return int(value)
+    if pd.api.types.is_numeric_dtype(series):
+        return float(value)
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return pd.Timestamp(value)
+    return value
+
+
+def _compare(values, operator: str, raw_value: str, reference: pd.Series):
+    if operator == "in":
+        return values.isin([_coerce_value(reference, item) for item in raw_value.split("|")])
+    if operator == "contains":
+        return values.astype(str).str.contains(raw_value, case=False, regex=False)
+    value = _coerce_value(reference, raw_value)
+    if operator == "eq":
+        return values == value
+    if operator == "ne":
+        return values != value
+    if operator == "gt":
+        return values > value
+    if operator == "gte":
+        return values >= value
+    if operator == "lt":
+        return values < value
+    return values <= value
+
+
+def _filter_mask(frame: pd.DataFrame, filters: List[tuple]) -> np.ndarray | None:
+    mask = None
+    for column, operator, raw_value in filters:
+        if column not in frame.columns or column == ROW_ID_COLUMN:
+            raise ValueError(f"Unknown column '{column}'.")
+        series = frame[column]
+        try:
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                # Evaluate against the (few) categories, then match codes.
+                categories = pd.Series(series.cat.categories)
+                matched = categories[_compare(categories, operator, raw_value, categories).to_numpy(dtype=bool)]
+                condition = series.isin(matched)
+                if operator == "ne":
+                    condition |= series.isna()
+            else:
+                condition = _compare(series, operator, raw_value, series)
+        except (TypeError, ValueError) as exc:
+            raise ValueError(f"Invalid value for filter on '{column}'.") from exc
+        condition = condition.fillna(False).to_numpy(dtype=bool)
+        mask = condition if mask is None else mask & condition
+    return mask
+
+
+def _json_safe_records(page: pd.DataFrame) -> List[dict]:
+    page = page.copy()
+    for column in page.columns:
+        if pd.api.types.is_datetime64_any_dtype(page[column]):
+            page[column] = page[column].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    page = page.astype(object).where(page.notna(), None)
+    return page.to_dict(orient="records")
+
+
+def browse_asset_rows(
+    asset: DataAsset,
+    limit: int = BROWSE_DEFAULT_LIMIT,
+    cursor: str | None = None,
+    columns: Sequence[str] | None = None,
+    filters: Sequence[str] = (),
+    sort: str | None = None,
+) -> Dict[str, Any]:
+    """
+    Return one page of ``asset`` rows from the columnar cache.
+
+    Rows are ordered by ``sort`` (``-column`` for descending, default file
+    order) and paged with an opaque keyset cursor holding the last row id.
+    The sort order and the filtered positions are cached per file version,
+    so a page costs a binary search plus its own rows at any depth.
+    """
+    frame = ensure_columnar_cache(asset)
+    limit = max(1, min(int(limit), BROWSE_MAX_LIMIT))
+    available = [col for col in frame.columns if col != ROW_ID_COLUMN]
+    if columns:
+        unknown = [col for col in columns if col not in available]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}.")
+        selected = list(columns)
+    else:
+        selected = available
+
+    descending = bool(sort and sort.startswith("-"))
+    sort_column = sort.lstrip("-") if sort else None
+    if sort_column and sort_column not in available:
+        raise ValueError(f"Unknown sort column '{sort_column}'.")
+
+    if sort_column:
+        order, rank = sort_order(asset, frame, sort_column, descending)
+    else:
+        order = rank = None
 
-    job.started_at = timezone.now()
-    pending_assets = list(
-        DataAsset.objects.filter(status__in=["uploaded", "queued"]).order_by("created_at")
+    start = 0
+    if cursor:
+        state = decode_cursor(cursor)
+        if state["s"] != sort_column or state["d"] != descending:
+            raise ValueError("Cursor does not match the requested sort.")
+        if not 0 <= state["r"] < len(frame):
+            raise ValueError("Invalid cursor.")
+        start = (int(rank[state["r"]]) if rank is not None else state["r"]) + 1
+
+    parsed = tuple(parse_filters(filters))
+    if parsed:
+
+        def matching_positions() -> np.ndarray:
+            mask = _filter_mask(frame, list(parsed))
+            return np.flatnonzero(mask[order] if order is not None else mask)
+
+        kept = filtered_positions(asset, parsed, sort_column, descending, matching_positions)
+        first = int(np.searchsorted(kept, start))
+        positions = kept[first : first + limit + 1]
+    else:
+        positions = np.arange(start, min(start + limit + 1, len(frame)))
+    has_more = len(positions) > limit
+    positions = positions[:limit]
+    picked = order[positions] if order is not None else positions
+
+    page = frame.iloc[picked]
+    next_cursor = (
+        encode_cursor(page[ROW_ID_COLUMN].iloc[-1], sort_column, descending)
+        if has_more
+        else None
     )
+    return {
+        "columns": selected,
+        "rows": _json_safe_records(page[selected]),
+        "limit": limit,
+        "next_cursor": next_cursor,
+    }
+
+
+def iter_filtered_batches(
+    asset: DataAsset,
+    columns: Sequence[str] | None = None,
+    filters: Sequence[str] = (),
+    batch_rows: int = 50_000,
+) -> Iterator[pd.DataFrame]:
+    """
+    Yield filtered row batches straight from the parquet cache so exports
+    hold at most one batch in memory regardless of the asset size.
+    """
+    if not has_columnar_cache(asset):
+        write_columnar_cache(asset, load_dataframe_from_asset(asset))
+    parquet = pq.ParquetFile(columnar_cache_path(asset))
+    available = [name for name in parquet.schema_arrow.names if name != ROW_ID_COLUMN]
+    selected = list(columns) if columns else available
+    unknown = [col for col in selected if col not in available]
+    if unknown:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}.")
+    parsed = parse_filters(filters)
+    needed = list(dict.fromkeys(selected + [column for column, _, _ in parsed]))
+    unknown = [col for col in needed if col not in available]
+    if unknown:
+        raise ValueError(f"Unknown column '{unknown[0]}'.")
+
+    def batches():
+        emitted = False
+        for record_batch in parquet.iter_batches(batch_size=batch_rows, columns=needed):
+            batch = record_batch.to_pandas()
+            mask = _filter_mask(batch, parsed)
+            if mask is not None:
+                batch = batch[mask]
+            if len(batch) or not emitted:
+                emitted = True
+                yield batch[selected]
+        if not emitted:
+            yield pd.DataFrame(columns=selected)
+
+    return batches()
+
+
+def upload_part_path(session: UploadSession, index: int) -> str:
+    return f"{UPLOAD_PART_DIR}/{session.id}/{index:06d}.part"
+
+
+def preview_schema(filename: str, head: bytes) -> List[dict] | None:
+    """
+    Infer a schema from the leading bytes of a delimited upload. Workbooks
+    cannot be read from a prefix (the zip directory sits at the end), so
+    they get their schema when the refresh job parses the full file.
+    """
+    name = filename.lower()
+    if not name.endswith((".csv", ".tsv", ".txt")):
+        return None
+    # Drop the trailing partial line; the part may end mid-row.
+    head = head[: head.rfind(b"\n") + 1] or head
+    try:
+        df = pd.read_csv(io.BytesIO(head), sep="\t" if not name.endswith(".csv") else ",")
+    except (ValueError, UnicodeDecodeError):
+        return None
+    return infer_schema(df)
+
+
+def store_upload_part(
+    session: UploadSession, index: int, stream, expected_sha256: str | None = None
+) -> UploadPart:
+    """
+    Stream one part of a chunked upload to storage, hashing as it arrives.
+    Re-sending an index replaces the earlier copy, so a client can resume by
+    re-uploading whatever parts are missing or failed checksum.
+    """
+    if session.status != "open":
+        raise ValueError("Upload session is not open.")
+    max_bytes = settings.UPLOAD_MAX_PART_BYTES
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as buffer:
+        for chunk in iter(lambda: stream.read(64 * 1024), b""):
+            size += len(chunk)
+            if size > max_bytes:
+                raise ValueError(f"Parts are limited to {max_bytes} bytes.")
+            digest.update(chunk)
+            buffer.write(chunk)
+        if not size:
+            raise ValueError("Empty part.")
+        checksum = digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != checksum:
+            raise ValueError("Part checksum mismatch.")
+        path = upload_part_path(session, index)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+        buffer.seek(0)
+        default_storage.save(path, File(buffer, name=path))
+        if index == 0:
+            buffer.seek(0)
+            session.schema_preview = preview_schema(
+                session.filename, buffer.read(settings.UPLOAD_PREVIEW_BYTES)
+            )
+            session.save(update_fields=["schema_preview"])
+    with transaction.atomic():
+        # A part that lands after ``complete``/``abort`` must not be recorded.
+        still_open = UploadSession.objects.select_for_update().get(pk=session.pk).status == "open"
+        if still_open:
+            part, _ = UploadPart.objects.update_or_create(
+                session=session, index=index, defaults={"size": size, "sha256": checksum}
+            )
+    if not still_open:
+        _delete_upload_parts(session, [index])
+        raise ValueError("Upload session is not open.")
+    return part
+
+
+def _delete_upload_parts(session: UploadSession, indexes: List[int]):
+    for index in indexes:
+        path = upload_part_path(session, index)
+        if default_storage.exists(path):
+            default_storage.delete(path)
+
+
+def complete_upload_session(session: UploadSession) -> DataAsset:
+    """
+    Concatenate the stored parts into the asset's source file, computing the
+    content hash in the same pass, then drop the parts. The session row is
+    locked for the whole assembly, so concurrent ``complete`` or ``abort``
+    calls wait and then see it is no longer open.
+    """
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().select_related("district").get(pk=session.pk)
+        if session.status != "open":
+            raise ValueError("Upload session is not open.")
+        parts = list(session.parts.order_by("index"))
+        indexes = [part.index for part in parts]
+        if not parts or indexes != list(range(len(parts))):
+            missing = sorted(set(range(max(indexes, default=0) + 1)) - set(indexes))
+            raise ValueError(f"Missing parts: {', '.join(map(str, missing)) or '0'}.")
+        received = sum(part.size for part in parts)
+        if session.total_size is not None and received != session.total_size:
+            raise ValueError(f"Received {received} bytes, expected {session.total_size}.")
+
+        digest = hashlib.sha256()
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES) as assembled:
+            for part in parts:
+                with default_storage.open(upload_part_path(session, part.index), "rb") as fp:
+                    for chunk in iter(lambda: fp.read(STREAM_CHUNK_BYTES), b""):
+                        digest.update(chunk)
+                        assembled.write(chunk)
+            assembled.seek(0)
+            asset = DataAsset(
+                district=session.district,
+                uploader=session.uploader,
+                notes=session.notes,
+                input_format="file",
+                status="uploaded",
+                content_hash=digest.hexdigest(),
+            )
+            asset.source_file.save(session.filename, File(assembled), save=False)
+            asset.save()
+
+        session.parts.all().delete()
+        session.status = "completed"
+        session.data_asset = asset
+        session.completed_at = timezone.now()
+        session.save(update_fields=["status", "data_asset", "completed_at"])
+        # Keep the stored parts until the session change is durable, so a
+        # rolled-back completion can be retried.
+        transaction.on_commit(lambda: _delete_upload_parts(session, indexes))
+    link_duplicate_asset(asset)
+    return asset
+
+
+def abort_upload_session(session: UploadSession) -> UploadSession:
+    """Mark an open session aborted and delete the parts received so far."""
+    with transaction.atomic():
+        session = UploadSession.objects.select_for_update().get(pk=session.pk)
+        if session.status != "open":
+            raise ValueError("Upload session is not open.")
+        indexes = list(session.parts.values_list("index", flat=True))
+        session.parts.all().delete()
+        session.status = "aborted"
+        session.completed_at = timezone.now()
+        session.save(update_fields=["status", "completed_at"])
+        transaction.on_commit(lambda: _delete_upload_parts(session, indexes))
+    return session
+
+
+def abort_stale_upload_sessions(max_age: timedelta) -> List[UploadSession]:
+    """Abort open sessions created more than ``max_age`` ago, freeing their parts."""
+    cutoff = timezone.now() - max_age
+    aborted = []
+    for session in UploadSession.objects.filter(status="open", created_at__lt=cutoff):
+        try:
+            aborted.append(abort_upload_session(session))
+        except ValueError:
+            # Completed or aborted since the query ran.
+            continue
+    return aborted
+
+
+def process_refresh_job(job: RefreshJob):
+    from apps.analytics.services import deferred_citywide_rollup
+
+    job.started_at = job.started_at or timezone.now()
+    if job.district_id is None:
+        _process_citywide_job(job)
+        return
+    # The citywide rollup is refreshed once per job, not per asset.
+    with deferred_citywide_rollup():
+        _process_district_job(job)
+
+
+def _process_district_job(job: RefreshJob):
+    from apps.analytics.services import compute_snapshot_payloads, save_snapshot
+
+    pending = DataAsset.objects.filter(status__in=["uploaded", "queued"], district_id=job.district_id)
+    pending_assets = list(pending.defer("data_payload").order_by("created_at"))
     if not pending_assets:
         job.status = "completed"
         job.note = "No pending assets."
         job.finished_at = timezone.now()
         job.save()
+        publish_refresh_event("job_completed", job, note=job.note)
         return
 
+    publish_refresh_event("job_started", job, assets=len(pending_assets))
     try:
         for asset in pending_assets:
+            if not asset.content_hash:
+                asset.content_hash = hash_asset_content(asset)
+                asset.save(update_fields=["content_hash"])
+            if link_duplicate_asset(asset):
+                job.last_asset = asset
+                publish_refresh_event("asset_duplicate", job, asset, duplicate_of=str(asset.duplicate_of_id))
+                continue
             asset.status = "processing"
             asset.save(update_fields=["status"])
+            publish_refresh_event("asset_started", job, asset)
             df = load_dataframe_from_asset(asset)
-            asset.row_count = len(df)
-            asset.schema_payload = infer_schema(df)
-            asset.processed_at = timezone.now()
-            asset.status = "processed"
-            asset.save(
-                update_fields=[
-                    "row_count",
-                    "schema_payload",
-                    "processed_at",
-                    "status",
-                ]
+            write_columnar_cache(asset, df)
+            schema = infer_schema(df)
+            # Heavy computation happens outside the transaction; the asset
+            # update and the snapshot rows are then written in one commit.
+            payloads = compute_snapshot_payloads(
+                asset,
+                df,
+                dataset_hash=asset.content_hash,
+                on_stage=lambda stage, done, total, asset=asset: publish_refresh_event(
+                    "stage", job, asset, stage=stage, done=done, total=total
+                ),
             )
+            with transaction.atomic():
+                asset.row_count = len(df)
+                asset.schema_payload = schema
+                asset.processed_at = timezone.now()
+                asset.status = "processed"
+                asset.save(
+                    update_fields=[
+                        "row_count",
+                        "schema_payload",
+                        "processed_at",
+                        "status",
+                    ]
+                )
+                snapshot = save_snapshot(asset, payloads)
             job.last_asset = asset
-            build_snapshot_for_asset(asset, df)
+            publish_refresh_event("asset_completed", job, asset, snapshot=snapshot.pk)
+        job.status = "completed"
+    except Exception as exc:  # noqa: BLE001
+        job.status = "failed"
+        job.note = str(exc)
+    finally:
+        job.finished_at = timezone.now()
+        job.save()
+        publish_refresh_event(f"job_{job.status}", job, note=job.note)
+
+
+def _process_citywide_job(job: RefreshJob):
+    """Jobs without a district ingest the pending citywide exports, each in one pass."""
+    from .citywide import ingest_citywide_asset
+
+    pending = DataAsset.objects.filter(
+        district__isnull=True, parent__isnull=True, status__in=["uploaded", "queued"]
+    )
+    parents = list(pending.order_by("created_at"))
+    publish_refresh_event("job_started", job, assets=len(parents))
+    notes = []
+    try:
+        for parent in parents:
+            # Skip exports another citywide job claimed after the query.
+            if not pending.filter(pk=parent.pk).update(status="processing"):
+                continue
+            # Recorded up front so a stale-job recovery knows which export to re-queue.
+            job.last_asset = parent
+            job.save(update_fields=["last_asset"])
+            publish_refresh_event("asset_started", job, parent)
+            result = ingest_citywide_asset(parent)
+            unmatched = sum(result["unmatched"].values())
+            notes.append(f"{len(result['partitions'])} district partition(s), {unmatched} unmatched row(s).")
+            publish_refresh_event("asset_completed", job, parent, partitions=len(result["partitions"]))
         job.status = "completed"
+        job.note = " ".join(notes) or "No pending citywide exports."
     except Exception as exc:  # noqa: BLE001
         job.status = "failed"
         job.note = str(exc)
     finally:
         job.finished_at = timezone.now()
         job.save()
+        publish_refresh_event(f"job_{job.status}", job, note=job.note)
@@ -0,0 +1,93 @@
+"""
+Prepared frames shared with worker processes.
+
+``publish_frame`` writes a frame once as an Arrow IPC file in
+``SHARED_FRAME_DIR`` (``/dev/shm`` when available, so the file lives in
+shared memory) and removes it when the block exits. Workers get only the
+small ``SharedFrame`` handle; ``attach_table`` memory-maps the file, so the
+columns are read from the shared pages without copying or unpickling, and
+``attach_rows`` materializes just the rows a task works on. Files left by a
+process that died before cleaning up are removed on the next publish.
+"""
+from __future__ import annotations
+
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from django.conf import settings
+
+FILE_PREFIX = "frame-"
+
+
+class SharedFrame(NamedTuple):
+    path: str
+    rows: int
+
+
+def shared_frame_dir() -> Path:
+    configured = getattr(settings, "SHARED_FRAME_DIR", "")
+    if configured:
+        return Path(configured)
+    shm = Path("/dev/shm")
+    return shm if shm.is_dir() and os.access(shm, os.W_OK) else Path(tempfile.gettempdir())
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def remove_stale_frames(directory: Path) -> int:
+    """Delete frames published by processes that no longer exist."""
+    removed = 0
+    for path in directory.glob(f"{FILE_PREFIX}*.arrow"):
+        try:
+            pid = int(path.name[len(FILE_PREFIX) :].split("-", 1)[0])
+        except ValueError:
+            continue
+        if not _pid_alive(pid):
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+@contextmanager
+def publish_frame(df: pd.DataFrame) -> Iterator[SharedFrame]:
+    """Share ``df`` (index dropped) with worker processes for the duration of the block."""
+    directory = shared_frame_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    remove_stale_frames(directory)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    fd, path = tempfile.mkstemp(prefix=f"{FILE_PREFIX}{os.getpid()}-", suffix=".arrow", dir=directory)
+    os.close(fd)
+    try:
+        with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        del table
+        yield SharedFrame(path=path, rows=len(df))
+    finally:
+        Path(path).unlink(missing_ok=True)
+
+
+def attach_table(shared: SharedFrame) -> pa.Table:
+    """The published table; its buffers point into the memory-mapped file."""
+    return pa.ipc.open_file(pa.memory_map(shared.path, "r")).read_all()
+
+
+def attach_rows(shared: SharedFrame, rows: np.ndarray | None = None) -> pd.DataFrame:
+    """A pandas frame of ``rows`` (positions, in order) of the published frame."""
+    table = attach_table(shared)
+    if rows is not None:
+        table = table.take(pa.array(rows, type=pa.int64()))
+    return table.to_pandas()
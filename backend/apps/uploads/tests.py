@@ -1,3 +1,451 @@
-from django.test import TestCase
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+    skipUnlessDBFeature,
+)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.accounts.models import District
+from apps.analytics.models import AnalyticsSnapshot, CurrentSnapshot
+
+from . import services
+from .citywide import partition_rows, worker_pool
+from .columnar import clear_columnar_caches, write_columnar_cache
+from .events import iter_refresh_events
+from .exports import _tee_to_file, export_cache_path, export_response, iter_parquet
+from .jobs import claim_refresh_job, recover_stale_jobs, run_refresh_jobs
+from .models import DataAsset, RefreshJob, UploadSession
+from .services import (
+    abort_stale_upload_sessions,
+    browse_asset_rows,
+    encode_cursor,
+    link_duplicate_asset,
+    upload_part_path,
+)
+from .shared_frame import attach_rows, publish_frame
+
+User = get_user_model()
+
+
+class DataAssetQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("officer", password="secret")
+        self.east = District.objects.get(slug="east")
+        self.user.profile.districts.add(self.east)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _list_queries(self) -> int:
+        cache.clear()
+        # A fresh user object, as each real request loads its own.
+        self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get("/api/uploads/")
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_list_queries_do_not_grow_with_assets(self):
+        DataAsset.objects.create(district=self.east, uploader=self.user)
+        few = self._list_queries()
+        for _ in range(10):
+            DataAsset.objects.create(district=self.east, uploader=self.user)
+        self.assertEqual(few, self._list_queries())
+
+    def test_list_is_limited_to_assigned_districts(self):
+        DataAsset.objects.create(district=self.east)
+        DataAsset.objects.create(district=District.objects.get(slug="west"))
+        response = self.client.get("/api/uploads/")
+        self.assertEqual([row["district"] for row in response.json()["results"]], ["east"])
+
+
+@override_settings(REFRESH_JOBS_INLINE=False)
+class RefreshQueueTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("officer", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _post(self, slug):
+        return self.client.post("/api/uploads/refresh/", {"district": slug}, format="json")
+
+    def test_one_active_job_per_district(self):
+        self.assertEqual(self._post("east").status_code, 202)
+        conflict = self._post("east")
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.json()["job"]["district"], "east")
+        self.assertEqual(self._post("west").status_code, 202)
+
+    def test_claim_moves_job_to_running_once(self):
+        self._post("east")
+        job = claim_refresh_job()
+        self.assertEqual(job.status, "running")
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertIsNone(claim_refresh_job())
+
+    def test_stale_running_job_is_recovered(self):
+        east = District.objects.get(slug="east")
+        asset = DataAsset.objects.create(district=east, status="processing")
+        RefreshJob.objects.create(
+            district=east,
+            status="running",
+            heartbeat_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(self._post("east").status_code, 202)
+        asset.refresh_from_db()
+        self.assertEqual(asset.status, "queued")
+        self.assertEqual(RefreshJob.objects.filter(status="failed").count(), 1)
+
+    @override_settings(REFRESH_JOBS_INLINE=True)
+    def test_refresh_after_preview_analytics_is_accepted(self):
+        east = District.objects.get(slug="east")
+        self.user.profile.districts.add(east)
+        asset = DataAsset.objects.create(district=east, uploader=self.user, status="uploaded")
+        url = f"/api/uploads/{asset.pk}/preview-analytics/"
+        self.assertEqual(self.client.get(url).status_code, 405)
+
+        def complete(job):
+            RefreshJob.objects.filter(pk=job.pk).update(status="completed", finished_at=timezone.now())
+
+        with mock.patch("apps.uploads.views.compute_asset_preview", return_value={"approximate": True}), mock.patch(
+            "apps.uploads.jobs.process_refresh_job", side_effect=complete
+        ):
+            response = self.client.post(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()["refresh_job"]["status"], "completed")
+            self.assertEqual(self._post("east").status_code, 202)
+
+    @override_settings(REFRESH_JOBS_INLINE=True)
+    def test_unclaimed_queued_job_is_recovered_in_inline_mode(self):
+        east = District.objects.get(slug="east")
+        job = RefreshJob.objects.create(district=east, status="queued")
+        RefreshJob.objects.filter(pk=job.pk).update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(recover_stale_jobs(), [job])
+        job.refresh_from_db()
+        self.assertEqual(job.status, "failed")
+
+
+class BrowseRowsTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.enterContext(override_settings(MEDIA_ROOT=media.name))
+        self.addCleanup(clear_columnar_caches)
+        self.user = User.objects.create_user("analyst", password="secret")
+        east = District.objects.get(slug="east")
+        self.user.profile.districts.add(east)
+        self.asset = DataAsset.objects.create(district=east, uploader=self.user, status="processed")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _pages(self, **params):
+        url = f"/api/uploads/{self.asset.pk}/rows/"
+        rows, cursor = [], None
+        while True:
+            response = self.client.get(url, {**params, **({"cursor": cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            rows += response.json()["rows"]
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                return response.json()["columns"], rows
+
+    def test_pages_follow_sort_filter_and_projection(self):
+        rng = np.random.default_rng(3)
+        df = pd.DataFrame(
+            {
+                "Beats": rng.choice([410, 420, 430], 200),
+                "Hour": rng.integers(0, 24, 200),
+                "Crime_Category": rng.choice(["Theft", "Assault", None], 200),
+            }
+        )
+        write_columnar_cache(self.asset, df)
+        columns, rows = self._pages(
+            sort="-Hour", filter="Crime_Category:in:Theft|Assault", columns="Beats,Hour", limit=30
+        )
+        expected = df[df["Crime_Category"].notna()].sort_values("Hour", ascending=False, kind="stable")
+        self.assertEqual(columns, ["Beats", "Hour"])
+        self.assertEqual(rows, expected[["Beats", "Hour"]].to_dict(orient="records"))
+        self.assertEqual(self._pages(limit=64)[1], df.astype(object).where(df.notna(), None).to_dict(orient="records"))
+
+        url = f"/api/uploads/{self.asset.pk}/rows/"
+        cursor = self.client.get(url, {"sort": "Hour", "limit": 5}).json()["next_cursor"]
+        self.assertEqual(self.client.get(url, {"sort": "-Hour", "cursor": cursor}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"filter": "Nope:eq:1"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"columns": "Nope"}).status_code, 400)
+
+    def test_filtered_pages_are_fast_at_any_depth_on_a_million_rows(self):
+        rows = 1_000_000
+        rng = np.random.default_rng(5)
+        write_columnar_cache(
+            self.asset,
+            pd.DataFrame(
+                {
+                    "Beats": rng.integers(100, 500, rows),
+                    "Hour": rng.integers(0, 24, rows),
+                    "Crime_Category": rng.choice(["Theft", "Assault", "Burglary", "Fraud"], rows),
+                }
+            ),
+        )
+        browse = {"filters": ["Crime_Category:eq:Theft"], "sort": "-Beats", "limit": 100}
+        with mock.patch.object(services, "_filter_mask", wraps=services._filter_mask) as mask:
+            first = browse_asset_rows(self.asset, **browse)
+            timings = []
+            for row_id in range(0, rows, rows // 20):
+                started = time.perf_counter()
+                page = browse_asset_rows(self.asset, cursor=encode_cursor(row_id, "Beats", True), **browse)
+                timings.append(time.perf_counter() - started)
+                self.assertLessEqual(len(page["rows"]), 100)
+        self.assertEqual(len(first["rows"]), 100)
+        self.assertEqual(mask.call_count, 1)
+        self.assertLess(statistics.median(timings), 0.05)
+
+
+class ClipboardUploadTests(TestCase):
+    def test_paste_with_mixed_type_column_is_stored(self):
+        user = User.objects.create_user("officer", password="secret")
+        client = APIClient()
+        client.force_authenticate(user)
+        rows = [{"Beats": 410, "Hour": 1}, {"Beats": "UNK", "Hour": 2}]
+        response = client.post("/api/uploads/", {"district": "east", "data_payload": rows}, format="json")
+        self.assertEqual(response.status_code, 201, response.content)
+        asset = DataAsset.objects.get()
+        with asset.source_file.open("rb") as fp:
+            stored = pd.read_parquet(fp)
+        self.assertEqual(stored["Beats"].tolist(), ["410", "UNK"])
+        self.assertEqual(stored["Hour"].tolist(), [1, 2])
+
+
+class DuplicateUploadTests(TestCase):
+    def setUp(self):
+        self.east = District.objects.get(slug="east")
+        self.original = DataAsset.objects.create(
+            district=self.east, status="processed", content_hash="abc", processed_at=timezone.now()
+        )
+        self.snapshot = AnalyticsSnapshot.objects.create(data_asset=self.original, district=self.east)
+        self.upload = DataAsset.objects.create(district=self.east, status="queued", content_hash="abc")
+
+    def test_upload_of_processed_content_reuses_its_snapshot(self):
+        self.assertTrue(link_duplicate_asset(self.upload))
+        self.assertEqual(self.upload.duplicate_of, self.original)
+        self.assertEqual(CurrentSnapshot.objects.get(district=self.east).snapshot, self.snapshot)
+
+    def test_archived_snapshot_is_not_reused(self):
+        AnalyticsSnapshot.objects.filter(pk=self.snapshot.pk).update(archived_at=timezone.now())
+        self.assertFalse(link_duplicate_asset(self.upload))
+        self.upload.refresh_from_db()
+        self.assertIsNone(self.upload.duplicate_of)
+        self.assertEqual(self.upload.status, "queued")
+
+
+class UploadSessionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("officer", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        response = self.client.post(
+            "/api/uploads/sessions/", {"district": "east", "filename": "calls.csv"}, format="json"
+        )
+        self.session = UploadSession.objects.get(pk=response.json()["id"])
+        self.url = f"/api/uploads/sessions/{self.session.pk}"
+        self._put(0, b"Beats,Hour\n410,3\n")
+
+    def _put(self, index, body):
+        return self.client.put(f"{self.url}/parts/{index}/", body, content_type="application/octet-stream")
+
+    def test_session_completes_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f"{self.url}/complete/").status_code, 201)
+        self.assertEqual(self.client.post(f"{self.url}/complete/").status_code, 400)
+        self.assertFalse(default_storage.exists(upload_part_path(self.session, 0)))
+        self.assertEqual(DataAsset.objects.filter(upload_session=self.session).count(), 1)
+
+    def test_abort_discards_parts_and_closes_the_session(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(f"{self.url}/abort/").json()["status"], "aborted")
+        self.assertFalse(default_storage.exists(upload_part_path(self.session, 0)))
+        self.assertEqual(self.client.post(f"{self.url}/complete/").status_code, 400)
+        self.assertEqual(self._put(1, b"420,4\n").status_code, 400)
+        self.assertFalse(default_storage.exists(upload_part_path(self.session, 1)))
+
+    def test_stale_open_sessions_are_aborted(self):
+        self.assertEqual(abort_stale_upload_sessions(timedelta(hours=1)), [])
+        created_at = timezone.now() - timedelta(hours=2)
+        UploadSession.objects.filter(pk=self.session.pk).update(created_at=created_at)
+        aborted = abort_stale_upload_sessions(timedelta(hours=1))
+        self.assertEqual([session.pk for session in aborted], [self.session.pk])
+
+
+class RefreshEventsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("officer", password="secret")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get(self):
+        return self.client.get("/api/uploads/refresh/events/", HTTP_ACCEPT="text/event-stream")
+
+    @override_settings(REFRESH_EVENTS_REDIS_URL="")
+    def test_streams_are_refused_without_a_shared_broker(self):
+        self.assertEqual(self._get().status_code, 501)
+
+    @override_settings(REFRESH_EVENTS_REDIS_URL="redis://events.invalid:6379/0")
+    def test_no_stream_without_an_active_job(self):
+        RefreshJob.objects.create(district=District.objects.get(slug="east"), status="completed")
+        self.assertEqual(self._get().status_code, 204)
+
+    @override_settings(REFRESH_EVENTS_HEARTBEAT_SECONDS=0)
+    def test_stream_ends_when_no_job_is_active(self):
+        chunks = list(iter_refresh_events([], still_active=lambda: False))
+        self.assertEqual(chunks, [b"retry: 0\n\n"])
+
+
+class CitywidePartitionTests(TestCase):
+    def test_rows_are_grouped_by_district_then_beat(self):
+        df = pd.DataFrame(
+            {
+                "District": ["east", "NORTH", "East ", "Nowhere", None, "EAST"],
+                "Beats": [420, 110, 410, 999, 410, 420],
+            }
+        )
+        partitions, unmatched = partition_rows(df)
+        east = District.objects.get(slug="east")
+        north = District.objects.get(slug="north")
+        self.assertEqual(set(partitions), {east.pk, north.pk})
+        self.assertEqual(partitions[east.pk].rows.tolist(), [0, 5, 2])
+        self.assertEqual(partitions[east.pk].beat_sizes.tolist(), [2, 1])
+        self.assertEqual(partitions[north.pk].rows.tolist(), [1])
+        self.assertEqual(unmatched, {"Nowhere": 1, "(blank)": 1})
+
+
+@override_settings(REFRESH_JOBS_INLINE=False)
+class CitywideIngestTests(TestCase):
+    def test_upload_is_queued_and_a_failed_ingest_fails_its_partitions(self):
+        user = User.objects.create_superuser("chief", password="secret")
+        client = APIClient()
+        client.force_authenticate(user)
+        export = SimpleUploadedFile("city.csv", b"District,Beats,Hour\nEAST,410,1\nNORTH,110,2\n")
+        response = client.post("/api/uploads/citywide/", {"source_file": export}, format="multipart")
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["job"]["status"], "queued")
+        self.assertEqual(DataAsset.objects.get().status, "uploaded")
+
+        with mock.patch("apps.analytics.services.prepare_dataframe", side_effect=lambda df: df), mock.patch(
+            "apps.uploads.citywide._compute_payloads", side_effect=RuntimeError("boom")
+        ):
+            [job] = run_refresh_jobs()
+        self.assertEqual((job.status, job.note), ("failed", "boom"))
+        parent = DataAsset.objects.get(district=None)
+        self.assertEqual(parent.status, "failed")
+        self.assertEqual(sorted(parent.partitions.values_list("status", flat=True)), ["failed", "failed"])
+
+
+def _shared_rows(shared, rows):
+    return attach_rows(shared, rows)
+
+
+class SharedFrameTests(SimpleTestCase):
+    def test_workers_read_published_rows_and_file_is_removed(self):
+        df = pd.DataFrame(
+            {
+                "Beats": np.arange(1000) % 7,
+                "Crime_Category": np.where(np.arange(1000) % 3, "Theft", None),
+                "Date/Time Occurred": pd.date_range("2024-01-01", periods=1000, freq="h"),
+            }
+        )
+        rows = np.array([999, 3, 500])
+        with tempfile.TemporaryDirectory() as directory, override_settings(SHARED_FRAME_DIR=directory):
+            # The ingest's own pool: a forkserver worker unpickles the handle
+            # and memory-maps the file after ``django.setup``.
+            with publish_frame(df) as shared, worker_pool(1) as pool:
+                got = pool.submit(_shared_rows, shared, rows).result()
+            pd.testing.assert_frame_equal(got, df.iloc[rows].reset_index(drop=True))
+            self.assertEqual(os.listdir(directory), [])
+
+
+class ExportCacheTests(SimpleTestCase):
+    def test_key_follows_source_version_and_old_files_are_pruned(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media, EXPORT_CACHE_MAX_AGE_SECONDS=60
+        ):
+            old = export_cache_path("asset", "a", 1, [], [], output="csv")
+            new = export_cache_path("asset", "a", 2, [], [], output="csv")
+            self.assertNotEqual(old, new)
+            self.assertEqual(b"".join(_tee_to_file(iter([b"x"]), old)), b"x")
+            os.utime(old, (0, 0))
+            self.assertEqual(b"".join(_tee_to_file(iter([b"a", b"b"]), new)), b"ab")
+            self.assertEqual(os.listdir(new.parent), [new.name])
+            self.assertEqual(new.read_bytes(), b"ab")
+
+    def _export(self, path, **headers):
+        request = RequestFactory().get("/export/", headers=headers)
+        return export_response(request, lambda: iter([b"abc", b"def"]), path, "rows", "csv")
+
+    def test_range_before_the_file_exists_streams_the_full_export(self):
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            path = export_cache_path("asset", "a", 1, output="csv")
+            response = self._export(path, Range="bytes=2-")
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(path.exists())
+            self.assertEqual(b"".join(response.streaming_content), b"abcdef")
+            partial = self._export(path, Range="bytes=2-")
+            self.assertEqual((partial.status_code, partial["Content-Range"]), (206, "bytes 2-5/6"))
+            # Pruned after the response opened it: the open handle still serves it.
+            path.unlink()
+            self.assertEqual(b"".join(partial.streaming_content), b"cdef")
+            self.assertEqual(self._export(path, Range="bytes=2-").status_code, 200)
+
+    def test_parquet_schema_comes_from_dtypes_not_the_first_batch(self):
+        batches = [
+            pd.DataFrame({"Crime_Category": [None, None], "Beats": pd.Categorical([None, None]), "Hour": [1.0, None]}),
+            pd.DataFrame({"Crime_Category": ["Theft", None], "Beats": pd.Categorical(["410", "420"]), "Hour": [2.0, 3.0]}),
+        ]
+        table = pq.read_table(pa.BufferReader(b"".join(iter_parquet(batches))))
+        self.assertEqual(table["Crime_Category"].to_pylist(), [None, None, "Theft", None])
+        self.assertEqual(table["Beats"].to_pylist(), [None, None, "410", "420"])
+        self.assertEqual(table["Hour"].to_pylist(), [1.0, None, 2.0, 3.0])
+
+
+# The shared-cache in-memory SQLite test database raises "table is locked"
+# under concurrent writers; `manage.py loadtest_refresh_queue` covers SQLite.
+@skipUnlessDBFeature("has_select_for_update_skip_locked")
+@override_settings(REFRESH_JOBS_INLINE=False)
+class ConcurrentRefreshTests(TransactionTestCase):
+    def test_concurrent_posts_queue_one_job_per_district(self):
+        user = User.objects.create_user("officer", password="secret")
+        slugs = ["east", "west", "north", "south"]
+
+        def post(slug):
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                return client.post("/api/uploads/refresh/", {"district": slug}, format="json").status_code
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            statuses = list(pool.map(post, slugs * 10))
+        self.assertEqual(statuses.count(202), len(slugs))
+        self.assertEqual(statuses.count(409), len(statuses) - len(slugs))
+        active = RefreshJob.objects.filter(status="queued")
+        self.assertEqual(sorted(active.values_list("district__slug", flat=True)), sorted(slugs))
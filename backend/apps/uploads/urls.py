@@ -1,12 +1,22 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import DataAssetViewSet, RefreshJobView
+from .views import (
+    CitywideIngestView,
+    DataAssetViewSet,
+    RefreshEventsView,
+    RefreshJobView,
+    UploadSessionViewSet,
+)
 
 router = DefaultRouter()
+# Registered before the asset routes so "sessions/" is not read as an asset id.
+router.register("sessions", UploadSessionViewSet, basename="upload-session")
 router.register("", DataAssetViewSet, basename="data-asset")
 
 urlpatterns = [
+    path("citywide/", CitywideIngestView.as_view(), name="citywide-ingest"),
     path("refresh/", RefreshJobView.as_view(), name="refresh-job"),
+    path("refresh/events/", RefreshEventsView.as_view(), name="refresh-events"),
     path("", include(router.urls)),
 ]
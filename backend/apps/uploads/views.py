@@ -1,18 +1,72 @@
-from rest_framework import permissions, status, viewsets
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.http import StreamingHttpResponse
+from rest_framework import mixins, permissions, status, viewsets
 from rest_framework.decorators import action
+from rest_framework.parsers import BaseParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from apps.accounts.models import District
-from apps.accounts.serializers import DistrictSerializer
+from apps.accounts import reference
+from apps.accounts.services import get_access_scope
+from apps.analytics.renderers import EventStreamRenderer, FastJSONRenderer
+from apps.analytics.services import CITYWIDE_SLUG
 
-from .models import DataAsset, RefreshJob
-from .serializers import DataAssetCreateSerializer, DataAssetSerializer, RefreshJobSerializer
-from .services import get_dataframe_preview, process_refresh_job
+from .models import DataAsset, RefreshJob, UploadSession
+from .citywide import store_citywide_upload
+from .columnar import columnar_cache_path, write_columnar_cache
+from .events import iter_refresh_events, shared_broker_configured
+from .jobs import (
+    ACTIVE_STATUSES,
+    PENDING_ASSET_STATUSES,
+    districts_with_pending_assets,
+    enqueue_citywide_ingest,
+    enqueue_refresh_jobs,
+    run_refresh_jobs,
+)
+from .exports import encode_batches, export_cache_path, export_response, normalize_output
+from .serializers import (
+    DataAssetCreateSerializer,
+    DataAssetSerializer,
+    RefreshJobSerializer,
+    UploadPartSerializer,
+    UploadSessionSerializer,
+)
+from .services import (
+    BROWSE_DEFAULT_LIMIT,
+    abort_upload_session,
+    browse_asset_rows,
+    clipboard_source_file,
+    complete_upload_session,
+    compute_asset_preview,
+    get_dataframe_preview,
+    hash_content,
+    infer_schema,
+    iter_filtered_batches,
+    link_duplicate_asset,
+    store_upload_part,
+)
+
+
+# Jobs from before the queue have no created_at; keep them last on every backend.
+LATEST_JOB_ORDER = F("created_at").desc(nulls_last=True)
+
+
+class RawBodyParser(BaseParser):
+    """Leave part bodies unread so they can be streamed to storage."""
+
+    media_type = "*/*"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return stream
 
 
 class DataAssetViewSet(viewsets.ModelViewSet):
-    queryset = DataAsset.objects.select_related("district", "uploader").all()
+    # Legacy clipboard rows can carry whole tables in ``data_payload``.
+    queryset = DataAsset.objects.select_related("district", "uploader").defer(
+        "data_payload", "preview_payload"
+    )
     permission_classes = [permissions.IsAuthenticated]
 
     def get_serializer_class(self):
@@ -22,13 +76,36 @@ class DataAssetViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         qs = super().get_queryset()
-        profile = getattr(self.request.user, "profile", None)
-        if profile and profile.districts.exists():
-            return qs.filter(district__in=profile.districts.all())
+        district_ids = get_access_scope(self.request.user)["districts"]
+        if district_ids:
+            return qs.filter(district_id__in=district_ids)
         return qs
 
     def perform_create(self, serializer):
-        serializer.save(uploader=self.request.user, status="uploaded")
+        data = serializer.validated_data
+        clipboard_text = data.pop("clipboard_text", None)
+        records = data.pop("data_payload", None)
+        if data.get("source_file"):
+            asset = serializer.save(
+                uploader=self.request.user,
+                status="uploaded",
+                content_hash=hash_content(data["source_file"]),
+            )
+        else:
+            # Pastes are parsed once here and stored as parquet, with the
+            # columnar cache written up front, instead of as JSON rows.
+            df = serializer.clipboard_frame
+            asset = serializer.save(
+                uploader=self.request.user,
+                status="uploaded",
+                input_format="clipboard",
+                source_file=clipboard_source_file(df),
+                row_count=len(df),
+                schema_payload=infer_schema(df),
+                content_hash=hash_content(data_payload=records, clipboard_text=clipboard_text),
+            )
+            write_columnar_cache(asset, df)
+        link_duplicate_asset(asset)
 
     @action(detail=True, methods=["get"])
     def preview(self, request, pk=None):
@@ -36,26 +113,274 @@ class DataAssetViewSet(viewsets.ModelViewSet):
         preview = get_dataframe_preview(asset)
         return Response({"rows": preview})
 
+    @action(detail=True, methods=["post"], url_path="preview-analytics")
+    def preview_analytics(self, request, pk=None):
+        """
+        Approximate analytics from a stratified sample, with the exact
+        refresh of the asset's district queued behind it (and run, like
+        ``refresh/``, in inline mode).
+        """
+        asset = self.get_object()
+        preview = asset.preview_payload or compute_asset_preview(asset)
+        job = None
+        if asset.district_id and asset.status in PENDING_ASSET_STATUSES:
+            created, active = enqueue_refresh_jobs([asset.district_id], triggered_by=request.user)
+            if created and settings.REFRESH_JOBS_INLINE:
+                run_refresh_jobs([job.pk for job in created])
+                for job in created:
+                    job.refresh_from_db()
+            job = (created or active or [None])[0]
+        return Response(
+            {
+                "preview": preview,
+                "refresh_job": RefreshJobSerializer(job).data if job is not None else None,
+            }
+        )
+
+    @action(detail=True, methods=["get"])
+    def rows(self, request, pk=None):
+        asset = self.get_object()
+        params = request.query_params
+        columns = [col for col in params.get("columns", "").split(",") if col]
+        try:
+            page = browse_asset_rows(
+                asset,
+                limit=int(params.get("limit", BROWSE_DEFAULT_LIMIT)),
+                cursor=params.get("cursor"),
+                columns=columns or None,
+                filters=params.getlist("filter"),
+                sort=params.get("sort") or None,
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(page)
+
+    @action(detail=True, methods=["get"])
+    def export(self, request, pk=None):
+        asset = self.get_object()
+        params = request.query_params
+        columns = [col for col in params.get("columns", "").split(",") if col]
+        filters = params.getlist("filter")
+        try:
+            output = normalize_output(params.get("output"))
+            iter_filtered_batches(asset, columns or None, filters)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        # The columnar cache mtime changes whenever the rows are rewritten.
+        cache_path = export_cache_path(
+            "asset",
+            str(asset.id),
+            columnar_cache_path(asset).stat().st_mtime_ns,
+            columns,
+            sorted(filters),
+            output=output,
+        )
+        return export_response(
+            request,
+            lambda: encode_batches(iter_filtered_batches(asset, columns or None, filters), output),
+            cache_path,
+            filename=f"{asset.district.slug if asset.district_id else CITYWIDE_SLUG}-{asset.id}",
+            output=output,
+        )
+
+
+class UploadSessionViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.ListModelMixin,
+    viewsets.GenericViewSet,
+):
+    """
+    Resumable chunked uploads: create a session, ``PUT`` each part's raw bytes
+    to ``parts/<index>/``, then ``POST`` ``complete/`` (or ``abort/`` to
+    discard the parts). Retrieving the session lists the parts already
+    received so an interrupted upload can resume.
+    """
+
+    serializer_class = UploadSessionSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        qs = UploadSession.objects.prefetch_related("parts").filter(uploader=self.request.user)
+        if self.action == "list":
+            return qs.filter(status="open")
+        return qs
+
+    def perform_create(self, serializer):
+        serializer.save(uploader=self.request.user)
+
+    @action(
+        detail=True,
+        methods=["put"],
+        url_path=r"parts/(?P<index>\d+)",
+        parser_classes=[RawBodyParser],
+    )
+    def parts(self, request, pk=None, index=None):
+        session = self.get_object()
+        if request.stream is None:
+            return Response({"detail": "Empty part."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            part = store_upload_part(
+                session,
+                int(index),
+                request.stream,
+                expected_sha256=request.headers.get("X-Content-SHA256"),
+            )
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        data = UploadPartSerializer(part).data
+        if part.index == 0:
+            data["schema_preview"] = session.schema_preview
+        return Response(data)
+
+    @action(detail=True, methods=["post"])
+    def complete(self, request, pk=None):
+        session = self.get_object()
+        try:
+            asset = complete_upload_session(session)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        asset.refresh_from_db()
+        return Response(DataAssetSerializer(asset).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=["post"])
+    def abort(self, request, pk=None):
+        try:
+            session = abort_upload_session(self.get_object())
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(session).data)
+
+
+class CitywideIngestView(APIView):
+    """
+    ``POST`` a citywide export (multipart ``source_file``). It is stored and
+    a refresh job without a district is queued, which parses it once and
+    fans it out to every district's partition and snapshot plus the
+    citywide rollup. Follow the job on ``refresh/``.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        if get_access_scope(request.user)["districts"]:
+            return Response(
+                {"detail": "Citywide ingest needs access to every district."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        source_file = request.FILES.get("source_file")
+        if source_file is None:
+            return Response({"detail": "Provide a source_file."}, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            asset = store_citywide_upload(
+                source_file, uploader=request.user, notes=request.data.get("notes", "")
+            )
+            job = enqueue_citywide_ingest(triggered_by=request.user)
+        if settings.REFRESH_JOBS_INLINE:
+            run_refresh_jobs([job.pk])
+            asset.refresh_from_db()
+            job.refresh_from_db()
+        return Response(
+            {"asset": DataAssetSerializer(asset).data, "job": RefreshJobSerializer(job).data},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
 
 class RefreshJobView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        job = RefreshJob.objects.order_by("-started_at").first()
+        jobs = RefreshJob.objects.order_by(LATEST_JOB_ORDER)
+        slug = request.query_params.get("district")
+        if slug:
+            district = reference.district_by_slug(slug)
+            if district is None:
+                return Response({"detail": "District not found."}, status=status.HTTP_404_NOT_FOUND)
+            jobs = jobs.filter(district_id=district.pk)
+        job = jobs.first()
         if not job:
             return Response({"detail": "No refresh jobs yet."})
         serializer = RefreshJobSerializer(job)
         return Response(serializer.data)
 
     def post(self, request):
-        if RefreshJob.objects.filter(status="running").exists():
-            job = RefreshJob.objects.filter(status="running").latest("started_at")
+        """
+        Queue a refresh for ``district`` (a slug), or for every district with
+        pending uploads. Each district runs at most one job at a time.
+        """
+        slug = request.data.get("district")
+        if slug:
+            district = reference.district_by_slug(slug)
+            if district is None:
+                return Response({"detail": "District not found."}, status=status.HTTP_404_NOT_FOUND)
+            district_ids = [district.pk]
+        else:
+            district_ids = districts_with_pending_assets()
+            if not district_ids:
+                return Response({"detail": "No pending assets."})
+        created, active = enqueue_refresh_jobs(district_ids, triggered_by=request.user)
+        if not created:
             return Response(
-                {"detail": "A refresh is already running.", "job": RefreshJobSerializer(job).data},
+                {
+                    "detail": "A refresh is already running.",
+                    "job": RefreshJobSerializer(active[0]).data if active else None,
+                    "jobs": RefreshJobSerializer(active, many=True).data,
+                },
                 status=status.HTTP_409_CONFLICT,
             )
-        districts = District.objects.all()
-        serializer = DistrictSerializer(districts, many=True)
-        job = RefreshJob.objects.create(status="running", triggered_by=request.user)
-        process_refresh_job(job)
-        return Response(RefreshJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+        if settings.REFRESH_JOBS_INLINE:
+            run_refresh_jobs([job.pk for job in created])
+            for job in created:
+                job.refresh_from_db()
+        if slug:
+            return Response(RefreshJobSerializer(created[0]).data, status=status.HTTP_202_ACCEPTED)
+        return Response(
+            {
+                "jobs": RefreshJobSerializer(created, many=True).data,
+                "already_running": RefreshJobSerializer(active, many=True).data,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class RefreshEventsView(APIView):
+    """
+    Server-Sent Events stream of refresh progress (``job_started``, ``stage``,
+    ``asset_completed``, ``job_completed`` ...) for users who opted in to
+    refresh notifications, limited to their assigned districts. The stream
+    is only opened while one of those districts has a queued or running job
+    (204 otherwise) and ends with the last job. Without a shared broker the
+    events of other workers cannot reach it, so it answers 501 and clients
+    poll ``refresh/`` instead.
+    """
+
+    permission_classes = [permissions.IsAuthenticated]
+    renderer_classes = [EventStreamRenderer, FastJSONRenderer]
+
+    def get(self, request):
+        profile = getattr(request.user, "profile", None)
+        if profile is not None and not profile.receive_refresh_notifications:
+            return Response(
+                {"detail": "Refresh notifications are disabled for this account."},
+                status=status.HTTP_403_FORBIDDEN,
+            )
+        if not shared_broker_configured():
+            return Response(
+                {"detail": "Live refresh events need REFRESH_EVENTS_REDIS_URL; poll /api/uploads/refresh/."},
+                status=status.HTTP_501_NOT_IMPLEMENTED,
+            )
+        district_ids = get_access_scope(request.user)["districts"]
+        active = RefreshJob.objects.filter(status__in=ACTIVE_STATUSES)
+        if district_ids:
+            active = active.filter(Q(district_id__in=district_ids) | Q(district__isnull=True))
+        job = active.order_by(LATEST_JOB_ORDER).first()
+        if job is None:
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        initial = {"type": "job_status", "job": job.pk, "seq": 0, **RefreshJobSerializer(job).data}
+        response = StreamingHttpResponse(
+            iter_refresh_events(district_ids, initial, still_active=active.exists),
+            content_type="text/event-stream",
+        )
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
@@ -0,0 +1,53 @@
+"""
+Gunicorn settings: ``gunicorn config.wsgi:application -c config/gunicorn.py``.
+
+The app is preloaded and warmed (see ``config.warmup``) in the master before
+forking, so workers start with reference data, GeoJSON and current snapshots
+already in shared memory. Threaded workers (``gthread``) keep slow clients,
+SSE streams and chunked uploads from pinning a whole process, while separate
+processes keep pandas/scikit-learn work from serialising on one GIL.
+"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+worker_class = "gthread"
+workers = int(os.getenv("WEB_CONCURRENCY", max(2, multiprocessing.cpu_count())))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+# Inline refresh jobs (REFRESH_JOBS_INLINE=1, the default) train models inside
+# the request, so a worker is given longer before it is killed. Deployments
+# with large exports should set REFRESH_JOBS_INLINE=0 and run
+# `manage.py process_refresh_jobs --loop` instead.
+REFRESH_JOBS_INLINE = os.getenv("REFRESH_JOBS_INLINE", "1") == "1"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "600" if REFRESH_JOBS_INLINE else "120"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then to return memory fragmented by large frames.
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = max_requests // 10
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+accesslog = "-"
+
+
+def when_ready(server):
+    if not preload_app:
+        return
+    from config.warmup import warm_up
+
+    timings = warm_up()
+    server.log.info(
+        "Warm-up finished: %s",
+        ", ".join(
+            f"{name} {'failed' if seconds is None else f'{seconds * 1000:.0f} ms'}"
+            for name, seconds in timings.items()
+        ),
+    )
+
+
+def post_fork(server, worker):
+    # Never reuse a database connection across processes.
+    from django.db import connections
+
+    connections.close_all()
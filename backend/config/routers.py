@@ -0,0 +1,69 @@
+"""
+Database routing for the optional read replica.
+
+Reads of reference and analytics tables go to the ``replica`` alias when it is
+configured, but only inside a ``replica_reads()`` scope (every request, via
+``PrimaryPinningMiddleware``). A scope that writes (or a request with an
+unsafe HTTP method) is pinned to the primary until the scope ends, so it
+always reads its own writes. Outside a scope (management commands, refresh
+job workers) everything uses the primary.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA_DB_ALIAS = "replica"
+REPLICA_READ_APPS = {"accounts", "analytics", "geo"}
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# None outside a ``replica_reads()`` scope.
+_pinned_to_primary: ContextVar[bool | None] = ContextVar("pinned_to_primary", default=None)
+
+
+def pin_to_primary():
+    if _pinned_to_primary.get() is not None:
+        _pinned_to_primary.set(True)
+
+
+@contextmanager
+def replica_reads(pinned: bool = False):
+    """Allow replica reads until the block ends or it writes; the pin is reset on exit."""
+    token = _pinned_to_primary.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+class ReadReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if REPLICA_DB_ALIAS not in connections.databases:
+            return None
+        if model._meta.app_label not in REPLICA_READ_APPS or _pinned_to_primary.get() is not False:
+            return DEFAULT_DB_ALIAS
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return REPLICA_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class PrimaryPinningMiddleware:
+    """Each request is a ``replica_reads()`` scope; unsafe methods start pinned."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with replica_reads(pinned=request.method not in SAFE_METHODS):
+            return self.get_response(request)
@@ -48,7 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'apps.analytics.middleware.GZipMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'config.routers.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,6 +99,41 @@ if os.getenv("POSTGRES_DB"):
         "HOST": os.getenv("POSTGRES_HOST", "localhost"),
         "PORT": os.getenv("POSTGRES_PORT", "5432"),
     }
+# Persistent connections: each worker thread reuses its connection for up to
+# DB_CONN_MAX_AGE seconds instead of reconnecting per request.
+DATABASES["default"]["CONN_MAX_AGE"] = int(os.getenv("DB_CONN_MAX_AGE", "60"))
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+# Optional read replica for dashboard reads (see config/routers.py).
+if os.getenv("POSTGRES_REPLICA_HOST") and os.getenv("POSTGRES_DB"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": os.getenv("POSTGRES_REPLICA_HOST"),
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", DATABASES["default"]["PORT"]),
+        "TEST": {"MIRROR": "default"},
+    }
+elif os.getenv("SQLITE_REPLICA_PATH"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "NAME": os.getenv("SQLITE_REPLICA_PATH"),
+        "TEST": {"MIRROR": "default"},
+    }
+DATABASE_ROUTERS = ["config.routers.ReadReplicaRouter"]
+
+# Caches shared by all workers when Redis is available; per-process otherwise.
+if os.getenv("REDIS_CACHE_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_CACHE_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
 
 
 # Password validation
@@ -152,6 +189,10 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "apps.analytics.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 25,
 }
@@ -180,6 +221,61 @@ DATASET_PATH = os.getenv(
     "DATASET_PATH",
     str(Path(__file__).resolve().parent.parent.parent / "East_District_Arlingtontx_odp_crime_PROD_v2.xlsx"),
 )
+# Refresh job queue. Inline mode processes a POSTed refresh in the request;
+# otherwise `manage.py process_refresh_jobs --loop` workers pick jobs up.
+REFRESH_JOBS_INLINE = os.getenv("REFRESH_JOBS_INLINE", "1") == "1"
+REFRESH_JOB_HEARTBEAT_SECONDS = int(os.getenv("REFRESH_JOB_HEARTBEAT_SECONDS", "15"))
+REFRESH_JOB_STALE_SECONDS = int(os.getenv("REFRESH_JOB_STALE_SECONDS", "120"))
+# Citywide ingest computes district snapshots in this many processes; they
+# read the prepared frame from one shared file in SHARED_FRAME_DIR
+# (default /dev/shm, else the temp dir).
+CITYWIDE_INGEST_WORKERS = int(os.getenv("CITYWIDE_INGEST_WORKERS", "1"))
+SHARED_FRAME_DIR = os.getenv("SHARED_FRAME_DIR", "")
+# Near-repeat (Knox) analysis: pairs within this distance and number of days
+# count as near repeats, split into BANDS x BANDS distance/day bands, with
+# p-values from this many time permutations. Beats run in WORKERS processes.
+NEAR_REPEAT_DISTANCE_METERS = float(os.getenv("NEAR_REPEAT_DISTANCE_METERS", "200"))
+NEAR_REPEAT_DAYS = float(os.getenv("NEAR_REPEAT_DAYS", "14"))
+NEAR_REPEAT_BANDS = int(os.getenv("NEAR_REPEAT_BANDS", "4"))
+NEAR_REPEAT_PERMUTATIONS = int(os.getenv("NEAR_REPEAT_PERMUTATIONS", "99"))
+NEAR_REPEAT_WORKERS = int(os.getenv("NEAR_REPEAT_WORKERS", "1"))
+# Model explanations (grouped permutation importance and per-prediction
+# contributions) use this many validation rows and shuffles per column,
+# scoring columns in WORKERS joblib processes.
+EXPLANATION_SAMPLE_ROWS = int(os.getenv("EXPLANATION_SAMPLE_ROWS", "1000"))
+EXPLANATION_REPEATS = int(os.getenv("EXPLANATION_REPEATS", "5"))
+EXPLANATION_WORKERS = int(os.getenv("EXPLANATION_WORKERS", "1"))
+# Preview analytics after an upload are estimated from a stratified sample of
+# this many rows; the exact snapshot follows from a queued refresh.
+PREVIEW_SAMPLE_ROWS = int(os.getenv("PREVIEW_SAMPLE_ROWS", "20000"))
+
+# Refresh progress events (SSE). Without Redis an in-process broker is used.
+REFRESH_EVENTS_REDIS_URL = os.getenv("REFRESH_EVENTS_REDIS_URL", os.getenv("REDIS_CACHE_URL", ""))
+REFRESH_EVENTS_HEARTBEAT_SECONDS = int(os.getenv("REFRESH_EVENTS_HEARTBEAT_SECONDS", "15"))
+REFRESH_EVENTS_MAX_SECONDS = int(os.getenv("REFRESH_EVENTS_MAX_SECONDS", "300"))
+
+# Chunked uploads: largest accepted part and bytes of the first part used to
+# infer a schema preview.
+UPLOAD_MAX_PART_BYTES = int(os.getenv("UPLOAD_MAX_PART_BYTES", str(16 * 1024 * 1024)))
+UPLOAD_PREVIEW_BYTES = 1024 * 1024
+# Open upload sessions older than this are aborted (and their parts deleted)
+# by `manage.py cleanup_upload_sessions`.
+UPLOAD_SESSION_MAX_AGE_HOURS = float(os.getenv("UPLOAD_SESSION_MAX_AGE_HOURS", "24"))
+
+# Completed exports are kept this long under media/exports/ for resumable
+# (Range) downloads, then pruned.
+EXPORT_CACHE_MAX_AGE_SECONDS = int(os.getenv("EXPORT_CACHE_MAX_AGE_SECONDS", str(24 * 3600)))
+
+# Snapshots kept with payloads per district; older ones are archived by
+# `manage.py compact_snapshots`.
+SNAPSHOT_RETENTION_COUNT = int(os.getenv("SNAPSHOT_RETENTION_COUNT", "10"))
+
+# Ad-hoc queries (/api/analytics/districts/<district>/query/): time budget
+# (checked between steps, so a running filter or group-by is not interrupted),
+# most groups returned, and how long results stay in the cache.
+QUERY_TIME_LIMIT_SECONDS = float(os.getenv("QUERY_TIME_LIMIT_SECONDS", "5"))
+QUERY_MAX_ROWS = int(os.getenv("QUERY_MAX_ROWS", "5000"))
+QUERY_RESULT_CACHE_SECONDS = int(os.getenv("QUERY_RESULT_CACHE_SECONDS", "600"))
 DISTRICT_CONFIG = {
     "EAST": {"beats": [f"E{idx}" for idx in range(1, 9)]},
     "NORTH": {"beats": [f"N{idx}" for idx in range(1, 9)]},
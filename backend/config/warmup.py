@@ -0,0 +1,75 @@
+"""
+Process warm-up.
+
+``warm_up()`` loads everything the first dashboard requests would otherwise
+load lazily: the URLconf (and with it every view module), district/beat
+reference data, parsed district and beat GeoJSON, and the encoded current
+snapshot of every district. The gunicorn config calls it in the master
+process with ``preload_app`` so forked workers share the result
+copy-on-write. A failing step is logged and skipped; warm-up never blocks
+the server from starting.
+"""
+import gc
+import logging
+import time
+
+from django.db import connections
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+
+def _load_urlconf():
+    get_resolver().url_patterns
+
+
+def _load_reference():
+    from apps.accounts import reference
+
+    reference.get_reference()
+
+
+def _load_geo():
+    from apps.geo.services import get_beat_geojson, get_district_geojson
+
+    get_district_geojson()
+    get_beat_geojson()
+
+
+def _load_snapshots():
+    from apps.accounts import reference
+    from apps.analytics.services import CITYWIDE_SLUG, current_encoded_payload
+
+    for district in reference.all_districts():
+        current_encoded_payload(district.slug)
+    current_encoded_payload(CITYWIDE_SLUG)
+
+
+STEPS = [
+    ("urlconf", _load_urlconf),
+    ("reference data", _load_reference),
+    ("geojson", _load_geo),
+    ("current snapshots", _load_snapshots),
+]
+
+
+def warm_up(freeze: bool = True) -> dict:
+    """Run each warm-up step; returns seconds taken per step (None when it failed)."""
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:  # noqa: BLE001
+            logger.exception("Warm-up step %s failed", name)
+            timings[name] = None
+        else:
+            timings[name] = time.perf_counter() - started
+    # Connections opened here must not be inherited by forked workers.
+    connections.close_all()
+    if freeze:
+        # Move everything loaded so far out of the collector's generations so
+        # GC passes in the workers do not touch (and un-share) those pages.
+        gc.collect()
+        gc.freeze()
+    return timings
@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useMemo, useState } from "react";
+import { useEffect, useMemo, useRef, useState } from "react";
 import type { FeatureCollection } from "geojson";
 
 import { useAuth } from "@/context/auth-context";
@@ -11,6 +11,7 @@ import {
   fetchRefreshStatus,
   fetchSnapshot,
   listUploads,
+  subscribeRefreshEvents,
   triggerRefresh,
   uploadDataAsset,
 } from "@/lib/api";
@@ -22,6 +23,9 @@ import ModelTab from "./ModelTab";
 import OverviewTab from "./OverviewTab";
 import UploadCenter from "./UploadCenter";
 
+// Job status polling interval when live refresh events are unavailable.
+const REFRESH_POLL_MS = 5000;
+
 const tabs = [
   { id: "overview", label: "Overview" },
   { id: "eda", label: "EDA" },
@@ -59,7 +63,7 @@ export default function DistrictDashboard({ slug }: Props) {
         const [snapshotRes, uploadsRes, refreshRes, modelsRes] = await Promise.all([
           fetchSnapshot(slug, accessToken),
           listUploads(accessToken),
-          fetchRefreshStatus(accessToken),
+          fetchRefreshStatus(accessToken, slug),
           fetchModelResults(slug, accessToken),
         ]);
         setSnapshot(snapshotRes);
@@ -81,10 +85,74 @@ export default function DistrictDashboard({ slug }: Props) {
     load();
   }, [accessToken, slug]);
 
+  const jobActive = refreshJob?.status === "queued" || refreshJob?.status === "running";
+
+  useEffect(() => {
+    if (!accessToken || !jobActive) return;
+    let poll: ReturnType<typeof setInterval> | undefined;
+    const startPolling = () => {
+      poll = setInterval(() => {
+        fetchRefreshStatus(accessToken, slug)
+          .then((res) => setRefreshJob(res as RefreshJob))
+          .catch(() => undefined);
+      }, REFRESH_POLL_MS);
+    };
+    if (profile?.receive_refresh_notifications === false) {
+      startPolling();
+      return () => clearInterval(poll);
+    }
+    const unsubscribe = subscribeRefreshEvents(
+      accessToken,
+      (event) => {
+        if (event.type === "job_status") {
+          setRefreshJob({ ...(event as unknown as RefreshJob), id: event.job });
+        } else if (event.type === "job_started") {
+          setRefreshJob({ id: event.job, status: "running", started_at: event.at });
+        } else if (event.type === "stage") {
+          setRefreshJob((job) => ({
+            ...(job ?? { id: event.job, status: "running" }),
+            progress: `${event.stage?.replace("_payload", "")} ${event.done}/${event.total}`,
+          }));
+        } else if (event.type === "job_completed" || event.type === "job_failed") {
+          setRefreshJob((job) => ({
+            ...(job ?? { id: event.job }),
+            status: event.type === "job_completed" ? "completed" : "failed",
+            finished_at: event.at,
+            note: event.note,
+            progress: undefined,
+          }));
+        }
+      },
+      startPolling,
+    );
+    return () => {
+      unsubscribe();
+      clearInterval(poll);
+    };
+  }, [accessToken, jobActive, profile, slug]);
+
+  function reloadAfterRefresh(token: string) {
+    listUploads(token).then((res) =>
+      setUploads(((res as { results?: UploadAsset[] }).results ?? res) as UploadAsset[]),
+    );
+    fetchSnapshot(slug, token)
+      .then((res) => setSnapshot(res as AnalyticsSnapshot))
+      .catch(() => undefined);
+  }
+
+  // Reload uploads and the snapshot once an active job finishes.
+  const wasActive = useRef(false);
+  useEffect(() => {
+    if (wasActive.current && !jobActive && accessToken) reloadAfterRefresh(accessToken);
+    wasActive.current = jobActive;
+  }, [accessToken, jobActive, slug]);
+
   async function handleRefresh() {
     if (!accessToken) return;
-    const job = await triggerRefresh(accessToken);
-    setRefreshJob(job as RefreshJob);
+    const job = (await triggerRefresh(accessToken, slug)) as RefreshJob;
+    setRefreshJob(job);
+    // Inline refreshes have already finished when the request returns.
+    if (job.status !== "queued" && job.status !== "running") reloadAfterRefresh(accessToken);
   }
 
   async function handleUpload(payload: FormData | Record<string, unknown>) {
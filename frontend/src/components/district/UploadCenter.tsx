@@ -1,7 +1,6 @@
 "use client";
 
 import { FormEvent, useState } from "react";
-import Papa from "papaparse";
 
 import type { RefreshJob, UploadAsset } from "@/types";
 
@@ -34,12 +33,12 @@ export default function UploadCenter({ slug, uploads, refreshJob, onUpload, onRe
     const formData = new FormData(event.currentTarget);
     const raw = formData.get("clipboard-data") as string;
     if (!raw) return;
-    const parsed = Papa.parse(raw.trim(), { header: true });
     try {
       setLoading(true);
       await onUpload({
         district: slug,
-        data_payload: parsed.data,
+        // Parsed server-side (TSV from Excel or CSV) straight into the columnar cache.
+        clipboard_text: raw,
         input_format: "clipboard",
       });
       setStatus("Clipboard data queued. Trigger refresh to publish.");
@@ -100,6 +99,7 @@ export default function UploadCenter({ slug, uploads, refreshJob, onUpload, onRe
         <div className="mt-4 rounded-2xl border border-white/10 bg-slate-950/50 p-4">
           <p className="text-sm text-slate-300">Status</p>
           <p className="text-3xl font-semibold text-white">{refreshJob?.status ?? "Idle"}</p>
+          {refreshJob?.progress && <p className="text-xs text-slate-400">Stage {refreshJob.progress}</p>}
           {refreshJob?.started_at && (
             <p className="text-xs text-slate-400">
               Started {new Date(refreshJob.started_at).toLocaleString()} - Finished{" "}
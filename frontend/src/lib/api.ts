@@ -1,11 +1,13 @@
-import { API_BASE_URL } from "./config";
+import { COLUMNAR_JSON_MEDIA_TYPE, fromColumnar } from "./columnar";
+import { API_BASE_URL, COLUMNAR_PAYLOADS } from "./config";
 
-type FetchOptions = RequestInit & { token?: string | null };
+type FetchOptions = RequestInit & { token?: string | null; columnar?: boolean };
 
 async function apiFetch<T>(endpoint: string, options: FetchOptions = {}): Promise<T> {
-  const { token, headers, body, ...rest } = options;
+  const { token, headers, body, columnar, ...rest } = options;
   const mergedHeaders: HeadersInit = {
     "Content-Type": "application/json",
+    ...(columnar ? { Accept: COLUMNAR_JSON_MEDIA_TYPE } : {}),
     ...(headers ?? {}),
   };
   if (body instanceof FormData) {
@@ -25,7 +27,11 @@ async function apiFetch<T>(endpoint: string, options: FetchOptions = {}): Promis
     const detail = await res.text();
     throw new Error(detail || res.statusText);
   }
-  const isJson = res.headers.get("content-type")?.includes("application/json");
+  const contentType = res.headers.get("content-type") ?? "";
+  if (contentType.includes(COLUMNAR_JSON_MEDIA_TYPE)) {
+    return fromColumnar<T>(await res.json());
+  }
+  const isJson = contentType.includes("application/json");
   return (isJson ? res.json() : (res.text() as unknown)) as Promise<T>;
 }
 
@@ -52,32 +58,146 @@ export async function requestAccess(payload: Record<string, unknown>) {
 }
 
 export async function fetchSnapshot(slug: string, token: string) {
-  return apiFetch(`/api/analytics/districts/${slug}/snapshot/`, { token });
+  return apiFetch(`/api/analytics/districts/${slug}/snapshot/`, { token, columnar: COLUMNAR_PAYLOADS });
 }
 
 export async function fetchModelResults(slug: string, token: string) {
-  return apiFetch(`/api/analytics/districts/${slug}/models/`, { token });
+  return apiFetch(`/api/analytics/districts/${slug}/models/`, { token, columnar: COLUMNAR_PAYLOADS });
 }
 
-export async function triggerRefresh(token: string) {
+export async function triggerRefresh(token: string, district: string) {
   return apiFetch("/api/uploads/refresh/", {
     method: "POST",
+    body: JSON.stringify({ district }),
     token,
   });
 }
 
-export async function fetchRefreshStatus(token: string) {
-  return apiFetch("/api/uploads/refresh/", { token });
+export type RefreshEvent = {
+  type: string;
+  job: string;
+  at?: string;
+  asset?: string;
+  stage?: string;
+  done?: number;
+  total?: number;
+  note?: string;
+  status?: string;
+  started_at?: string;
+  finished_at?: string;
+};
+
+/**
+ * Follow the refresh progress stream while a job is active. Uses fetch rather
+ * than EventSource so the bearer token travels in a header; reconnects when the
+ * server ends the stream. When the server will not stream (501: no shared event
+ * broker, 204: no active job) it stops and calls `onUnavailable`, so the caller
+ * can poll the job status instead. Returns an unsubscribe function.
+ */
+export function subscribeRefreshEvents(
+  token: string,
+  onEvent: (event: RefreshEvent) => void,
+  onUnavailable?: () => void,
+) {
+  const controller = new AbortController();
+  async function run() {
+    while (!controller.signal.aborted) {
+      try {
+        const res = await fetch(`${API_BASE_URL}/api/uploads/refresh/events/`, {
+          headers: { Accept: "text/event-stream", Authorization: `Bearer ${token}` },
+          signal: controller.signal,
+          cache: "no-store",
+        });
+        if (res.status === 501 || res.status === 204) {
+          onUnavailable?.();
+          return;
+        }
+        if (!res.ok || !res.body) return;
+        const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = "";
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          let boundary = buffer.indexOf("\n\n");
+          while (boundary >= 0) {
+            const data = buffer
+              .slice(0, boundary)
+              .split("\n")
+              .filter((line) => line.startsWith("data: "))
+              .map((line) => line.slice(6))
+              .join("\n");
+            buffer = buffer.slice(boundary + 2);
+            if (data) onEvent(JSON.parse(data) as RefreshEvent);
+            boundary = buffer.indexOf("\n\n");
+          }
+        }
+      } catch {
+        if (controller.signal.aborted) return;
+      }
+      await new Promise((resolve) => setTimeout(resolve, 3000));
+    }
+  }
+  run();
+  return () => controller.abort();
+}
+
+export async function fetchRefreshStatus(token: string, district: string) {
+  return apiFetch(`/api/uploads/refresh/?district=${encodeURIComponent(district)}`, { token });
 }
 
 export async function listUploads(token: string) {
   return apiFetch("/api/uploads/", { token });
 }
 
+// Files above this size go through the resumable chunked upload endpoints.
+const CHUNKED_UPLOAD_THRESHOLD = 8 * 1024 * 1024;
+const UPLOAD_PART_SIZE = 8 * 1024 * 1024;
+
+type UploadSession = { id: string; parts: { index: number; size: number }[] };
+
+export async function uploadFileInParts(token: string, district: string, file: File) {
+  let session = await apiFetch<UploadSession>("/api/uploads/sessions/", {
+    method: "POST",
+    body: JSON.stringify({ district, filename: file.name, total_size: file.size }),
+    token,
+  });
+  const partCount = Math.ceil(file.size / UPLOAD_PART_SIZE);
+  for (let attempt = 0; attempt < 3; attempt += 1) {
+    const received = new Set(session.parts.map((part) => part.index));
+    for (let index = 0; index < partCount; index += 1) {
+      if (received.has(index)) continue;
+      const chunk = file.slice(index * UPLOAD_PART_SIZE, (index + 1) * UPLOAD_PART_SIZE);
+      try {
+        await apiFetch(`/api/uploads/sessions/${session.id}/parts/${index}/`, {
+          method: "PUT",
+          body: chunk,
+          token,
+          headers: { "Content-Type": "application/octet-stream" },
+        });
+      } catch {
+        // Retried on the next pass from whatever the server reports as received.
+      }
+    }
+    session = await apiFetch<UploadSession>(`/api/uploads/sessions/${session.id}/`, { token });
+    if (session.parts.length === partCount) break;
+  }
+  if (session.parts.length !== partCount) {
+    // Free the parts already stored rather than leaving the session open.
+    await apiFetch(`/api/uploads/sessions/${session.id}/abort/`, { method: "POST", token });
+    throw new Error(`Upload failed: ${partCount - session.parts.length} part(s) could not be sent.`);
+  }
+  return apiFetch(`/api/uploads/sessions/${session.id}/complete/`, { method: "POST", token });
+}
+
 export async function uploadDataAsset(
   token: string,
   data: FormData | Record<string, unknown>,
 ) {
+  const file = data instanceof FormData ? data.get("source_file") : null;
+  if (file instanceof File && file.size > CHUNKED_UPLOAD_THRESHOLD) {
+    return uploadFileInParts(token, String(data instanceof FormData ? data.get("district") : ""), file);
+  }
   if (data instanceof FormData) {
     return apiFetch("/api/uploads/", {
       method: "POST",
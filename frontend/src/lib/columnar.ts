@@ -0,0 +1,55 @@
+export const COLUMNAR_JSON_MEDIA_TYPE = "application/vnd.arlington.columnar+json";
+
+const COLUMNS_KEY = "$columns";
+const LENGTH_KEY = "$length";
+const ABSENT_KEY = "$absent";
+
+type ColumnBlock = {
+  [COLUMNS_KEY]: Record<string, unknown[]>;
+  [LENGTH_KEY]: number;
+  [ABSENT_KEY]?: Record<string, number[]>;
+};
+
+function isColumnBlock(value: unknown): value is ColumnBlock {
+  return (
+    typeof value === "object" &&
+    value !== null &&
+    COLUMNS_KEY in value &&
+    LENGTH_KEY in value
+  );
+}
+
+/**
+ * Rebuild record lists from the server's `{ $columns, $length }` column arrays.
+ * Keys listed under `$absent` for a row are left off that record.
+ */
+export function fromColumnar<T = unknown>(value: unknown): T {
+  if (Array.isArray(value)) {
+    return value.map((item) => fromColumnar(item)) as T;
+  }
+  if (isColumnBlock(value)) {
+    const entries = Object.entries(value[COLUMNS_KEY]).map(
+      ([key, cells]) => [key, cells.map((cell) => fromColumnar(cell))] as const,
+    );
+    const absent = new Map(
+      Object.entries(value[ABSENT_KEY] ?? {}).map(([key, rows]) => [key, new Set(rows)] as const),
+    );
+    const rows: Record<string, unknown>[] = [];
+    for (let idx = 0; idx < value[LENGTH_KEY]; idx += 1) {
+      const row: Record<string, unknown> = {};
+      for (const [key, cells] of entries) {
+        if (!absent.get(key)?.has(idx)) {
+          row[key] = cells[idx];
+        }
+      }
+      rows.push(row);
+    }
+    return rows as T;
+  }
+  if (typeof value === "object" && value !== null) {
+    return Object.fromEntries(
+      Object.entries(value).map(([key, item]) => [key, fromColumnar(item)]),
+    ) as T;
+  }
+  return value as T;
+}
@@ -3,3 +3,5 @@ export const API_BASE_URL =
 
 export const MAPBOX_TOKEN =
   process.env.NEXT_PUBLIC_MAPBOX_TOKEN ?? "pk.demo-token";
+
+export const COLUMNAR_PAYLOADS = process.env.NEXT_PUBLIC_COLUMNAR_PAYLOADS === "1";
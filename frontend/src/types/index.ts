@@ -76,6 +76,7 @@ export interface RefreshJob {
   started_at?: string;
   finished_at?: string;
   note?: string;
+  progress?: string;
 }
 
 export interface OfficerProfile {